@@ -1,20 +1,72 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from src.api.schemas import (
+    TicketRequest,
+    TicketResponse,
+    BatchTicketRequest,
+    BatchTicketResult,
+    BatchTicketResponse,
+)
+from src.api.startup import readiness
+from src.api.timing import ServerTimingMiddleware
+from src.config import STARTUP_WARMUP
+from src.metrics import CONTENT_TYPE, TICKETS, render as render_metrics, stage
+from src.triage.predict import predict_category, predict_categories
+from src.triage.compiled import compiled_registry
+from src.triage.registry import registry
+from src.triage.rules import priority_for, priority_rules
+from src.concurrency import run_cpu
+from src.rag.answer import (
+    agenerate_grounded_reply,
+    agenerate_grounded_replies,
+    astream_grounded_reply,
+    reply_report,
+)
+from src.rag.answer_cache import answer_cache
+from src.rag.embed_cache import embed_cache
+
 
-from src.api.schemas import TicketRequest, TicketResponse
-from src.triage.predict import predict_category
-from src.rag.answer import generate_grounded_reply
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm in the background: /health answers at once, /ready flips to 200 once the loads are done
+    task = None
+    if STARTUP_WARMUP:
+        task = asyncio.create_task(readiness.warmup())
+    else:
+        readiness.disable()
+    yield
+    if task is not None and not task.done():
+        task.cancel()
 
-app = FastAPI(title="Trusted Support Copilot")
+
+app = FastAPI(title="Trusted Support Copilot", lifespan=lifespan)
+app.add_middleware(ServerTimingMiddleware)
 
 
 def simple_priority_rule(text: str) -> str:
-    t = (text or "").lower()
-    if any(x in t for x in ["fraud", "unauthorized", "identity theft", "stolen", "hacked"]):
-        return "High"
-    if any(x in t for x in ["refund", "charge", "billing", "payment", "charged twice", "double charged"]):
-        return "Medium"
-    return "Low"
+    # Rules live in PRIORITY_RULES_PATH (data/rules/priority_rules.json) and reload when it changes
+    with stage("priority"):
+        return priority_for(text)
+
+
+def _ticket_response(category, conf, priority: str, rag: dict) -> TicketResponse:
+    return TicketResponse(
+        category=category,
+        category_confidence=float(conf) if conf is not None else 0.0,
+        priority=priority,
+        reply=rag.get("final_reply", ""),
+        found_in_kb=bool(rag.get("found_in_kb", False)),
+        citations=rag.get("citations", []),
+        retrieval_path=rag.get("retrieval_path"),
+        context_tokens=rag.get("context_tokens"),
+        reply_mode=rag.get("reply_mode"),
+    )
 
 
 @app.get("/")
@@ -24,8 +76,16 @@ def root():
         "service": "Trusted Support Copilot API",
         "endpoints": {
             "analyze": "POST /analyze",
+            "analyze_batch": "POST /analyze/batch",
+            "analyze_stream": "POST /analyze/stream (Server-Sent Events)",
             "docs": "/docs",
             "health": "/health",
+            "ready": "/ready",
+            "model": "/model",
+            "rules": "/rules",
+            "cache": "/cache",
+            "metrics": "/metrics (Prometheus)",
+            "replies": "/replies",
         },
     }
 
@@ -35,21 +95,51 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    # 503 until startup warmup has loaded every required component
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+
+@app.get("/model")
+def model_info():
+    return {**registry.info(), "compiled": compiled_registry.info()}
+
+
+@app.get("/rules")
+def rules_info():
+    priority_rules.get()
+    return priority_rules.info()
+
+
+@app.get("/cache")
+def cache_info():
+    return {"embeddings": embed_cache.info(), "answers": answer_cache.info()}
+
+
+@app.get("/replies")
+def replies_info():
+    # How replies were produced, incl. the share answered without the LLM
+    return reply_report()
+
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+
 @app.post("/analyze", response_model=TicketResponse)
-def analyze(req: TicketRequest):
+async def analyze(req: TicketRequest):
+    TICKETS.inc("analyze")
     try:
-        category, conf = predict_category(req.text)
-        priority = simple_priority_rule(req.text)
-        rag = generate_grounded_reply(req.text)
-
-        return TicketResponse(
-            category=category,
-            category_confidence=float(conf) if conf is not None else 0.0,
-            priority=priority,
-            reply=rag.get("final_reply", ""),
-            found_in_kb=bool(rag.get("found_in_kb", False)),
-            citations=rag.get("citations", []),
+        # Triage runs in the CPU pool while the query is embedded, searched and answered
+        (category, conf), rag = await asyncio.gather(
+            run_cpu(predict_category, req.text),
+            agenerate_grounded_reply(req.text),
         )
+        priority = simple_priority_rule(req.text)
+
+        return _ticket_response(category, conf, priority, rag)
 
     except Exception as e:
         # Return a clean JSON error instead of a big crash traceback during demo
@@ -57,3 +147,93 @@ def analyze(req: TicketRequest):
             status_code=500,
             content={"error": "Internal Server Error", "detail": str(e)},
         )
+
+
+@app.post("/analyze/batch", response_model=BatchTicketResponse)
+async def analyze_batch(req: BatchTicketRequest):
+    texts = [t.text for t in req.tickets]
+    TICKETS.inc("analyze_batch", amount=len(texts))
+    try:
+        triage, rags = await asyncio.gather(
+            run_cpu(predict_categories, texts),
+            agenerate_grounded_replies(texts, max_concurrency=req.max_concurrency),
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Internal Server Error", "detail": str(e)},
+        )
+
+    results = []
+    for i, (text, (category, conf), rag) in enumerate(zip(texts, triage, rags)):
+        if "error" in rag:
+            results.append(BatchTicketResult(index=i, error=rag["error"]))
+            continue
+        try:
+            resp = _ticket_response(category, conf, simple_priority_rule(text), rag["result"])
+            results.append(BatchTicketResult(index=i, result=resp))
+        except Exception as e:
+            results.append(BatchTicketResult(index=i, error=str(e)))
+
+    return BatchTicketResponse(results=results)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _analyze_events(text: str) -> AsyncIterator[str]:
+    # Retrieval + generation start right away and buffer into a queue while triage finishes
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def _pump():
+        try:
+            async for item in astream_grounded_reply(text):
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(("error", e))
+        await queue.put(None)
+
+    pump = asyncio.ensure_future(_pump())
+    try:
+        category, conf = await run_cpu(predict_category, text)
+        priority = simple_priority_rule(text)
+        yield _sse("triage", {
+            "category": category,
+            "category_confidence": float(conf) if conf is not None else 0.0,
+            "priority": priority,
+        })
+
+        rag: Dict[str, Any] = {}
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            kind, payload = item
+            if kind == "error":
+                raise payload
+            if kind == "citations":
+                yield _sse("citations", payload)
+            elif kind == "delta":
+                yield _sse("reply_delta", {"text": payload})
+            elif kind == "final":
+                rag = payload
+
+        yield _sse("done", _ticket_response(category, conf, priority, rag).model_dump())
+
+    except Exception as e:
+        yield _sse("error", {"error": "Internal Server Error", "detail": str(e)})
+    finally:
+        # Client went away (or we failed): stop the upstream LLM stream too
+        pump.cancel()
+
+
+@app.post("/analyze/stream")
+async def analyze_stream(req: TicketRequest):
+    # Events: triage -> citations -> reply_delta* -> done (or error)
+    TICKETS.inc("analyze_stream")
+    return StreamingResponse(
+        _analyze_events(req.text),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+from src.config import BATCH_MAX_TICKETS
 
 class TicketRequest(BaseModel):
     text: str = Field(min_length=10, max_length=5000)
@@ -16,3 +18,22 @@ class TicketResponse(BaseModel):
     reply: str
     found_in_kb: bool
     citations: List[Citation]
+    # Which retrieval path served the ticket: lexical | hybrid | dense | answer_cache | none
+    retrieval_path: Optional[str] = None
+    # Prompt context size vs. the raw retrieved chunks (absent for cached/fallback replies)
+    context_tokens: Optional[Dict[str, int]] = None
+    # What wrote the reply: llm | extractive (one KB section, no LLM call) |
+    # retrieval_only (LLM past its budget or breaker open) | none (no KB match)
+    reply_mode: Optional[str] = None
+
+class BatchTicketRequest(BaseModel):
+    tickets: List[TicketRequest] = Field(min_length=1, max_length=BATCH_MAX_TICKETS)
+    max_concurrency: Optional[int] = Field(default=None, ge=1, le=64)
+
+class BatchTicketResult(BaseModel):
+    index: int
+    result: Optional[TicketResponse] = None
+    error: Optional[str] = None
+
+class BatchTicketResponse(BaseModel):
+    results: List[BatchTicketResult]
@@ -0,0 +1,103 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.concurrency import run_cpu
+
+# Representative ticket for warming every per-request path once
+WARMUP_TICKET = "I was charged twice for my card payment and need a refund."
+
+
+class Readiness:
+    """Startup warmup state, per component, for /ready and the startup log.
+
+    Required components (triage model, priority rules, KB index) decide readiness; the
+    embedding/search warmup depends on the embeddings API and is reported but not required.
+    """
+
+    def __init__(self):
+        self.state = "pending"  # pending | warming | done | disabled
+        self.total_seconds: Optional[float] = None
+        self.components: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        if self.state == "disabled":
+            return True
+        return self.state == "done" and all(
+            c["status"] == "ok" for c in self.components.values() if c["required"]
+        )
+
+    def disable(self) -> None:
+        # Without warmup everything loads on first use, as before; nothing to wait for
+        self.state = "disabled"
+
+    async def _step(self, name: str, fn: Callable[[], Awaitable[Any]], required: bool = True) -> None:
+        t0 = time.perf_counter()
+        entry: Dict[str, Any] = {"required": required}
+        try:
+            detail = await fn()
+            entry["status"] = "ok"
+            if detail:
+                entry["detail"] = detail
+        except Exception as e:
+            entry["status"] = "error"
+            entry["error"] = f"{type(e).__name__}: {e}"
+        entry["seconds"] = round(time.perf_counter() - t0, 4)
+        self.components[name] = entry
+        suffix = f" ({entry['error']})" if "error" in entry else ""
+        print(f"[startup] {name}: {entry['status']} in {entry['seconds']:.3f}s{suffix}")
+
+    async def warmup(self) -> None:
+        from src.clients import openai_async_client
+        from src.rag.retrieve import aembed_queries, awarm, check_query_dim, index_info
+        from src.triage.predict import predict_category
+        from src.triage.registry import registry
+        from src.triage.rules import priority_for, priority_rules
+
+        self.state = "warming"
+        t0 = time.perf_counter()
+
+        async def triage():
+            category, _ = await run_cpu(predict_category, WARMUP_TICKET)
+            return {"artifact": "joblib" if registry.info()["loaded"] else "compiled", "sample": category}
+
+        async def rules():
+            await run_cpu(priority_for, WARMUP_TICKET)
+            return {"version": priority_rules.info().get("version")}
+
+        async def llm_client():
+            await run_cpu(openai_async_client)
+
+        async def kb_index():
+            info = await run_cpu(index_info)
+            try:
+                qv = await aembed_queries([WARMUP_TICKET])
+            except Exception as e:
+                # An unreachable embeddings API is reported by the retrieval step; the index itself is fine
+                info["query_dim"] = f"unchecked ({type(e).__name__})"
+                return info
+            # A wrong-width index fails every dense search; catch it before taking traffic
+            check_query_dim(qv.shape[1], info["dim"])
+            info["query_dim"] = qv.shape[1]
+            return info
+
+        await self._step("triage_model", triage)
+        await self._step("priority_rules", rules)
+        await self._step("kb_index", kb_index)
+        await self._step("llm_client", llm_client, required=False)
+        await self._step("retrieval", lambda: awarm(WARMUP_TICKET), required=False)
+
+        self.total_seconds = round(time.perf_counter() - t0, 4)
+        self.state = "done"
+        print(f"[startup] warmup finished in {self.total_seconds:.3f}s; ready={self.ready}")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "total_seconds": self.total_seconds,
+            "components": self.components,
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,39 @@
+import time
+
+from src.metrics import HTTP_SECONDS, begin_request, end_request, server_timing
+
+
+class ServerTimingMiddleware:
+    """Plain ASGI middleware: request latency histogram plus a Server-Timing header.
+
+    The header lists every stage that finished before the response started, so for
+    /analyze/stream it only covers what ran before the first event.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        token, timings = begin_request()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(timings, time.perf_counter() - t0).encode("latin-1")
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # Route template, not the raw path, so unknown URLs can't blow up label cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.observe(time.perf_counter() - t0, scope["method"], route, str(status))
+            end_request(token)
@@ -0,0 +1,92 @@
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import KB_DIR
+from src.rag.chunker import iter_kb_chunks
+from src.rag.embedders import Embedder, LocalEmbedder, OpenAIEmbedder, local_fit_corpus
+from src.rag.index_types import make_index
+
+# (ticket, KB doc that should answer it)
+DEFAULT_QUERIES: List[Tuple[str, Optional[str]]] = [
+    ("I see an unauthorized charge on my card. Please help.", "fraud_identity.md"),
+    ("Someone stole my identity and opened accounts in my name", "fraud_identity.md"),
+    ("I was charged twice for my subscription. Can you refund the duplicate?", "billing_refunds.md"),
+    ("How long does a refund take to show up on my statement?", "billing_refunds.md"),
+    ("I can't log in. Password reset doesn't work and my account is locked.", "account_access.md"),
+    ("My 2FA codes are not arriving, how do I get back into my account?", "account_access.md"),
+]
+
+
+def _read_queries(path: str) -> List[Tuple[str, Optional[str]]]:
+    # One query per line, optionally followed by a tab and the expected doc_id
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                text, _, doc = line.rstrip("\n").partition("\t")
+                out.append((text.strip(), doc.strip() or None))
+    return out
+
+
+def _bench(embedder: Embedder, chunks: List[Dict], queries: List[Tuple[str, Optional[str]]], k: int) -> Dict:
+    index, _ = make_index(embedder.embed_documents([c["chunk"] for c in chunks], report=False), "flat")
+
+    latencies, ranked = [], []
+    for text, _ in queries:
+        t0 = time.perf_counter()
+        qv = embedder.embed([text])
+        _, idxs = index.search(qv, k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        ranked.append([int(i) for i in idxs[0] if i != -1])
+
+    labeled = [(hits, doc) for hits, (_, doc) in zip(ranked, queries) if doc]
+    hit_rate = (
+        sum(any(chunks[i]["doc_id"] == doc for i in hits) for hits, doc in labeled) / len(labeled)
+        if labeled
+        else None
+    )
+    return {
+        "name": embedder.name,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "hit_rate": hit_rate,
+        "ranked": ranked,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare local vs OpenAI embedding latency and retrieval quality.")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries-file", default=None, help="'query<TAB>expected_doc_id' per line")
+    args = parser.parse_args()
+
+    chunks = list(iter_kb_chunks(KB_DIR))
+    queries = _read_queries(args.queries_file) if args.queries_file else DEFAULT_QUERIES
+    k = min(args.k, len(chunks))
+
+    backends = {
+        "openai": OpenAIEmbedder,
+        "local": lambda: LocalEmbedder.fit(local_fit_corpus([c["chunk"] for c in chunks])),
+    }
+    results: Dict[str, Dict] = {}
+    for label, factory in backends.items():
+        try:
+            results[label] = _bench(factory(), chunks, queries, k)
+        except Exception as e:
+            print(f"{label}: skipped ({type(e).__name__}: {e})")
+
+    print(f"{'backend':<10}{'p50 ms':>10}{'p95 ms':>10}{f'hit@{k}':>10}{f'overlap@{k}':>12}  embedder")
+    for label, r in results.items():
+        overlap = "-"
+        if "openai" in results and label != "openai":
+            ref = results["openai"]["ranked"]
+            overlap = f"{np.mean([len(set(a) & set(b)) / k for a, b in zip(r['ranked'], ref)]):.3f}"
+        hit = f"{r['hit_rate']:.3f}" if r["hit_rate"] is not None else "-"
+        print(f"{label:<10}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{hit:>10}{overlap:>12}  {r['name']}")
+
+
+if __name__ == "__main__":
+    main()
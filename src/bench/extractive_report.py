@@ -0,0 +1,100 @@
+import argparse
+import json
+from typing import Dict, List, Optional, Tuple
+
+from src.bench.embed_bench import DEFAULT_QUERIES, _read_queries
+from src.config import EXTRACTIVE_MAX_TOKENS, RETRIEVAL_K
+from src.rag.answer import EXTRACTIVE_GATES
+from src.rag.context import extract_section, merge_hits
+from src.rag.retrieve import retrieve_batch
+
+Gates = Dict[str, Tuple[float, float]]
+
+
+def _row(query: str, hits: List[Dict], gates: Gates, max_tokens: int) -> Dict:
+    # Top/margin on the scale of the best-ranked hit; other-signal hits are not comparable with it
+    signal = hits[0].get("signal", "dense") if hits else None
+    spans = merge_hits([h for h in hits if h.get("signal", "dense") == signal])
+    found = extract_section(hits, gates, max_tokens)
+    return {
+        "query": query,
+        "signal": signal,
+        "top": round(spans[0].score, 3) if spans else None,
+        "margin": round(spans[0].score - spans[1].score, 3) if len(spans) > 1 else None,
+        "section": (spans[0].section or spans[0].doc_id) if spans else None,
+        "extractive": found is not None,
+    }
+
+
+def run_report(
+    queries: List[str],
+    min_scores: Dict[str, List[float]],
+    gates: Gates = EXTRACTIVE_GATES,
+    max_tokens: int = EXTRACTIVE_MAX_TOKENS,
+    llm_ms: Optional[float] = None,
+) -> Dict:
+    # Retrieval once; the gate is re-evaluated per threshold, one signal at a time (the other keeps `gates`)
+    all_hits = retrieve_batch(queries, k=RETRIEVAL_K, min_score=0.25)
+    sweep = []
+    for signal, thresholds in min_scores.items():
+        for t in thresholds:
+            swept = {**gates, signal: (t, gates[signal][1])}
+            n = sum(extract_section(h, swept, max_tokens) is not None for h in all_hits)
+            entry = {
+                "signal": signal,
+                "min_score": t,
+                "extractive": n,
+                "fraction": round(n / len(queries), 4) if queries else 0.0,
+            }
+            if llm_ms is not None:
+                entry["est_ms_saved_per_ticket"] = round(entry["fraction"] * llm_ms, 1)
+            sweep.append(entry)
+    rows = [_row(q, h, gates, max_tokens) for q, h in zip(queries, all_hits)]
+    return {"gates": gates, "max_tokens": max_tokens, "rows": rows, "sweep": sweep}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Which tickets would get an extractive (no-LLM) reply, by threshold.")
+    parser.add_argument("--queries-file", default=None, help="one ticket per line (a tab and doc_id may follow)")
+    parser.add_argument("--min-scores", default="0.5,0.6,0.7,0.75,0.8,0.9", help="cosine gates for dense hits")
+    parser.add_argument("--lexical-min-scores", default="0.4,0.5,0.6,0.7,0.8", help="normalized BM25 gates")
+    parser.add_argument("--margin", type=float, default=EXTRACTIVE_GATES["dense"][1])
+    parser.add_argument("--lexical-margin", type=float, default=EXTRACTIVE_GATES["lexical"][1])
+    parser.add_argument("--llm-ms", type=float, default=None, help="typical LLM call time, to estimate time saved")
+    parser.add_argument("--out", default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    queries = [q for q, _ in (_read_queries(args.queries_file) if args.queries_file else DEFAULT_QUERIES)]
+    gates = {
+        "dense": (EXTRACTIVE_GATES["dense"][0], args.margin),
+        "lexical": (EXTRACTIVE_GATES["lexical"][0], args.lexical_margin),
+    }
+    min_scores = {
+        "dense": [float(t) for t in args.min_scores.split(",")],
+        "lexical": [float(t) for t in args.lexical_min_scores.split(",")],
+    }
+    report = run_report(queries, min_scores, gates, llm_ms=args.llm_ms)
+
+    print("At " + ", ".join(f"{s} min_score={m}, margin={g}" for s, (m, g) in gates.items()) + ":")
+    print(f"{'signal':<9}{'top':>6}{'margin':>8}  {'mode':<11}{'section':<32}ticket")
+    for r in report["rows"]:
+        top = f"{r['top']:.3f}" if r["top"] is not None else "-"
+        margin = f"{r['margin']:.3f}" if r["margin"] is not None else "-"
+        mode = "extractive" if r["extractive"] else "llm"
+        section = (r["section"] or "-")[:30]
+        print(f"{r['signal'] or '-':<9}{top:>6}{margin:>8}  {mode:<11}{section:<32}{r['query'][:60]}")
+
+    header = f"\n{'signal':<9}{'min_score':>10}{'extractive':>12}{'fraction':>10}"
+    print(header + (f"{'ms saved/ticket':>17}" if args.llm_ms else ""))
+    for s in report["sweep"]:
+        saved = f"{s['est_ms_saved_per_ticket']:>17.1f}" if "est_ms_saved_per_ticket" in s else ""
+        print(f"{s['signal']:<9}{s['min_score']:>10.2f}{s['extractive']:>12}{s['fraction']:>10.1%}{saved}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("Saved:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class Latency:
+    """Lognormal latency in milliseconds, set by its median and p99 (equal values = fixed delay)."""
+
+    median_ms: float = 0.0
+    p99_ms: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        # "300" or "300:1200" (median:p99)
+        median, _, p99 = spec.partition(":")
+        return cls(float(median), float(p99 or median))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        if self.p99_ms <= self.median_ms:
+            return self.median_ms / 1000
+        sigma = math.log(self.p99_ms / self.median_ms) / 2.326  # z of the 99th percentile
+        return rng.lognormvariate(math.log(self.median_ms), sigma) / 1000
+
+
+@dataclass
+class FakeConfig:
+    embed_latency: Latency = field(default_factory=lambda: Latency(40, 120))
+    llm_latency: Latency = field(default_factory=lambda: Latency(800, 2500))
+    error_rate: float = 0.0  # fraction of requests answered with error_status
+    error_status: int = 500
+    dim: int = 256
+    seed: int = 0
+
+
+def fake_embedding(text: str, dim: int) -> np.ndarray:
+    # Signed feature hashing of words: deterministic, and shared words => nearby vectors,
+    # so retrieval over a KB embedded this way still returns sensible hits
+    v = np.zeros(dim, dtype="float32")
+    for w in _WORD.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest(), "little")
+        v[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+def fake_reply(prompt: str) -> Dict:
+    # First sentence of the packed KB context, as a grounded-looking reply; same prompt => same reply
+    _, _, context = prompt.partition("KB CONTEXT:")
+    lines = [ln.strip() for ln in context.splitlines() if ln.strip()]
+    lines = [ln for ln in lines if not ln.startswith(("[", "#", "---"))]
+    if not lines:
+        return {"found_in_kb": False, "final_reply": "Could you share more details about the issue?", "citations": []}
+    sentence = re.split(r"(?<=[.!?])\s", lines[0], maxsplit=1)[0]
+    return {"found_in_kb": True, "final_reply": f"Thanks for reaching out. {sentence}", "citations": []}
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAI:
+    """Local stand-in for the two OpenAI endpoints the app calls: /v1/embeddings and /v1/responses.
+
+    Point the SDK at it with OPENAI_BASE_URL=<url>. Latency is slept per request from the
+    configured distributions, a fraction of requests fail, and outputs depend only on the input.
+    """
+
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"embeddings": 0, "responses": 0, "errors": 0}
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAI":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOpenAI":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _draw(self, endpoint: str, latency: Latency):
+        # One locked draw per request keeps a seeded run reproducible for a given arrival order
+        with self._lock:
+            self.stats[endpoint] += 1
+            fail = self._rng.random() < self.config.error_rate
+            if fail:
+                self.stats["errors"] += 1
+            return latency.sample(self._rng), fail
+
+    def embeddings(self, body: Dict) -> Dict:
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = []
+        for i, t in enumerate(texts):
+            v = fake_embedding(t, self.config.dim)
+            # The SDK asks for base64 by default and decodes it itself
+            emb = base64.b64encode(v.tobytes()).decode() if body.get("encoding_format") == "base64" else v.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": emb})
+        n = sum(_tokens(t) for t in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": n, "total_tokens": n},
+        }
+
+    def response(self, body: Dict) -> Dict:
+        prompt = body["input"] if isinstance(body["input"], str) else json.dumps(body["input"])
+        text = json.dumps(fake_reply(prompt), ensure_ascii=False)
+        usage_in, usage_out = _tokens(prompt), _tokens(text)
+        return {
+            "id": f"resp_{uuid.uuid4().hex[:24]}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model", "fake"),
+            "output": [{
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": usage_in,
+                "output_tokens": usage_out,
+                "total_tokens": usage_in + usage_out,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        }
+
+
+def _stream_events(resp: Dict, chunk: int = 12) -> List[Dict]:
+    text = resp["output"][0]["content"][0]["text"]
+    item_id = resp["output"][0]["id"]
+    events = [{"type": "response.created", "response": {**resp, "status": "in_progress", "output": []}}]
+    for i in range(0, len(text), chunk):
+        events.append({
+            "type": "response.output_text.delta",
+            "item_id": item_id,
+            "output_index": 0,
+            "content_index": 0,
+            "delta": text[i:i + chunk],
+            "logprobs": [],
+        })
+    events.append({"type": "response.completed", "response": resp})
+    for n, e in enumerate(events):
+        e["sequence_number"] = n
+    return events
+
+
+def _handler(fake: FakeOpenAI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status: int, payload: Dict) -> None:
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            try:
+                self._post()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up (deadline, cancelled hedge); nothing to answer
+                self.close_connection = True
+
+        def _post(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            path = self.path.rstrip("/")
+            if path.endswith("/embeddings"):
+                endpoint, latency = "embeddings", fake.config.embed_latency
+            elif path.endswith("/responses"):
+                endpoint, latency = "responses", fake.config.llm_latency
+            else:
+                self._json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+                return
+
+            delay, fail = fake._draw(endpoint, latency)
+            if fail:
+                time.sleep(delay / 2)
+                self._json(fake.config.error_status, {"error": {"message": "Injected failure", "type": "server_error"}})
+                return
+
+            if endpoint == "embeddings":
+                time.sleep(delay)
+                self._json(200, fake.embeddings(body))
+            elif body.get("stream"):
+                self._stream(fake.response(body), delay)
+            else:
+                time.sleep(delay)
+                self._json(200, fake.response(body))
+
+        def _stream(self, resp: Dict, delay: float) -> None:
+            # A third of the latency before the first token, the rest spread over the deltas
+            events = _stream_events(resp)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            time.sleep(delay / 3)
+            gap = (delay * 2 / 3) / max(1, len(events) - 2)
+            for e in events:
+                self.wfile.write(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if e["type"] == "response.output_text.delta":
+                    time.sleep(gap)
+            self.close_connection = True
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI server (embeddings + responses) standalone.")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--embed-latency", default="40:120", help="median[:p99] in ms")
+    parser.add_argument("--llm-latency", default="800:2500", help="median[:p99] in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        embed_latency=Latency.parse(args.embed_latency),
+        llm_latency=Latency.parse(args.llm_latency),
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        dim=args.dim,
+        seed=args.seed,
+    )
+    fake = FakeOpenAI(config, port=args.port)
+    print(f"Fake OpenAI listening on {fake.url} (set OPENAI_BASE_URL to this)")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import json
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.rag.index_types import INDEX_TYPES, make_index, search_params
+from src.rag.vector_store import load_manifest
+
+
+def _synthetic_queries(vecs: np.ndarray, n: int, noise: float, seed: int = 0) -> np.ndarray:
+    # KB vectors plus gaussian noise: close to real tickets, but never an exact copy of a chunk
+    rng = np.random.default_rng(seed)
+    base = vecs[rng.integers(0, len(vecs), size=n)]
+    q = base + rng.normal(0, noise, size=base.shape).astype("float32")
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return q.astype("float32")
+
+
+def _file_queries(path: str) -> np.ndarray:
+    from src.rag.retrieve import embed_queries
+
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [ln.strip() for ln in f if ln.strip()]
+    return embed_queries(lines)
+
+
+def run_report(
+    k: int = 4,
+    n_queries: int = 200,
+    noise: float = 0.05,
+    queries_file: Optional[str] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[Dict]:
+    _, vecs = load_manifest()
+    if vecs is None:
+        raise FileNotFoundError("No stored KB vectors. Run: python -m src.rag.build_index")
+    vecs = np.ascontiguousarray(vecs, dtype="float32")
+    queries = _file_queries(queries_file) if queries_file else _synthetic_queries(vecs, n_queries, noise)
+    k = min(k, len(vecs))
+
+    rows: List[Dict] = []
+    truth: Optional[np.ndarray] = None
+    for index_type in INDEX_TYPES:
+        t0 = time.perf_counter()
+        index, spec = make_index(vecs, index_type)
+        build_s = time.perf_counter() - t0
+        params = search_params(index, nprobe, ef_search)
+
+        latencies, found = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            _, idxs = index.search(q.reshape(1, -1), k, params=params)
+            latencies.append(time.perf_counter() - t0)
+            found.append(idxs[0])
+        found_arr = np.vstack(found)
+        if truth is None:
+            truth = found_arr  # flat is first and exact
+
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found_arr, truth)])
+        lat_ms = np.array(latencies) * 1000
+        rows.append({
+            "type": index_type,
+            "params": spec["params"],
+            "build_s": round(build_s, 4),
+            f"recall@{k}": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(lat_ms, 50)), 4),
+            "p95_ms": round(float(np.percentile(lat_ms, 95)), 4),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of each FAISS index type on the current KB.")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200, help="number of synthetic queries")
+    parser.add_argument("--noise", type=float, default=0.05, help="noise added to synthetic queries")
+    parser.add_argument("--queries-file", default=None, help="one real query per line (embedded via the API)")
+    parser.add_argument("--nprobe", type=int, default=None)
+    parser.add_argument("--ef-search", type=int, default=None)
+    parser.add_argument("--out", default=None, help="write the rows as JSON")
+    args = parser.parse_args()
+
+    rows = run_report(args.k, args.queries, args.noise, args.queries_file, args.nprobe, args.ef_search)
+    recall_key = next(key for key in rows[0] if key.startswith("recall@"))
+    print(f"{'type':<10}{recall_key:>10}{'p50 ms':>10}{'p95 ms':>10}{'build s':>10}  params")
+    for r in rows:
+        print(f"{r['type']:<10}{r[recall_key]:>10.4f}{r['p50_ms']:>10.4f}{r['p95_ms']:>10.4f}{r['build_s']:>10.3f}  {r['params']}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print("Saved:", args.out)
+
+
+if __name__ == "__main__":
+    main()
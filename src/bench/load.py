@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from typing import Dict, List, Sequence
+
+import httpx
+import numpy as np
+
+from src.bench.micro import BENCH_TICKETS
+
+
+def _summary(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    lat = latencies or [0.0]
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p95_ms": round(float(np.percentile(lat, 95)), 1),
+        "p99_ms": round(float(np.percentile(lat, 99)), 1),
+        "rps": round(len(latencies) / max(elapsed, 1e-9), 2),
+    }
+
+
+async def _level(
+    client: httpx.AsyncClient, path: str, concurrency: int, n_requests: int, tickets: Sequence[str]
+) -> Dict[str, float]:
+    # Closed loop: `concurrency` workers each send their next request as soon as the last one returns
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= n_requests:
+                return
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(path, json={"text": tickets[i % len(tickets)]})
+                ok = r.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - t0) * 1000)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summary(latencies, errors, time.perf_counter() - t0)
+
+
+async def arun_load(
+    base_url: str,
+    levels: Sequence[int] = (1, 4, 16),
+    requests_per_level: int = 100,
+    path: str = "/analyze",
+    tickets: Sequence[str] = BENCH_TICKETS,
+    warmup: int = 5,
+    timeout: float = 120.0,
+) -> Dict[str, Dict[str, float]]:
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        for t in tickets[:warmup]:
+            await client.post(path, json={"text": t})
+        out = {}
+        for c in levels:
+            out[f"{path}@c{c}"] = await _level(client, path, c, requests_per_level, tickets)
+    return out
+
+
+def run_load(base_url: str, **kwargs) -> Dict[str, Dict[str, float]]:
+    return asyncio.run(arun_load(base_url, **kwargs))
+
+
+def print_load(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'scenario':<24}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for name, r in results.items():
+        print(
+            f"{name:<24}{r['requests']:>7}{r['errors']:>8}{r['p50_ms']:>10.1f}"
+            f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['rps']:>10.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive a running API at fixed concurrency levels.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/analyze")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per level")
+    parser.add_argument("--out", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = run_load(
+        args.url,
+        levels=[int(c) for c in args.concurrency.split(",")],
+        requests_per_level=args.requests,
+        path=args.path,
+    )
+    print_load(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("Saved:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import time
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+from src.bench.embed_bench import DEFAULT_QUERIES
+from src.bench.rules_bench import SAMPLE_TICKETS
+
+BENCH_TICKETS: List[str] = list(dict.fromkeys(SAMPLE_TICKETS + [q for q, _ in DEFAULT_QUERIES]))
+
+
+def time_calls(fn: Callable, inputs: Sequence, repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Per-call latency of fn over inputs, `repeat` passes after `warmup` untimed ones."""
+    for _ in range(warmup):
+        for x in inputs:
+            fn(x)
+    lat = []
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for x in inputs:
+            t = time.perf_counter()
+            fn(x)
+            lat.append((time.perf_counter() - t) * 1e6)
+    elapsed = time.perf_counter() - t0
+    return {
+        "calls": len(lat),
+        "p50_us": round(float(np.percentile(lat, 50)), 2),
+        "p95_us": round(float(np.percentile(lat, 95)), 2),
+        "ops_s": round(len(lat) / max(elapsed, 1e-9), 1),
+    }
+
+
+def run_micro(repeat: int = 50, tickets: List[str] = BENCH_TICKETS) -> Dict[str, Dict[str, float]]:
+    # Imported here: callers (the suite) point INDEX_DIR / OPENAI_BASE_URL somewhere else first
+    from src.api.main import simple_priority_rule
+    from src.config import KB_DIR
+    from src.rag.chunker import read_kb_files, chunk_text
+    from src.rag.retrieve import retrieve
+    from src.triage.predict import predict_category
+
+    docs = read_kb_files(KB_DIR)
+    benches = {
+        # Query embeddings are cached after the warmup pass, so this is the local search + fusion cost
+        "retrieve": (retrieve, tickets),
+        "chunk_text": (chunk_text, docs),
+        "predict_category": (predict_category, tickets),
+        "simple_priority_rule": (simple_priority_rule, tickets),
+    }
+    out = {}
+    for name, (fn, inputs) in benches.items():
+        try:
+            # Docs are much bigger than tickets; fewer passes keep the run short
+            out[name] = time_calls(fn, inputs, max(1, repeat // 10) if name == "chunk_text" else repeat)
+        except Exception as e:
+            print(f"{name}: skipped ({type(e).__name__}: {e})")
+    return out
+
+
+def print_micro(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'function':<22}{'calls':>8}{'p50 us':>12}{'p95 us':>12}{'ops/s':>12}")
+    for name, r in results.items():
+        print(f"{name:<22}{r['calls']:>8}{r['p50_us']:>12.2f}{r['p95_us']:>12.2f}{r['ops_s']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the per-ticket hot paths.")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--out", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = run_micro(args.repeat)
+    print_micro(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("Saved:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import json
+import random
+import re
+import string
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from src.triage.rules import PriorityRules
+
+TIERS = ["High", "Medium", "Low"]
+
+SAMPLE_TICKETS = [
+    "I see an unauthorized charge on my card. Please help.",
+    "I was charged twice for my subscription. Can you refund the duplicate?",
+    "I can't log in. Password reset doesn't work and my account is locked.",
+    "My delivery is delayed and tracking hasn't updated in a week, this is not fraud but I am worried.",
+]
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+
+
+def synthetic_config(n_rules: int, patterns_per_rule: int = 5, seed: int = 0) -> Dict:
+    # Random 1-3 word patterns (some prefixes) spread across tiers; they almost never fire on real text,
+    # which is the worst case for a scan that has to try every rule
+    rng = random.Random(seed)
+    rules = []
+    for i in range(n_rules):
+        patterns = []
+        for _ in range(patterns_per_rule):
+            words = [_word(rng) for _ in range(rng.randint(1, 3))]
+            if rng.random() < 0.2:
+                words[-1] += "*"
+            patterns.append(" ".join(words))
+        rules.append({"name": f"r{i}", "tier": TIERS[i % 2], "patterns": patterns})
+    return {
+        "tiers": TIERS,
+        "default": "Low",
+        "negation": {"cues": ["not", "no", "never"], "bridge": ["a", "the", "was", "is"], "window": 3},
+        "rules": rules,
+    }
+
+
+def _naive(config: Dict):
+    # The old approach: one substring scan per keyword, tier by tier
+    tiers = [[p.replace("*", "") for r in config["rules"] if r["tier"] == t for p in r["patterns"]] for t in TIERS[:-1]]
+
+    def classify(text: str) -> str:
+        t = text.lower()
+        for name, keywords in zip(TIERS, tiers):
+            if any(x in t for x in keywords):
+                return name
+        return config["default"]
+
+    return classify
+
+
+def _combined_regex(config: Dict):
+    # One alternation per tier; Python's re tries alternatives in turn, so cost still grows with rule count
+    tiers = []
+    for t in TIERS[:-1]:
+        alts = [
+            r"\s+".join(re.escape(w.rstrip("*")) + (r"\w*" if w.endswith("*") else "") for w in p.split())
+            for r in config["rules"] if r["tier"] == t for p in r["patterns"]
+        ]
+        tiers.append(re.compile(r"\b(?:" + "|".join(alts) + r")\b", re.IGNORECASE) if alts else None)
+
+    def classify(text: str) -> str:
+        for name, rx in zip(TIERS, tiers):
+            if rx is not None and rx.search(text):
+                return name
+        return config["default"]
+
+    return classify
+
+
+def _time_per_ticket(fn, tickets: List[str], repeat: int) -> float:
+    lat = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for text in tickets:
+            fn(text)
+        lat.append((time.perf_counter() - t0) / len(tickets))
+    return float(np.median(lat)) * 1e6
+
+
+def run_bench(sizes: List[int], repeat: int = 20, tickets: List[str] = SAMPLE_TICKETS) -> List[Dict]:
+    rows = []
+    for n in sizes:
+        config = synthetic_config(n)
+        t0 = time.perf_counter()
+        engine = PriorityRules(config)
+        compile_s = time.perf_counter() - t0
+        row = {
+            "rules": n,
+            "patterns": engine.num_patterns,
+            "compile_s": round(compile_s, 4),
+            "engine_us": round(_time_per_ticket(engine.classify, tickets, repeat), 2),
+            "naive_us": round(_time_per_ticket(_naive(config), tickets, repeat), 2),
+        }
+        if n <= 2000:
+            # Compiling and scanning a huge alternation gets slow enough to dominate the run
+            row["regex_us"] = round(_time_per_ticket(_combined_regex(config), tickets, repeat), 2)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-ticket cost of priority rules as the rule count grows.")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="comma-separated rule counts")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--out", default=None, help="write the rows as JSON")
+    args = parser.parse_args()
+
+    rows = run_bench([int(s) for s in args.sizes.split(",")], args.repeat)
+    print(f"{'rules':>8}{'patterns':>10}{'compile s':>11}{'engine us':>11}{'naive us':>11}{'regex us':>11}")
+    for r in rows:
+        regex = f"{r['regex_us']:>11.2f}" if "regex_us" in r else f"{'-':>11}"
+        print(f"{r['rules']:>8}{r['patterns']:>10}{r['compile_s']:>11.4f}{r['engine_us']:>11.2f}{r['naive_us']:>11.2f}{regex}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print("Saved:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from src.bench.fake_openai import FakeConfig, FakeOpenAI, Latency
+from src.bench.load import print_load, run_load
+from src.config import BASE_DIR, CACHE_DIR, DATA_DIR
+
+BENCH_DIR = os.path.join(CACHE_DIR, "bench")
+BASELINE_PATH = os.path.join(DATA_DIR, "bench", "baseline.json")
+
+# Metrics compared against the baseline and which direction is worse
+LOWER_IS_BETTER = ("p50_us", "p95_us", "p50_ms", "p95_ms", "p99_ms")
+HIGHER_IS_BETTER = ("ops_s", "rps")
+
+
+def bench_env(fake_url: str, index_dir: str, caches: bool) -> Dict[str, str]:
+    # Everything the subprocesses touch is redirected: the fake API, a separate index built from
+    # fake vectors, and no shared embedding cache file, so the real index and cache are never mixed in
+    env = {
+        **os.environ,
+        "OPENAI_BASE_URL": fake_url,
+        "OPENAI_API_KEY": "bench",
+        "EMBED_BACKEND": "openai",
+        "INDEX_DIR": index_dir,
+        "INDEX_RELOAD_INTERVAL": "0",
+        "EMBED_CACHE_DB": "",
+        "PYTHONPATH": BASE_DIR,
+    }
+    if not caches:
+        # Repeated bench tickets would otherwise measure cache hits, not the pipeline
+        env.update({"ANSWER_CACHE_SIZE": "0", "EMBED_CACHE_SIZE": "0"})
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve_app(env: Dict[str, str], workers: int = 1, ready_timeout: float = 120.0) -> Iterator[str]:
+    """Run the API under uvicorn and yield its base URL once /ready says so."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + ready_timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"API exited with code {proc.returncode} before it was ready")
+            try:
+                if httpx.get(url + "/ready", timeout=2).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError(f"API not ready after {ready_timeout:.0f}s")
+            time.sleep(0.25)
+        yield url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def _run_module(module: str, args: List[str], env: Dict[str, str]) -> None:
+    subprocess.run([sys.executable, "-m", module, *args], cwd=BASE_DIR, env=env, check=True)
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """One row per shared metric; `regression` when it got worse by more than `tolerance` (0.25 = 25%)."""
+    rows = []
+    for section in ("micro", "load"):
+        for name, now in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+                if metric not in now or not before.get(metric):
+                    continue
+                change = now[metric] / before[metric] - 1
+                worse = change > tolerance if metric in LOWER_IS_BETTER else change < -tolerance
+                rows.append({
+                    "scenario": f"{section}:{name}",
+                    "metric": metric,
+                    "baseline": before[metric],
+                    "current": now[metric],
+                    "change": round(change, 4),
+                    "regression": worse,
+                })
+    return rows
+
+
+def print_comparison(rows: List[Dict]) -> None:
+    print(f"{'scenario':<36}{'metric':<8}{'baseline':>12}{'current':>12}{'change':>9}")
+    for r in rows:
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(
+            f"{r['scenario']:<36}{r['metric']:<8}{r['baseline']:>12.2f}{r['current']:>12.2f}"
+            f"{r['change']:>+9.1%}{flag}"
+        )
+
+
+def run_suite(
+    config: FakeConfig,
+    levels: List[int],
+    requests_per_level: int,
+    repeat: int,
+    workers: int = 1,
+    caches: bool = False,
+    micro: bool = True,
+    load: bool = True,
+    work_dir: str = BENCH_DIR,
+) -> Dict:
+    results: Dict = {
+        "config": {
+            "embed_latency_ms": [config.embed_latency.median_ms, config.embed_latency.p99_ms],
+            "llm_latency_ms": [config.llm_latency.median_ms, config.llm_latency.p99_ms],
+            "error_rate": config.error_rate,
+            "dim": config.dim,
+            "seed": config.seed,
+            "levels": levels,
+            "requests_per_level": requests_per_level,
+            "workers": workers,
+            "caches": caches,
+        },
+    }
+    os.makedirs(work_dir, exist_ok=True)
+    with FakeOpenAI(config) as fake:
+        env = bench_env(fake.url, os.path.join(work_dir, "index"), caches)
+        print(f"Fake OpenAI at {fake.url}; building the bench index...")
+        _run_module("src.rag.build_index", ["--full"], env)
+
+        if micro:
+            # Micro-benchmarks time local code, so query embeddings stay cached after their warmup pass
+            micro_path = os.path.join(work_dir, "micro.json")
+            micro_env = bench_env(fake.url, os.path.join(work_dir, "index"), caches=True)
+            _run_module("src.bench.micro", ["--repeat", str(repeat), "--out", micro_path], micro_env)
+            with open(micro_path, "r", encoding="utf-8") as f:
+                results["micro"] = json.load(f)
+
+        if load:
+            with serve_app(env, workers) as url:
+                results["load"] = run_load(url, levels=levels, requests_per_level=requests_per_level)
+            print_load(results["load"])
+        results["fake_openai"] = dict(fake.stats)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmarks against a fake OpenAI server, compared with a stored baseline."
+    )
+    parser.add_argument("--embed-latency", default="40:120", help="fake embeddings latency, median[:p99] ms")
+    parser.add_argument("--llm-latency", default="800:2500", help="fake responses latency, median[:p99] ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake API calls that fail")
+    parser.add_argument("--dim", type=int, default=256, help="fake embedding dimension")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated load levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per load level")
+    parser.add_argument("--repeat", type=int, default=50, help="micro-benchmark passes")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--caches", action="store_true", help="keep the embedding/answer caches on")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--out", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        embed_latency=Latency.parse(args.embed_latency),
+        llm_latency=Latency.parse(args.llm_latency),
+        error_rate=args.error_rate,
+        dim=args.dim,
+        seed=args.seed,
+    )
+    results = run_suite(
+        config,
+        levels=[int(c) for c in args.concurrency.split(",")],
+        requests_per_level=args.requests,
+        repeat=args.repeat,
+        workers=args.workers,
+        caches=args.caches,
+        micro=not args.skip_micro,
+        load=not args.skip_load,
+    )
+    print("Fake OpenAI calls:", results["fake_openai"])
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("Saved:", args.out)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("Saved baseline:", args.baseline)
+        return
+
+    baseline: Optional[Dict] = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    if baseline is None:
+        # Timings are machine-specific, so none is shipped; a gate with nothing to compare must not pass
+        print(f"No baseline at {args.baseline}: nothing was compared. Record one on this machine with --save-baseline.")
+        sys.exit(2)
+    if baseline.get("config") != results["config"]:
+        print("Warning: the baseline was recorded with different settings:", baseline.get("config"))
+
+    rows = compare(results, baseline, args.tolerance)
+    print_comparison(rows)
+    regressions = [r for r in rows if r["regression"]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}.")
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
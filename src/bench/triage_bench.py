@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import time
+from typing import Callable, Dict, List
+
+import joblib
+import numpy as np
+
+from src.bench.rules_bench import SAMPLE_TICKETS
+from src.triage.compiled import COMPILED_DIR, COMPILED_META_PATH, CompiledTriageModel
+from src.triage.registry import MODEL_PATH
+
+
+def _load_seconds(load: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        load()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def _latency_us(model, texts: List[str]) -> Dict[str, float]:
+    model.predict_proba(texts[:1])
+    lat = []
+    for t in texts:
+        t0 = time.perf_counter()
+        model.predict_proba([t])
+        lat.append((time.perf_counter() - t0) * 1e6)
+    return {"p50_us": round(float(np.percentile(lat, 50)), 1), "p95_us": round(float(np.percentile(lat, 95)), 1)}
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, fn)) for fn in os.listdir(path) if not fn.endswith(".tmp"))
+
+
+def _texts(n: int) -> List[str]:
+    try:
+        from src.ingest.preprocess import load_clean
+
+        texts = load_clean(["text"], nrows=n)["text"].dropna().astype(str).tolist()
+    except FileNotFoundError:
+        texts = []
+    return texts or SAMPLE_TICKETS
+
+
+def run_bench(model_path: str = MODEL_PATH, meta_path: str = COMPILED_META_PATH, n_texts: int = 1000,
+              load_repeat: int = 5) -> Dict:
+    texts = _texts(n_texts)
+    pipeline = joblib.load(model_path)
+    compiled = CompiledTriageModel(meta_path)
+    if not compiled.matches(model_path):
+        print(f"Warning: {meta_path} was not exported from the current {model_path}")
+
+    # Same labels and probabilities, within float tolerance
+    P_ref = pipeline.predict_proba(texts)
+    P = compiled.predict_proba(texts)
+    agreement = {
+        "tickets": len(texts),
+        "same_label": round(float((P_ref.argmax(axis=1) == P.argmax(axis=1)).mean()), 6),
+        "max_abs_proba_diff": float(np.abs(P_ref - P).max()),
+    }
+
+    return {
+        "agreement": agreement,
+        "joblib": {
+            "load_s": round(_load_seconds(lambda: joblib.load(model_path), load_repeat), 4),
+            "size_mb": round(os.path.getsize(model_path) / 1e6, 2),
+            **_latency_us(pipeline, texts),
+        },
+        "compiled": {
+            "load_s": round(_load_seconds(lambda: CompiledTriageModel(meta_path), load_repeat), 4),
+            "size_mb": round(_dir_bytes(os.path.dirname(meta_path)) / 1e6, 2),
+            **_latency_us(compiled, texts),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiled triage artifact vs the joblib pipeline.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--compiled", default=COMPILED_DIR, help="directory written by export_compiled")
+    parser.add_argument("--texts", type=int, default=1000, help="processed tickets to score (sample tickets if none)")
+    parser.add_argument("--load-repeat", type=int, default=5)
+    parser.add_argument("--out", default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    report = run_bench(args.model, os.path.join(args.compiled, "meta.json"), args.texts, args.load_repeat)
+    a = report["agreement"]
+    print(f"{a['tickets']} tickets: same label {a['same_label']:.2%}, max |proba diff| {a['max_abs_proba_diff']:.2e}")
+    print(f"{'artifact':<10}{'load s':>10}{'size MB':>10}{'p50 us':>10}{'p95 us':>10}")
+    for name in ("joblib", "compiled"):
+        r = report[name]
+        print(f"{name:<10}{r['load_s']:>10.4f}{r['size_mb']:>10.2f}{r['p50_us']:>10.1f}{r['p95_us']:>10.1f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("Saved:", args.out)
+
+
+if __name__ == "__main__":
+    main()
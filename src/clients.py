@@ -0,0 +1,32 @@
+import threading
+from typing import Any, Optional
+
+from src.config import OPENAI_API_KEY
+
+# One sync and one async OpenAI client per process, shared by answering and embedding.
+# Built on first use: importing openai alone costs more than the rest of the API's imports.
+_CLIENT: Optional[Any] = None
+_ACLIENT: Optional[Any] = None
+_LOCK = threading.Lock()
+
+
+def openai_client():
+    global _CLIENT
+    if _CLIENT is None:
+        with _LOCK:
+            if _CLIENT is None:
+                from openai import OpenAI
+
+                _CLIENT = OpenAI(api_key=OPENAI_API_KEY)
+    return _CLIENT
+
+
+def openai_async_client():
+    global _ACLIENT
+    if _ACLIENT is None:
+        with _LOCK:
+            if _ACLIENT is None:
+                from openai import AsyncOpenAI
+
+                _ACLIENT = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return _ACLIENT
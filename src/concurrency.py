@@ -0,0 +1,26 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from src.config import CPU_EXECUTOR_WORKERS
+
+T = TypeVar("T")
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def cpu_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu")
+    return _EXECUTOR
+
+
+async def run_cpu(fn: Callable[..., T], *args, **kwargs) -> T:
+    # sklearn and FAISS release the GIL for most of their work, so threads are enough here
+    # Run in a copy of the caller's context, so per-request state (stage timings) follows the work
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(cpu_executor(), functools.partial(ctx.run, fn, *args, **kwargs))
@@ -14,7 +14,103 @@ PROCESSED_DIR = os.path.join(DATA_DIR, "processed")
 KB_DIR = os.path.join(DATA_DIR, "kb")
 
 MODELS_DIR = os.path.join(BASE_DIR, "models")
-INDEX_DIR = os.path.join(BASE_DIR, "indexes")
+INDEX_DIR = os.getenv("INDEX_DIR", os.path.join(BASE_DIR, "indexes"))
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+# Nothing is created at import time; whatever writes into a directory creates it first
 
-for d in [RAW_DIR, PROCESSED_DIR, KB_DIR, MODELS_DIR, INDEX_DIR]:
-    os.makedirs(d, exist_ok=True)
+# Streaming preprocess: rows per chunk and worker processes (0 = all cores)
+PREPROCESS_CHUNKSIZE = int(os.getenv("PREPROCESS_CHUNKSIZE", "50000"))
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "0"))
+
+# Seconds between checks for a newer triage model on disk (0 disables hot-reload)
+TRIAGE_RELOAD_INTERVAL = float(os.getenv("TRIAGE_RELOAD_INTERVAL", "5"))
+# Serve from the compact array export of the triage pipeline when it is up to date (0 = always use joblib)
+TRIAGE_COMPILED = os.getenv("TRIAGE_COMPILED", "1") == "1"
+
+# Priority routing rules (hot-reloaded when the file changes)
+PRIORITY_RULES_PATH = os.getenv("PRIORITY_RULES_PATH", os.path.join(DATA_DIR, "rules", "priority_rules.json"))
+PRIORITY_RULES_RELOAD_INTERVAL = float(os.getenv("PRIORITY_RULES_RELOAD_INTERVAL", "5"))
+
+# Load the triage model, rules and KB index (and warm one embedding + search) when the API starts;
+# /ready reports 503 until that finishes. 0 = load everything lazily on first use
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
+# /analyze/batch limits
+BATCH_MAX_TICKETS = int(os.getenv("BATCH_MAX_TICKETS", "256"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+# Worker threads for CPU-bound sklearn / FAISS work off the event loop
+CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(os.cpu_count() or 4)))
+
+# Query embedding cache: in-process LRU + optional SQLite tier shared across workers ("" disables it)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", "86400"))
+EMBED_CACHE_DB = os.getenv("EMBED_CACHE_DB", os.path.join(CACHE_DIR, "embeddings.sqlite"))
+
+# Seconds between checks for a rebuilt KB index on disk (0 disables reloading)
+INDEX_RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "5"))
+
+# Semantic answer cache for generate_grounded_reply (rapidfuzz ratio, 0-100)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MIN_SIMILARITY = float(os.getenv("ANSWER_CACHE_MIN_SIMILARITY", "95"))
+
+# Index-build embedding batches (OpenAI allows 2048 inputs / 300k tokens per request)
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "512"))
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "100000"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+
+# FAISS index type: auto | flat | hnsw | ivf_flat | ivf_pq ("auto" picks by chunk count)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 = ~4*sqrt(n)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+PQ_M = int(os.getenv("PQ_M", "0"))  # 0 = largest divisor of dim <= 64
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+
+# Embedding backend: "openai" (remote API) or "local" (CPU-only TF-IDF + SVD projection fit at build time)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "openai")
+LOCAL_EMBED_DIM = int(os.getenv("LOCAL_EMBED_DIM", "256"))
+LOCAL_EMBED_MAX_FEATURES = int(os.getenv("LOCAL_EMBED_MAX_FEATURES", "100000"))
+LOCAL_EMBED_CFPB_ROWS = int(os.getenv("LOCAL_EMBED_CFPB_ROWS", "20000"))  # extra fit corpus; 0 = KB only
+
+# Hybrid retrieval: BM25 + dense ranks merged with reciprocal rank fusion
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Hits are gated on their own signal's scale: the retrieve() min_score is cosine, lexical-only hits use this
+LEXICAL_MIN_SCORE = float(os.getenv("LEXICAL_MIN_SCORE", "0.25"))  # normalized BM25, 0-1
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Lexical fast path: skip the embedding call when the top BM25 hit is decisive
+LEXICAL_FASTPATH = os.getenv("LEXICAL_FASTPATH", "1") == "1"
+LEXICAL_FASTPATH_MIN_SCORE = float(os.getenv("LEXICAL_FASTPATH_MIN_SCORE", "0.4"))  # normalized BM25, 0-1
+LEXICAL_FASTPATH_MARGIN = float(os.getenv("LEXICAL_FASTPATH_MARGIN", "1.5"))  # top / runner-up
+
+# KB chunking: section-aligned chunks of at most this many tokens
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))  # chunks retrieved per ticket
+
+# Prompt context packing: merged, deduplicated KB spans cut on sentence/heading boundaries
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "700"))
+
+# LLM tail latency: a budget per grounded reply (0 = none), optional hedged requests and a circuit breaker.
+# Past the budget, or while the breaker is open, the reply is built from the retrieved KB sections instead.
+REPLY_BUDGET_S = float(os.getenv("REPLY_BUDGET_S", "10"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))  # of recent LLM latencies
+LLM_HEDGE_MIN_DELAY_S = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "0.5"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # consecutive failures that open it
+LLM_BREAKER_COOLDOWN_S = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))  # open time before one probe call
+
+# Extractive replies: a KB section that clearly answers the ticket is sent as is, without an LLM call.
+# A hit's score is cosine when it has a dense match, else normalized BM25; each scale has its own gate.
+EXTRACTIVE_REPLIES = os.getenv("EXTRACTIVE_REPLIES", "1") == "1"
+EXTRACTIVE_MIN_SCORE = float(os.getenv("EXTRACTIVE_MIN_SCORE", "0.75"))  # cosine
+EXTRACTIVE_MARGIN = float(os.getenv("EXTRACTIVE_MARGIN", "0.15"))  # over the next-best span
+EXTRACTIVE_LEXICAL_MIN_SCORE = float(os.getenv("EXTRACTIVE_LEXICAL_MIN_SCORE", "0.6"))  # normalized BM25
+EXTRACTIVE_LEXICAL_MARGIN = float(os.getenv("EXTRACTIVE_LEXICAL_MARGIN", "0.2"))
+EXTRACTIVE_MAX_TOKENS = int(os.getenv("EXTRACTIVE_MAX_TOKENS", "200"))
@@ -1,8 +1,17 @@
+import argparse
+import csv
+import io
 import os
 import time
 import zipfile
-import requests
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import requests
 from tqdm import tqdm
 
 from src.config import RAW_DIR
@@ -54,56 +63,204 @@ def download_with_resume(url: str, dest_path: str, max_retries: int = 30) -> Non
 
     raise RuntimeError("Download failed after many retries. Try Option A with curl.exe.")
 
-def download_and_sample(sample_rows: int = 50000) -> str:
-    zip_path = os.path.join(RAW_DIR, "complaints.csv.zip")
-    out_csv = os.path.join(RAW_DIR, f"cfpb_sample_{sample_rows}.csv")
+NARRATIVE_COL_CANDIDATES = [
+    "consumer_complaint_narrative",
+    "Consumer complaint narrative",
+    "Consumer Complaint Narrative",
+]
+PRODUCT_COL_CANDIDATES = ["product", "Product"]
+ISSUE_COL_CANDIDATES = ["issue", "Issue"]
 
-    download_with_resume(CSV_ZIP_URL, zip_path)
+MIN_NARRATIVE_CHARS = 30
 
-    # Extract CSV
-    with zipfile.ZipFile(zip_path, "r") as z:
-        csv_name = [n for n in z.namelist() if n.lower().endswith(".csv")][0]
-        extracted_csv_path = os.path.join(RAW_DIR, csv_name)
-        if not os.path.exists(extracted_csv_path):
-            z.extract(csv_name, path=RAW_DIR)
 
-    # Sample in chunks (keep rows that have narratives)
-    narrative_col_candidates = [
-        "consumer_complaint_narrative",
-        "Consumer complaint narrative",
-        "Consumer Complaint Narrative",
-    ]
+def _zip_member(z: zipfile.ZipFile) -> str:
+    return [n for n in z.namelist() if n.lower().endswith(".csv")][0]
+
+
+def _header(z: zipfile.ZipFile, member: str) -> List[str]:
+    with z.open(member) as f:
+        line = io.TextIOWrapper(f, encoding="utf-8-sig", newline="").readline()
+    return next(csv.reader([line]))
+
+
+def _pick(columns: List[str], candidates: List[str]) -> Optional[str]:
+    return next((c for c in candidates if c in columns), None)
+
+
+def _bottom_k(keys: np.ndarray, k: int) -> np.ndarray:
+    # Indices of the k smallest random keys: a uniform sample of everything seen so far
+    if len(keys) <= k:
+        return np.arange(len(keys))
+    return np.argpartition(keys, k - 1)[:k]
+
+
+class _Reservoir:
+    """Bottom-k sample of arrow rows: each row draws a uniform key, the k smallest keys are kept."""
+
+    def __init__(self, k: int):
+        self.k = k
+        self.table: Optional[pa.Table] = None
+        self.keys = np.empty(0)
 
-    kept = []
-    kept_count = 0
+    def add(self, table: pa.Table, keys: np.ndarray) -> None:
+        merged = table if self.table is None else pa.concat_tables([self.table, table])
+        all_keys = np.concatenate([self.keys, keys])
+        keep = _bottom_k(all_keys, self.k)
+        self.table = merged.take(pa.array(keep))
+        self.keys = all_keys[keep]
 
-    for chunk in pd.read_csv(extracted_csv_path, chunksize=20000, low_memory=False):
-        narrative_col = next((c for c in narrative_col_candidates if c in chunk.columns), None)
+    def __len__(self) -> int:
+        return 0 if self.table is None else self.table.num_rows
 
-        if narrative_col:
-            chunk = chunk[chunk[narrative_col].notna() & (chunk[narrative_col].astype(str).str.len() > 30)]
 
-        if len(chunk) == 0:
+def _allocate(sizes: Dict[str, int], total: int) -> Dict[str, int]:
+    # Equal share per product; products with fewer rows than their share hand the rest to the others
+    quota: Dict[str, int] = {}
+    left, open_ = total, sorted(sizes, key=sizes.get)
+    while open_:
+        share = left // len(open_)
+        name = open_[0]
+        if sizes[name] <= share:
+            quota[name] = sizes[name]
+            left -= sizes[name]
+            open_.pop(0)
             continue
+        for i, name in enumerate(open_):
+            quota[name] = share + (1 if i < left - share * len(open_) else 0)
+        break
+    return quota
 
-        remaining = sample_rows - kept_count
-        if remaining <= 0:
-            break
 
-        chunk = chunk.head(remaining)
-        kept.append(chunk)
-        kept_count += len(chunk)
+def sample_zip(
+    zip_path: str,
+    sample_rows: int = 50000,
+    strategy: str = "reservoir",
+    seed: int = 42,
+    block_size: int = 8 << 20,
+) -> Tuple[pd.DataFrame, Dict]:
+    """One pass over the CSV inside the zip, without extracting it.
 
-        if kept_count >= sample_rows:
-            break
+    Only narrative, product and issue are parsed (pyarrow's streaming CSV reader); rows with a narrative
+    of at least MIN_NARRATIVE_CHARS are sampled uniformly ("reservoir") or with an equal share per product
+    ("stratified"). Memory stays around sample_rows (2x for stratified) plus one block.
+    """
+    if strategy not in ("reservoir", "stratified"):
+        raise ValueError(f"Unknown sampling strategy: {strategy}")
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
 
-    if not kept:
+    with zipfile.ZipFile(zip_path, "r") as z:
+        member = _zip_member(z)
+        header = _header(z, member)
+        narrative_col = _pick(header, NARRATIVE_COL_CANDIDATES)
+        product_col = _pick(header, PRODUCT_COL_CANDIDATES)
+        issue_col = _pick(header, ISSUE_COL_CANDIDATES)
+        if not narrative_col or not product_col:
+            raise RuntimeError(f"No narrative/product column in {member}. Column names may have changed: {header[:20]}")
+        columns = [c for c in (narrative_col, product_col, issue_col) if c]
+
+        # Everything as strings: no type inference work on columns we only filter and copy
+        reader = pacsv.open_csv(
+            z.open(member),
+            read_options=pacsv.ReadOptions(block_size=block_size),
+            # Narratives are quoted and often span several lines; block boundaries can fall inside them
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=columns,
+                column_types={c: pa.string() for c in columns},
+                strings_can_be_null=True,
+            ),
+        )
+
+        scanned = 0
+        # Row number in the file, so the sample can be written back in file order
+        row_col = "__row"
+        if strategy == "reservoir":
+            strata: Dict[str, _Reservoir] = {"": _Reservoir(sample_rows)}
+        else:
+            strata = {}
+        for batch in reader:
+            n = batch.num_rows
+            table = pa.Table.from_batches([batch]).append_column(row_col, pa.array(np.arange(scanned, scanned + n)))
+            scanned += n
+
+            narrative = table.column(narrative_col)
+            mask = pc.and_kleene(pc.is_valid(narrative), pc.greater(pc.utf8_length(narrative), MIN_NARRATIVE_CHARS))
+            table = table.filter(pc.fill_null(mask, False))
+            if table.num_rows == 0:
+                continue
+            keys = rng.random(table.num_rows)
+
+            if strategy == "reservoir":
+                strata[""].add(table, keys)
+                continue
+
+            products = pc.fill_null(table.column(product_col), "Unknown")
+            # At most 2 x an equal share per product is kept, which leaves room to rebalance at the end
+            for product in pc.unique(products).to_pylist():
+                sel = pc.equal(products, product)
+                idx = np.flatnonzero(sel.to_numpy(zero_copy_only=False))
+                strata.setdefault(product, _Reservoir(sample_rows)).add(table.filter(sel), keys[idx])
+            cap = max(1, -(-2 * sample_rows // len(strata)))
+            for r in strata.values():
+                if r.k > cap:
+                    r.k = cap
+                    keep = _bottom_k(r.keys, cap)
+                    r.table, r.keys = r.table.take(pa.array(keep)), r.keys[keep]
+
+    if strategy == "reservoir":
+        parts = [strata[""].table] if len(strata[""]) else []
+    else:
+        quota = _allocate({name: len(r) for name, r in strata.items()}, sample_rows)
+        parts = []
+        for name, r in strata.items():
+            if quota.get(name):
+                parts.append(r.table.take(pa.array(_bottom_k(r.keys, quota[name]))))
+
+    if not parts:
         raise RuntimeError("No rows collected. Column names may have changed.")
+    table = pa.concat_tables(parts)
+    table = table.take(pc.sort_indices(table, [(row_col, "ascending")])).drop_columns([row_col])
+    df = table.to_pandas()
 
-    df = pd.concat(kept, ignore_index=True)
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "member": member,
+        "strategy": strategy,
+        "rows_scanned": scanned,
+        "rows_sampled": len(df),
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(scanned / elapsed, 1) if elapsed > 0 else None,
+        "by_product": df[product_col].fillna("Unknown").value_counts().to_dict(),
+    }
+    return df, stats
+
+
+def download_and_sample(sample_rows: int = 50000, strategy: str = "reservoir", seed: int = 42, download: bool = True) -> str:
+    zip_path = os.path.join(RAW_DIR, "complaints.csv.zip")
+    out_csv = os.path.join(RAW_DIR, f"cfpb_sample_{sample_rows}.csv")
+
+    if download or not os.path.exists(zip_path):
+        download_with_resume(CSV_ZIP_URL, zip_path)
+
+    # Read straight from the archive: nothing is extracted, so disk use is just the zip
+    df, stats = sample_zip(zip_path, sample_rows=sample_rows, strategy=strategy, seed=seed)
     df.to_csv(out_csv, index=False)
+    print(
+        f"Sampled {stats['rows_sampled']} of {stats['rows_scanned']} rows ({stats['strategy']}) "
+        f"in {stats['seconds']}s, {stats['rows_per_s']} rows/s."
+    )
     return out_csv
 
 if __name__ == "__main__":
-    path = download_and_sample(sample_rows=50000)
+    parser = argparse.ArgumentParser(description="Download the CFPB complaints archive and sample narratives from it.")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--strategy", choices=["reservoir", "stratified"], default="reservoir",
+                        help="uniform sample, or an equal share per product")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-download", action="store_true", help="use the zip already in data/raw")
+    args = parser.parse_args()
+
+    path = download_and_sample(args.rows, args.strategy, args.seed, download=not args.no_download)
     print("Saved sample CSV:", path)
@@ -1,7 +1,22 @@
+import argparse
 import os
 import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
 import pandas as pd
-from src.config import RAW_DIR, PROCESSED_DIR
+from src.config import PREPROCESS_CHUNKSIZE, PREPROCESS_WORKERS, RAW_DIR, PROCESSED_DIR
+
+try:  # Unix only; peak memory is reported as n/a elsewhere
+    import resource
+except ImportError:  # pragma: no cover - depends on the platform
+    resource = None
+
+CLEAN_CSV_PATH = os.path.join(PROCESSED_DIR, "cfpb_clean.csv")
+# Directory of part-NNNNN.parquet files, one per input chunk
+CLEAN_PARQUET_DIR = os.path.join(PROCESSED_DIR, "cfpb_clean.parquet")
 
 PII_PATTERNS = [
     (re.compile(r"\b[\w\.-]+@[\w\.-]+\.\w+\b"), "[EMAIL]"),
@@ -55,6 +70,9 @@ SUPPORT_MAP = {
     "Money transfers": "Payments/Transfers",
 }
 
+# Fixed category list so every Parquet part shares one dictionary
+SUPPORT_LABELS = sorted(set(SUPPORT_MAP.values()))
+
 def scrub_pii(text: str) -> str:
     if not isinstance(text, str):
         return ""
@@ -69,46 +87,238 @@ def pick_col(df: pd.DataFrame, candidates):
             return c
     return None
 
-def preprocess(input_csv: str) -> str:
-    df = pd.read_csv(input_csv, low_memory=False)
-
-    text_col = pick_col(df, TEXT_COL_CANDIDATES)
-    label_col = pick_col(df, LABEL_COL_CANDIDATES)
+def pick_columns(input_csv: str) -> Tuple[str, str]:
+    header = pd.read_csv(input_csv, nrows=0)
+    text_col = pick_col(header, TEXT_COL_CANDIDATES)
+    label_col = pick_col(header, LABEL_COL_CANDIDATES)
 
     if not text_col or not label_col:
         raise ValueError(
             f"Missing required columns.\n"
-            f"Found columns: {list(df.columns)[:40]}\n"
+            f"Found columns: {list(header.columns)[:40]}\n"
             f"Expected one of text={TEXT_COL_CANDIDATES} and label={LABEL_COL_CANDIDATES}"
         )
+    return text_col, label_col
+
+def _string_dtype():
+    # Arrow-backed strings run str.replace as one compiled (RE2) kernel over the whole column
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return object
+    return pd.StringDtype("pyarrow")
+
+# RE2's \w, \d and \b are ASCII-only and it has no lookarounds to build a Unicode \b from, so only
+# pure-ASCII rows take the vectorized path; on those its classes agree with `re` except for \s
+_NON_ASCII = r"[^\x00-\x7f]"
+_RE_ASCII_SPACE = r"\t\n\x0b\f\r\x1c-\x1f "
 
+# Inputs where a plain RE2 port of PII_PATTERNS would disagree with `re`: Unicode letters and
+# digits (full-width, Arabic-Indic) next to or inside PII, and whitespace outside RE2's \s
+PII_PARITY_SAMPLES = [
+    "  call me at 555-123-4567 or mail jane.doe@example.com  ",
+    "mail jörg@example.com or ünal@exämple.de",
+    "call me at ５５５-１２３-４５６７ today",
+    "رقمي ٣٤٥٦٧٨٩٠١٢٣٤ شكرا",
+    "é123-456-7890 and 123-456-7890é",
+    "555\xa0123\xa04567 and 555\u2009123\u20094567",
+    "tab\x0b555\x1c123 4567\x1f",
+]
+
+def _vector_pattern(pattern: str) -> str:
+    # For ASCII-only text: `re`'s \s also matches \v and \x1c-\x1f, RE2's does not
+    out, in_class, i = [], False, 0
+    while i < len(pattern):
+        if pattern.startswith(r"\s", i):
+            out.append(_RE_ASCII_SPACE if in_class else f"[{_RE_ASCII_SPACE}]")
+            i += 2
+            continue
+        ch = pattern[i]
+        if ch == "\\":
+            out.append(pattern[i:i + 2])
+            i += 2
+            continue
+        in_class = (in_class or ch == "[") and ch != "]"
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+def _scrub_column(text: pd.Series) -> pd.Series:
+    """scrub_pii over a string column: one RE2 kernel per pattern for ASCII rows, `re` for the rest."""
+    if text.dtype == object:
+        return text.map(scrub_pii)
+    wide = text.str.contains(_NON_ASCII, regex=True)
+    narrow = text[~wide]
+    for pat, rep in PII_PATTERNS:
+        narrow = narrow.str.replace(_vector_pattern(pat.pattern), rep, regex=True)
+    scrubbed = pd.concat([narrow.str.strip(), text[wide].map(scrub_pii).astype(text.dtype)])
+    return scrubbed.reindex(text.index)
+
+def check_scrub_parity(samples=PII_PARITY_SAMPLES) -> None:
+    # Guards the vectorized path against drifting from scrub_pii (PII would reach the training data)
+    dtype = _string_dtype()
+    got = _scrub_column(pd.Series(samples, dtype=dtype)).tolist()
+    for text, out in zip(samples, got):
+        want = scrub_pii(text)
+        if out != want:
+            raise RuntimeError(f"Vectorized PII scrubbing differs from scrub_pii on {text!r}: {out!r} != {want!r}")
+
+def clean_frame(df: pd.DataFrame, text_col: str = "text", label_col: str = "label") -> pd.DataFrame:
     df = df[[text_col, label_col]].rename(columns={text_col: "text", label_col: "label"})
 
-    df["text"] = df["text"].fillna("").astype(str).map(scrub_pii)
-    df["label"] = df["label"].fillna("Unknown").astype(str)
+    text = _scrub_column(df["text"].astype(_string_dtype()).fillna(""))
+
+    # Map the few distinct CFPB products once, not per row; unknown/rare -> NaN (the old "Other")
+    labels = df["label"].astype("category").cat.rename_categories(lambda c: str(c))
+    labels = pd.Categorical(labels.map(SUPPORT_MAP, na_action="ignore"), categories=SUPPORT_LABELS)
 
-    # Keep only rows with meaningful narratives
-    df = df[df["text"].str.len() >= 30]
+    out = pd.DataFrame({"text": text, "label": labels}, index=df.index)
+    # Keep only rows with meaningful narratives; 'Other' stays out of training (fallback at inference time)
+    return out[(out["text"].str.len() >= 30) & out["label"].notna()].reset_index(drop=True)
 
-    # Map to support categories (unknown/rare -> Other)
-    df["label"] = df["label"].map(lambda x: SUPPORT_MAP.get(x, "Other"))
+def preprocess(input_csv: str) -> str:
+    # Single in-memory pass to one CSV (small samples); see preprocess_stream for the full dump
+    check_scrub_parity()
+    text_col, label_col = pick_columns(input_csv)
+    df = pd.read_csv(input_csv, usecols=[text_col, label_col], low_memory=False)
+    os.makedirs(os.path.dirname(CLEAN_CSV_PATH), exist_ok=True)
+    clean_frame(df, text_col, label_col).to_csv(CLEAN_CSV_PATH, index=False)
+    return CLEAN_CSV_PATH
+
+def _clean_part(args: Tuple[int, pd.DataFrame, str, str, str]) -> Tuple[int, int]:
+    part, df, text_col, label_col, out_dir = args
+    clean = clean_frame(df, text_col, label_col)
+    clean.to_parquet(os.path.join(out_dir, f"part-{part:05d}.parquet"), index=False)
+    return len(df), len(clean)
+
+def _peak_rss_mb() -> Dict[str, Optional[float]]:
+    if resource is None:
+        return {"main": None, "workers": None}
+    # ru_maxrss is KiB on Linux; for children it is the largest single worker
+    return {
+        "main": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "workers": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+def preprocess_stream(
+    input_csv: str,
+    out_dir: str = CLEAN_PARQUET_DIR,
+    chunksize: int = PREPROCESS_CHUNKSIZE,
+    workers: int = PREPROCESS_WORKERS,
+) -> Dict:
+    """Clean a CSV of any size chunk by chunk across a process pool into a directory of Parquet parts.
+
+    Only the text and label columns are parsed, and at most 2 x workers chunks are in flight.
+    """
+    t0 = time.perf_counter()
+    check_scrub_parity()
+    text_col, label_col = pick_columns(input_csv)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    reader = pd.read_csv(input_csv, usecols=[text_col, label_col], chunksize=chunksize, dtype=str)
+    jobs = ((i, chunk, text_col, label_col, tmp_dir) for i, chunk in enumerate(reader))
+    rows_in = rows_out = parts = 0
+    if workers == 1:
+        for n_in, n_out in map(_clean_part, jobs):
+            rows_in, rows_out, parts = rows_in + n_in, rows_out + n_out, parts + 1
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for job in jobs:
+                pending.append(pool.submit(_clean_part, job))
+                if len(pending) >= 2 * workers:
+                    n_in, n_out = pending.pop(0).result()
+                    rows_in, rows_out, parts = rows_in + n_in, rows_out + n_out, parts + 1
+            for fut in pending:
+                n_in, n_out = fut.result()
+                rows_in, rows_out, parts = rows_in + n_in, rows_out + n_out, parts + 1
+
+    # Swap the finished dataset in; readers never see a half-written directory
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
 
-    # Remove 'Other' from training (keep it as a fallback at inference time)
-    df = df[df["label"] != "Other"]
+    elapsed = time.perf_counter() - t0
+    return {
+        "out_dir": out_dir,
+        "parts": parts,
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(rows_in / elapsed, 1) if elapsed > 0 else None,
+        "workers": workers,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
 
-    out_path = os.path.join(PROCESSED_DIR, "cfpb_clean.csv")
-    df.to_csv(out_path, index=False)
-    return out_path
+def load_clean(columns=("text", "label"), nrows: Optional[int] = None) -> pd.DataFrame:
+    # Parquet output if present (reads only the requested columns), else the CSV from preprocess()
+    columns = list(columns)
+    if os.path.isdir(CLEAN_PARQUET_DIR):
+        if nrows is None:
+            return pd.read_parquet(CLEAN_PARQUET_DIR, columns=columns)
+        frames, total = [], 0
+        for fn in sorted(os.listdir(CLEAN_PARQUET_DIR)):
+            if total >= nrows:
+                break
+            df = pd.read_parquet(os.path.join(CLEAN_PARQUET_DIR, fn), columns=columns)
+            frames.append(df.head(nrows - total))
+            total += len(frames[-1])
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    if os.path.exists(CLEAN_CSV_PATH):
+        return pd.read_csv(CLEAN_CSV_PATH, usecols=columns, nrows=nrows)
+    raise FileNotFoundError(
+        f"Processed dataset not found: {CLEAN_PARQUET_DIR} or {CLEAN_CSV_PATH}. Run preprocess first."
+    )
+
+def iter_clean(columns=("text", "label"), batch_rows: int = PREPROCESS_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    # Same sources as load_clean, but batch by batch so the dataset never has to fit in memory
+    columns = list(columns)
+    if os.path.isdir(CLEAN_PARQUET_DIR):
+        import pyarrow.parquet as pq
+
+        for fn in sorted(os.listdir(CLEAN_PARQUET_DIR)):
+            pf = pq.ParquetFile(os.path.join(CLEAN_PARQUET_DIR, fn))
+            for batch in pf.iter_batches(batch_size=batch_rows, columns=columns):
+                yield batch.to_pandas()
+    elif os.path.exists(CLEAN_CSV_PATH):
+        yield from pd.read_csv(CLEAN_CSV_PATH, usecols=columns, chunksize=batch_rows)
+    else:
+        raise FileNotFoundError(
+            f"Processed dataset not found: {CLEAN_PARQUET_DIR} or {CLEAN_CSV_PATH}. Run preprocess first."
+        )
 
 if __name__ == "__main__":
-    # pick newest csv in raw/
-    files = [f for f in os.listdir(RAW_DIR) if f.lower().endswith(".csv") and "cfpb_sample" in f.lower()]
-    if not files:
-        files = [f for f in os.listdir(RAW_DIR) if f.lower().endswith(".csv")]
-    if not files:
-        raise SystemExit("No CSV found in data/raw. Run download script first.")
-
-    files.sort()
-    in_path = os.path.join(RAW_DIR, files[-1])
-    out = preprocess(in_path)
-    print("Saved:", out)
+    parser = argparse.ArgumentParser(description="Clean the raw CFPB CSV into training data.")
+    parser.add_argument("input", nargs="?", default=None, help="raw CSV (default: newest in data/raw)")
+    parser.add_argument("--csv", action="store_true", help="single in-memory pass to cfpb_clean.csv")
+    parser.add_argument("--chunksize", type=int, default=PREPROCESS_CHUNKSIZE)
+    parser.add_argument("--workers", type=int, default=PREPROCESS_WORKERS, help="0 = all cores")
+    args = parser.parse_args()
+
+    in_path = args.input
+    if in_path is None:
+        # pick newest csv in raw/
+        raw = os.listdir(RAW_DIR) if os.path.isdir(RAW_DIR) else []
+        files = [f for f in raw if f.lower().endswith(".csv") and "cfpb_sample" in f.lower()]
+        if not files:
+            files = [f for f in raw if f.lower().endswith(".csv")]
+        if not files:
+            raise SystemExit("No CSV found in data/raw. Run download script first.")
+
+        files.sort()
+        in_path = os.path.join(RAW_DIR, files[-1])
+
+    if args.csv:
+        print("Saved:", preprocess(in_path))
+    else:
+        stats = preprocess_stream(in_path, chunksize=args.chunksize, workers=args.workers)
+        peak = {k: f"{mb:.0f} MB" if mb is not None else "n/a" for k, mb in stats["peak_rss_mb"].items()}
+        print(
+            f"Cleaned {stats['rows_in']} rows -> {stats['rows_out']} in {stats['parts']} parts "
+            f"with {stats['workers']} workers: {stats['rows_per_s']} rows/s ({stats['seconds']}s), "
+            f"peak RSS main {peak['main']}, largest worker {peak['workers']}."
+        )
+        print("Saved:", stats["out_dir"])
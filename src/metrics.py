@@ -0,0 +1,203 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Prometheus text-format metrics without a client library: a dict update under a lock per observation.
+# Label values are passed positionally, in the order the metric declares its label names.
+
+# Seconds: sub-millisecond CPU stages up to multi-second LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def totals(self, *labels: str) -> Tuple[float, int]:
+        # (sum, count) for one label set
+        entry = self._values.get(labels)
+        return (entry[1], entry[2]) if entry else (0.0, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items())
+        lines = self._header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="' + ("+Inf" if bound == float("inf") else _num(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {n}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(line for m in _REGISTRY for line in m.render()) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_SECONDS = Histogram(
+    "copilot_http_request_seconds", "HTTP request latency by route.", ["method", "route", "status"]
+)
+STAGE_SECONDS = Histogram(
+    "copilot_stage_seconds",
+    "Time per pipeline stage (triage, priority, bm25, embed, faiss, extract, context, llm, parse).",
+    ["stage"],
+)
+STAGE_ERRORS = Counter("copilot_stage_errors_total", "Exceptions raised inside a pipeline stage.", ["stage"])
+TICKETS = Counter("copilot_tickets_total", "Tickets analyzed, by endpoint.", ["endpoint"])
+CACHE_LOOKUPS = Counter("copilot_cache_lookups_total", "Embedding and answer cache lookups.", ["cache", "result"])
+REPLY_OUTCOMES = Counter(
+    "copilot_reply_outcomes_total",
+    "How each reply was produced: generated, extractive, cached, retrieval_only, or a not-found fallback "
+    "(no_context, model, parse_error).",
+    ["outcome"],
+)
+REPLY_PARSE = Counter(
+    "copilot_reply_parse_total", "LLM JSON handling: json, repaired (outer braces cut out) or failed.", ["path"]
+)
+LLM_TOKENS = Counter("copilot_llm_tokens_total", "Tokens reported by the OpenAI API.", ["model", "kind"])
+LLM_FALLBACKS = Counter(
+    "copilot_llm_fallbacks_total",
+    "Replies built from retrieval alone, by reason: breaker_open, deadline or error.",
+    ["reason"],
+)
+LLM_HEDGES = Counter(
+    "copilot_llm_hedges_total", "Hedged LLM requests: fired, then primary_won or hedge_won.", ["event"]
+)
+BREAKER_STATE = Gauge("copilot_llm_breaker_state", "LLM circuit breaker: 0 closed, 1 half-open, 2 open.")
+BREAKER_TRANSITIONS = Counter("copilot_llm_breaker_transitions_total", "Breaker state changes, by new state.", ["state"])
+
+
+# Per-request stage durations for the Server-Timing header; None outside a request
+_TIMINGS: ContextVar[Optional[Dict[str, float]]] = ContextVar("copilot_timings", default=None)
+
+
+def begin_request():
+    timings: Dict[str, float] = {}
+    return _TIMINGS.set(timings), timings
+
+
+def end_request(token) -> None:
+    _TIMINGS.reset(token)
+
+
+class stage:
+    """`with stage("faiss"): ...` records into copilot_stage_seconds and the request's Server-Timing."""
+
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "stage":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        dt = time.perf_counter() - self.t0
+        STAGE_SECONDS.observe(dt, self.name)
+        # Cancellation / client disconnects (BaseException) are not stage errors
+        if exc_type is not None and issubclass(exc_type, Exception):
+            STAGE_ERRORS.inc(self.name)
+        timings = _TIMINGS.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + dt
+        return False
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={dt * 1000:.2f}" for name, dt in timings.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def record_usage(model: str, usage, prompt_attr: str = "input_tokens", completion_attr: str = "output_tokens") -> None:
+    # Responses API reports input/output tokens; embeddings only prompt_tokens
+    if usage is None:
+        return
+    prompt = getattr(usage, prompt_attr, None)
+    if prompt:
+        LLM_TOKENS.inc(model, "prompt", amount=prompt)
+    completion = getattr(usage, completion_attr, None) if completion_attr else None
+    if completion:
+        LLM_TOKENS.inc(model, "completion", amount=completion)
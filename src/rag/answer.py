@@ -1,11 +1,44 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+import asyncio
 import json
+import logging
+import re
+import time
 
-from openai import OpenAI
-from src.config import OPENAI_API_KEY, OPENAI_MODEL
-from src.rag.retrieve import retrieve
+from src.clients import openai_async_client, openai_client
+from src.config import (
+    OPENAI_MODEL,
+    BATCH_LLM_CONCURRENCY,
+    EXTRACTIVE_LEXICAL_MARGIN,
+    EXTRACTIVE_LEXICAL_MIN_SCORE,
+    EXTRACTIVE_MARGIN,
+    EXTRACTIVE_MAX_TOKENS,
+    EXTRACTIVE_MIN_SCORE,
+    EXTRACTIVE_REPLIES,
+    REPLY_BUDGET_S,
+    RETRIEVAL_K,
+)
+from src.concurrency import run_cpu
+from src.metrics import (
+    CACHE_LOOKUPS,
+    LLM_FALLBACKS,
+    REPLY_OUTCOMES,
+    REPLY_PARSE,
+    STAGE_SECONDS,
+    record_usage,
+    stage,
+)
+from src.rag.answer_cache import answer_cache
+from src.rag.context import extract_section, pack_context
+from src.rag.llm_guard import CircuitOpen, acall_llm, breaker, call_llm
+from src.rag.retrieve import (
+    aretrieve_batch_with_paths,
+    aretrieve_with_path,
+    index_version,
+    retrieve_with_path,
+)
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+logger = logging.getLogger(__name__)
 
 RESPONSE_SCHEMA = {
     "name": "support_reply",
@@ -34,11 +67,12 @@ RESPONSE_SCHEMA = {
 }
 
 def build_prompt(ticket_text: str, retrieved: List[Dict]) -> str:
-    context_lines = []
-    for r in retrieved:
-        snippet = r["chunk"][:600]
-        context_lines.append(f"[{r['doc_id']} | {r['title']}]\n{snippet}\n")
-    context = "\n---\n".join(context_lines)
+    return prepare_prompt(ticket_text, retrieved)[0]
+
+def prepare_prompt(ticket_text: str, retrieved: List[Dict]) -> Tuple[str, Dict[str, int]]:
+    # Overlapping hits merged, duplicates dropped, packed into CONTEXT_TOKEN_BUDGET
+    with stage("context"):
+        context, report = pack_context(retrieved)
 
     return f"""
 You are a customer support assistant.
@@ -54,7 +88,7 @@ TICKET:
 
 KB CONTEXT:
 {context}
-""".strip()
+""".strip(), report
 
 def _extract_json_text(resp) -> str:
     try:
@@ -74,53 +108,406 @@ def _fallback_not_found() -> Dict[str, Any]:
         "citations": [],
     }
 
-def generate_grounded_reply(ticket_text: str) -> Dict[str, Any]:
-    # ✅ Add threshold to avoid weak/irrelevant retrieval
-    retrieved = retrieve(ticket_text, k=4, min_score=0.25)
+def _excerpt(chunk: str, limit: int = 300) -> str:
+    # Chunk body without its markdown headings, cut on a word boundary
+    text = " ".join(ln.strip() for ln in chunk.splitlines() if ln.strip() and not ln.lstrip().startswith("#"))
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "…"
 
-    # ✅ Strict fallback when nothing relevant is found
-    if not retrieved:
-        return _fallback_not_found()
+def _retrieval_only(retrieved: List[Dict], reason: str) -> Dict[str, Any]:
+    # No LLM answer in time (or the breaker is open): point the customer at the best KB sections instead
+    REPLY_OUTCOMES.inc("retrieval_only")
+    LLM_FALLBACKS.inc(reason)
+    top = retrieved[:2]
+    sections = "\n".join(f"- {r.get('section') or r['title']}: {_excerpt(r['chunk'])}" for r in top)
+    return {
+        "found_in_kb": True,
+        "final_reply": f"Here is what our help center says about this:\n{sections}",
+        "citations": citations_from(top),
+        "reply_mode": "retrieval_only",
+    }
 
-    prompt = build_prompt(ticket_text, retrieved)
-
-    resp = client.responses.create(
-        model=OPENAI_MODEL,
-        input=prompt,
-        text={
-            "format": {
-                "type": "json_schema",
-                "name": RESPONSE_SCHEMA["name"],
-                "schema": RESPONSE_SCHEMA["schema"],
-                "strict": True,
-            }
-        },
-    )
+# (min_score, margin) per hit signal: cosine for dense hits, normalized BM25 for lexical-only ones
+EXTRACTIVE_GATES = {
+    "dense": (EXTRACTIVE_MIN_SCORE, EXTRACTIVE_MARGIN),
+    "lexical": (EXTRACTIVE_LEXICAL_MIN_SCORE, EXTRACTIVE_LEXICAL_MARGIN),
+}
 
-    raw = _extract_json_text(resp)
+def _extractive(retrieved: List[Dict]) -> Optional[Dict[str, Any]]:
+    # One KB section clearly answers the ticket: send it as is and skip the LLM round-trip
+    if not EXTRACTIVE_REPLIES:
+        return None
+    with stage("extract"):
+        found = extract_section(retrieved, EXTRACTIVE_GATES, EXTRACTIVE_MAX_TOKENS)
+    if found is None:
+        return None
+    span, text = found
+    REPLY_OUTCOMES.inc("extractive")
+    return {
+        "found_in_kb": True,
+        "final_reply": text,
+        "citations": [{"doc_id": span.doc_id, "title": span.title, "snippet": text[:240]}],
+        "reply_mode": "extractive",
+    }
 
-    # Parse JSON
-    try:
-        out = json.loads(raw)
-    except json.JSONDecodeError:
-        start = raw.find("{")
-        end = raw.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            out = json.loads(raw[start : end + 1])
-        else:
-            # If parsing fails, be safe and fallback
-            return _fallback_not_found()
+def _fallback_reason(e: Exception) -> str:
+    if isinstance(e, CircuitOpen):
+        return "breaker_open"
+    if isinstance(e, asyncio.TimeoutError):
+        return "deadline"
+    from openai import APITimeoutError
+
+    if isinstance(e, APITimeoutError):
+        return "deadline"
+    logger.warning("LLM call failed, falling back to retrieval-only: %s: %s", type(e).__name__, e)
+    return "error"
+
+def _deadline() -> Optional[float]:
+    return time.monotonic() + REPLY_BUDGET_S if REPLY_BUDGET_S > 0 else None
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+def _text_format() -> Dict[str, Any]:
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": RESPONSE_SCHEMA["name"],
+            "schema": RESPONSE_SCHEMA["schema"],
+            "strict": True,
+        }
+    }
+
+def _parse_reply(raw: str, retrieved: List[Dict]) -> Dict[str, Any]:
+    with stage("parse"):
+        out = _load_reply_json(raw)
+    if out is None:
+        # If parsing fails, be safe and fallback
+        REPLY_OUTCOMES.inc("parse_error")
+        return _fallback_not_found()
 
     # ✅ If model says found_in_kb=false, don't return citations
     if not out.get("found_in_kb", False):
+        REPLY_OUTCOMES.inc("model")
         out["citations"] = []
         return out
 
     # ✅ Ensure citations exist (auto-fill from retrieved if missing)
     if out.get("found_in_kb") and not out.get("citations"):
-        out["citations"] = [
-            {"doc_id": r["doc_id"], "title": r["title"], "snippet": r["chunk"][:240]}
-            for r in retrieved[:2]
-        ]
+        out["citations"] = citations_from(retrieved[:2])
+
+    REPLY_OUTCOMES.inc("generated")
+    return out
+
+def _load_reply_json(raw: str) -> Optional[Dict[str, Any]]:
+    try:
+        out = json.loads(raw)
+        REPLY_PARSE.inc("json")
+        return out
+    except json.JSONDecodeError:
+        pass
+    # Repair: cut out the outermost {...} (prose or code fences around the object)
+    start = raw.find("{")
+    end = raw.rfind("}")
+    if start != -1 and end != -1 and end > start:
+        try:
+            out = json.loads(raw[start : end + 1])
+            REPLY_PARSE.inc("repaired")
+            return out
+        except json.JSONDecodeError:
+            pass
+    REPLY_PARSE.inc("failed")
+    return None
+
+def citations_from(retrieved: List[Dict]) -> List[Dict[str, str]]:
+    return [
+        {"doc_id": r["doc_id"], "title": r["title"], "snippet": r["chunk"][:240]}
+        for r in retrieved
+    ]
+
+class _ReplyFieldStream:
+    """Pulls the decoded `final_reply` string out of a JSON object as it streams in."""
+
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, field: str = "final_reply"):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buf = ""
+        self._pos: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buf += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            m = self._key.search(self._buf)
+            if not m:
+                return ""
+            self._pos = m.end()
 
+        out = []
+        buf, i = self._buf, self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # Escape sequence: wait for the rest of it if it was split across chunks
+            if i + 1 >= len(buf):
+                break
+            esc = buf[i + 1]
+            if esc == "u":
+                if i + 6 > len(buf):
+                    break
+                out.append(chr(int(buf[i + 2 : i + 6], 16)))
+                i += 6
+            else:
+                out.append(self._ESCAPES.get(esc, esc))
+                i += 2
+        self._pos = i
+        return "".join(out)
+
+def _remember(ticket_text: str, version: str, out: Dict[str, Any], path: str) -> Dict[str, Any]:
+    out["retrieval_path"] = path
+    # Only KB-grounded answers are worth reusing; fallbacks are cheap to recompute, and a
+    # retrieval-only stopgap must not outlive the upstream trouble that caused it
+    if out.get("found_in_kb") and out.get("reply_mode") != "retrieval_only":
+        answer_cache.put(ticket_text, version, out)
     return out
+
+def _cached_reply(ticket_text: str, version: str) -> Optional[Dict[str, Any]]:
+    cached = answer_cache.get(ticket_text, version)
+    CACHE_LOOKUPS.inc("answer", "miss" if cached is None else "hit")
+    if cached is not None:
+        REPLY_OUTCOMES.inc("cached")
+        cached["retrieval_path"] = "answer_cache"
+        cached.pop("context_tokens", None)
+    return cached
+
+def generate_grounded_reply(ticket_text: str) -> Dict[str, Any]:
+    version = index_version()
+    cached = _cached_reply(ticket_text, version)
+    if cached is not None:
+        return cached
+
+    deadline = _deadline()
+    # ✅ Add threshold to avoid weak/irrelevant retrieval
+    retrieved, path = retrieve_with_path(ticket_text, k=RETRIEVAL_K, min_score=0.25)
+    return _remember(ticket_text, version, generate_from_retrieved(ticket_text, retrieved, deadline=deadline), path)
+
+async def agenerate_grounded_reply(ticket_text: str) -> Dict[str, Any]:
+    # The reply budget covers retrieval too; the LLM gets whatever is left of it
+    deadline = _deadline()
+    version = await run_cpu(index_version)
+    cached = await run_cpu(_cached_reply, ticket_text, version)
+    if cached is not None:
+        return cached
+
+    # Generation starts as soon as retrieval returns
+    retrieved, path = await aretrieve_with_path(ticket_text, k=RETRIEVAL_K, min_score=0.25)
+    reply = await agenerate_from_retrieved(ticket_text, retrieved, deadline=deadline)
+    return _remember(ticket_text, version, reply, path)
+
+async def agenerate_grounded_replies(
+    ticket_texts: List[str], max_concurrency: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    # Cached answers first, then batched retrieval (one embeddings call + one search) and
+    # concurrent generations for the rest. Each item is {"result": ...} or {"error": ...}, in input order.
+    version = await run_cpu(index_version)
+    # Fuzzy cache lookups scan up to ANSWER_CACHE_SIZE entries; keep them off the event loop
+    cached_all = await run_cpu(lambda: [_cached_reply(text, version) for text in ticket_texts])
+    out: List[Optional[Dict[str, Any]]] = [{"result": c} if c is not None else None for c in cached_all]
+
+    todo = [i for i, o in enumerate(out) if o is None]
+    retrieved_all = await aretrieve_batch_with_paths([ticket_texts[i] for i in todo], k=RETRIEVAL_K, min_score=0.25)
+    sem = asyncio.Semaphore(max(1, max_concurrency or BATCH_LLM_CONCURRENCY))
+
+    async def _one(text: str, retrieved: List[Dict], path: str) -> Dict[str, Any]:
+        async with sem:
+            # Each generation gets the full budget once it holds a slot; queueing is not upstream latency
+            try:
+                reply = await agenerate_from_retrieved(text, retrieved)
+                return {"result": _remember(text, version, reply, path)}
+            except Exception as e:
+                return {"error": str(e)}
+
+    fresh = await asyncio.gather(*(_one(ticket_texts[i], r, p) for i, (r, p) in zip(todo, retrieved_all)))
+    for i, item in zip(todo, fresh):
+        out[i] = item
+    return out
+
+def generate_from_retrieved(
+    ticket_text: str, retrieved: List[Dict], deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    # ✅ Strict fallback when nothing relevant is found
+    if not retrieved:
+        REPLY_OUTCOMES.inc("no_context")
+        return {**_fallback_not_found(), "reply_mode": "none"}
+
+    extractive = _extractive(retrieved)
+    if extractive is not None:
+        return extractive
+
+    deadline = deadline if deadline is not None else _deadline()
+    prompt, report = prepare_prompt(ticket_text, retrieved)
+    # No hedging on the sync path; what is left of the budget becomes the client's timeout. The SDK's
+    # own retries would each get that timeout again, so they are off here.
+    timeout = _remaining(deadline)
+    if timeout == 0:
+        return _retrieval_only(retrieved, "deadline")
+    client = openai_client() if timeout is None else openai_client().with_options(timeout=timeout, max_retries=0)
+    try:
+        with stage("llm"):
+            resp = call_llm(lambda: client.responses.create(model=OPENAI_MODEL, input=prompt, text=_text_format()))
+    except Exception as e:
+        return _retrieval_only(retrieved, _fallback_reason(e))
+    record_usage(OPENAI_MODEL, getattr(resp, "usage", None))
+    return {**_parse_reply(_extract_json_text(resp), retrieved), "context_tokens": report, "reply_mode": "llm"}
+
+async def agenerate_from_retrieved(
+    ticket_text: str, retrieved: List[Dict], deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    if not retrieved:
+        REPLY_OUTCOMES.inc("no_context")
+        return {**_fallback_not_found(), "reply_mode": "none"}
+
+    extractive = _extractive(retrieved)
+    if extractive is not None:
+        return extractive
+
+    deadline = deadline if deadline is not None else _deadline()
+    prompt, report = prepare_prompt(ticket_text, retrieved)
+    try:
+        with stage("llm"):
+            resp = await acall_llm(
+                lambda: openai_async_client().responses.create(model=OPENAI_MODEL, input=prompt, text=_text_format()),
+                _remaining(deadline),
+            )
+    except Exception as e:
+        return _retrieval_only(retrieved, _fallback_reason(e))
+    record_usage(OPENAI_MODEL, getattr(resp, "usage", None))
+    return {**_parse_reply(_extract_json_text(resp), retrieved), "context_tokens": report, "reply_mode": "llm"}
+
+async def astream_grounded_reply(ticket_text: str) -> AsyncIterator[Tuple[str, Any]]:
+    # Yields ("citations", {...}) once retrieval is done, ("delta", text) as final_reply streams in,
+    # then ("final", validated reply dict)
+    deadline = _deadline()
+    version = await run_cpu(index_version)
+    cached = await run_cpu(_cached_reply, ticket_text, version)
+    if cached is not None:
+        yield "citations", {"citations": cached.get("citations", []), "retrieval_path": "answer_cache"}
+        yield "delta", cached.get("final_reply", "")
+        yield "final", cached
+        return
+
+    retrieved, path = await aretrieve_with_path(ticket_text, k=RETRIEVAL_K, min_score=0.25)
+    yield "citations", {"citations": citations_from(retrieved), "retrieval_path": path}
+
+    if not retrieved:
+        REPLY_OUTCOMES.inc("no_context")
+        out = {**_fallback_not_found(), "reply_mode": "none"}
+        yield "delta", out["final_reply"]
+        yield "final", _remember(ticket_text, version, out, path)
+        return
+
+    out = _extractive(retrieved)
+    if out is not None:
+        yield "delta", out["final_reply"]
+        yield "final", _remember(ticket_text, version, out, path)
+        return
+
+    prompt, report = prepare_prompt(ticket_text, retrieved)
+    field = _ReplyFieldStream()
+    parts: List[str] = []
+    completed = None
+    stream = None
+    failure: Optional[Exception] = None
+    # Not hedged: a duplicate stream would have to be merged mid-reply. The deadline and breaker still apply.
+    if not breaker.allow():
+        failure = CircuitOpen()
+    elif _remaining(deadline) == 0:
+        breaker.release()
+        failure = asyncio.TimeoutError()
+    else:
+        try:
+            # Covers the whole stream, including time the consumer takes between deltas
+            with stage("llm"):
+                stream = await asyncio.wait_for(
+                    openai_async_client().responses.create(
+                        model=OPENAI_MODEL, input=prompt, text=_text_format(), stream=True
+                    ),
+                    _remaining(deadline),
+                )
+                events = stream.__aiter__()
+                while True:
+                    try:
+                        event = await asyncio.wait_for(events.__anext__(), _remaining(deadline))
+                    except StopAsyncIteration:
+                        break
+                    if event.type == "response.output_text.delta":
+                        parts.append(event.delta)
+                        piece = field.feed(event.delta)
+                        if piece:
+                            yield "delta", piece
+                    elif event.type == "response.completed":
+                        completed = event.response
+            breaker.record_success()
+        except Exception as e:
+            breaker.record_failure()
+            failure = e
+        except BaseException:
+            breaker.release()
+            raise
+        finally:
+            if stream is not None:
+                # Also when the consumer is cancelled (client disconnect): don't leave the upstream stream open
+                await stream.close()
+
+    if failure is not None:
+        # Deltas already sent are superseded by the final reply
+        out = _retrieval_only(retrieved, _fallback_reason(failure))
+        yield "delta", out["final_reply"]
+        yield "final", _remember(ticket_text, version, out, path)
+        return
+
+    record_usage(OPENAI_MODEL, getattr(completed, "usage", None))
+    raw = "".join(parts) if parts else _extract_json_text(completed)
+    out = {**_parse_reply(raw, retrieved), "context_tokens": report, "reply_mode": "llm"}
+    yield "final", _remember(ticket_text, version, out, path)
+
+# REPLY_OUTCOMES labels; the second group never waits on an LLM call
+_LLM_OUTCOMES = ("generated", "model", "parse_error")
+_NO_LLM_OUTCOMES = ("extractive", "cached", "retrieval_only", "no_context")
+
+def reply_report() -> Dict[str, Any]:
+    """Replies by outcome since start, the share served without the LLM, and the estimated time saved.
+
+    Time saved is the mean LLM call time (from this process) for every extractive reply, minus the
+    cost of the extractive check itself, which runs on every reply that gets that far.
+    """
+    counts = {o: int(REPLY_OUTCOMES.value(o)) for o in _LLM_OUTCOMES + _NO_LLM_OUTCOMES}
+    total = sum(counts.values())
+    without_llm = sum(counts[o] for o in _NO_LLM_OUTCOMES)
+    llm_s, llm_n = STAGE_SECONDS.totals("llm")
+    check_s, check_n = STAGE_SECONDS.totals("extract")
+    llm_mean = llm_s / llm_n if llm_n else None
+    saved = None
+    if llm_mean is not None:
+        saved = counts["extractive"] * llm_mean - check_s
+    return {
+        "replies": total,
+        "by_outcome": counts,
+        "without_llm": without_llm,
+        "without_llm_fraction": round(without_llm / total, 4) if total else None,
+        "extractive_fraction": round(counts["extractive"] / total, 4) if total else None,
+        "llm_mean_ms": round(llm_mean * 1000, 1) if llm_mean is not None else None,
+        "extract_check_mean_ms": round(check_s / check_n * 1000, 3) if check_n else None,
+        "estimated_seconds_saved": round(saved, 3) if saved is not None else None,
+    }
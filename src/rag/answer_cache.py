@@ -0,0 +1,117 @@
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from rapidfuzz import fuzz, process
+
+from src.config import ANSWER_CACHE_MIN_SIMILARITY, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL
+from src.rag.embed_cache import normalize_text
+
+_NUMERIC_TOKEN = re.compile(r"\S*\d\S*")
+
+
+def numeric_tokens(key: str) -> Tuple[str, ...]:
+    # Order IDs, amounts, dates: tickets differing only in these are different tickets
+    return tuple(_NUMERIC_TOKEN.findall(key))
+
+
+class AnswerCache:
+    """Reuses grounded replies for near-identical tickets against the same KB index version."""
+
+    def __init__(
+        self,
+        max_size: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        min_similarity: float = ANSWER_CACHE_MIN_SIMILARITY,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        self.version: Optional[str] = None
+        # normalized ticket text -> (reply, expires_at, numeric tokens)
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float, Tuple[str, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "exact_hits": 0,
+            "fuzzy_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidations": 0,
+        }
+
+    def _check_version(self, version: str) -> None:
+        # A rebuilt KB makes every stored reply stale
+        if version != self.version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self.version = version
+
+    def _live(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        reply, expires, _ = entry
+        if expires < now:
+            del self._entries[key]
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return reply
+
+    def get(self, ticket_text: str, version: str) -> Optional[Dict[str, Any]]:
+        if self.max_size <= 0:
+            return None
+        key = normalize_text(ticket_text)
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            reply = self._live(key, now)
+            if reply is not None:
+                self.stats["exact_hits"] += 1
+                return copy.deepcopy(reply)
+            candidates: List[str] = []
+            if self.min_similarity < 100:
+                numbers = numeric_tokens(key)
+                candidates = [k for k, (_, _, nums) in self._entries.items() if nums == numbers]
+
+        # The fuzzy scan runs without the lock; the winner is re-checked (it may have expired or been evicted)
+        match = None
+        if candidates:
+            match = process.extractOne(key, candidates, scorer=fuzz.ratio, score_cutoff=self.min_similarity)
+        with self._lock:
+            reply = self._live(match[0], now) if match and self.version == version else None
+            if reply is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["fuzzy_hits"] += 1
+            return copy.deepcopy(reply)
+
+    def put(self, ticket_text: str, version: str, reply: Dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        key = normalize_text(ticket_text)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (copy.deepcopy(reply), time.time() + self.ttl, numeric_tokens(key))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "min_similarity": self.min_similarity,
+            **self.stats,
+        }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,127 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.config import BM25_B, BM25_K1
+
+BM25_NAME = "kb_bm25.npz"
+VOCAB_NAME = "kb_bm25_vocab.json"
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    """a an and are as at be been but by can could did do does for from had has have how i if in into is it
+    its me my no not of on or our please so that the their them there they this to was we were what when
+    where which who will with would you your""".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index over KB chunks with precomputed per-posting BM25 weights."""
+
+    def __init__(self, vocab: Dict[str, int], term_ptr: np.ndarray, post_docs: np.ndarray, post_w: np.ndarray,
+                 idf: np.ndarray, n_docs: int, k1: float = BM25_K1):
+        self.vocab = vocab
+        self.term_ptr = term_ptr
+        self.post_docs = post_docs
+        self.post_w = post_w
+        self.idf = idf
+        self.n_docs = n_docs
+        self.k1 = k1
+
+    @classmethod
+    def build(cls, texts: List[str], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        docs_tf = [Counter(tokenize(t)) for t in texts]
+        doc_len = np.array([sum(tf.values()) for tf in docs_tf], dtype="float32")
+        avgdl = float(doc_len.mean()) if len(doc_len) and doc_len.mean() > 0 else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for d, tf in enumerate(docs_tf):
+            for term, n in tf.items():
+                postings.setdefault(term, []).append((d, n))
+
+        vocab: Dict[str, int] = {}
+        term_ptr = [0]
+        post_docs: List[int] = []
+        post_w: List[float] = []
+        idf = []
+        n_docs = len(texts)
+        for term in sorted(postings):
+            plist = postings[term]
+            # Lucene-style idf: never negative, even for very common terms
+            term_idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            vocab[term] = len(idf)
+            idf.append(term_idf)
+            for d, n in plist:
+                norm = k1 * (1 - b + b * doc_len[d] / avgdl)
+                post_docs.append(d)
+                post_w.append(term_idf * n * (k1 + 1) / (n + norm))
+            term_ptr.append(len(post_docs))
+
+        return cls(
+            vocab,
+            np.asarray(term_ptr, dtype="int64"),
+            np.asarray(post_docs, dtype="int32"),
+            np.asarray(post_w, dtype="float32"),
+            np.asarray(idf, dtype="float32"),
+            n_docs,
+            k1,
+        )
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float, float]]:
+        """Top-k (chunk row, raw BM25 score, score normalized to [0, 1] by the best possible score)."""
+        terms = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not terms or self.n_docs == 0:
+            return []
+
+        scores = np.zeros(self.n_docs, dtype="float32")
+        for t in terms:
+            lo, hi = self.term_ptr[t], self.term_ptr[t + 1]
+            np.add.at(scores, self.post_docs[lo:hi], self.post_w[lo:hi])
+
+        # A doc matching every query term at saturation scores sum(idf * (k1 + 1))
+        best_possible = float(self.idf[terms].sum() * (self.k1 + 1)) or 1.0
+        k = min(k, self.n_docs)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i]), float(scores[i]) / best_possible) for i in top if scores[i] > 0]
+
+    def save(self, index_dir: str) -> None:
+        os.makedirs(index_dir, exist_ok=True)
+        path = os.path.join(index_dir, BM25_NAME)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                term_ptr=self.term_ptr,
+                post_docs=self.post_docs,
+                post_w=self.post_w,
+                idf=self.idf,
+                meta=np.array([self.n_docs, self.k1], dtype="float64"),
+            )
+        os.replace(path + ".tmp", path)
+        vocab_path = os.path.join(index_dir, VOCAB_NAME)
+        with open(vocab_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(sorted(self.vocab, key=self.vocab.get), f, ensure_ascii=False)
+        os.replace(vocab_path + ".tmp", vocab_path)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "BM25Index":
+        with np.load(os.path.join(index_dir, BM25_NAME)) as z:
+            arrays = {name: z[name] for name in ("term_ptr", "post_docs", "post_w", "idf", "meta")}
+        with open(os.path.join(index_dir, VOCAB_NAME), "r", encoding="utf-8") as f:
+            vocab = {t: i for i, t in enumerate(json.load(f))}
+        n_docs, k1 = arrays["meta"]
+        return cls(vocab, arrays["term_ptr"], arrays["post_docs"], arrays["post_w"], arrays["idf"], int(n_docs), float(k1))
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, BM25_NAME)) and os.path.exists(os.path.join(index_dir, VOCAB_NAME))
@@ -1,15 +1,142 @@
-from src.config import KB_DIR
-from src.rag.chunker import read_kb_files, chunk_text
-from src.rag.vector_store import build_faiss_index, save_index
-
-def main():
-    docs = read_kb_files(KB_DIR)
-    all_chunks = []
-    for d in docs:
-        all_chunks.extend(chunk_text(d))
-    index, chunks = build_faiss_index(all_chunks)
+import argparse
+import hashlib
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import EMBED_BACKEND, EMBED_BATCH_MAX_ITEMS, EMBED_CONCURRENCY, INDEX_DIR, KB_DIR
+from src.rag.bm25 import BM25Index
+from src.rag.embedders import LocalEmbedder, get_embedder, local_fit_corpus, set_embedder
+from src.rag.chunker import iter_kb_chunks
+from src.rag.index_types import INDEX_TYPES, describe_index
+from src.rag.vector_store import (
+    build_faiss_index,
+    embed_chunks,
+    load_manifest,
+    save_index,
+    save_manifest,
+)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _reusable_vectors(
+    manifest: Dict, vecs: Optional[np.ndarray], embedder_name: str, dim: Optional[int]
+) -> Dict[str, np.ndarray]:
+    # chunk hash -> stored vector from the previous build (same embedder and dimension only)
+    if vecs is None or manifest.get("embedder") != embedder_name:
+        return {}
+    hashes = manifest.get("chunk_hashes", [])
+    if len(hashes) != len(vecs):
+        return {}
+    if vecs.ndim != 2 or manifest.get("dim") != vecs.shape[1] or vecs.shape[1] != dim:
+        # e.g. a `dimensions` change under the same model name: mixing widths would break the index
+        print(f"Stored vectors are {manifest.get('dim')}-dim, the embedder returns {dim}; re-embedding everything.")
+        return {}
+    return {h: vecs[i] for i, h in enumerate(hashes)}
+
+
+def _embedder_dim() -> int:
+    # One short probe; only paid when there are stored vectors to reuse
+    return int(get_embedder().embed(["dimension probe"]).shape[1])
+
+
+def _embed_stream(
+    chunks: Iterable[Dict], reusable: Dict[str, np.ndarray], window: int = EMBED_BATCH_MAX_ITEMS * EMBED_CONCURRENCY
+) -> Tuple[List[Dict], List[str], Optional[np.ndarray], int]:
+    # Chunks are embedded as they are read, a window at a time (enough to keep every concurrent batch busy)
+    out: List[Dict] = []
+    hashes: List[str] = []
+    rows: List[Optional[np.ndarray]] = []
+    pending: List[int] = []
+
+    def flush():
+        fresh = embed_chunks([out[i] for i in pending])
+        for i, v in zip(pending, fresh):
+            rows[i] = v
+        pending.clear()
+
+    embedded = 0
+    for c in chunks:
+        h = _hash(c["chunk"])
+        out.append(c)
+        hashes.append(h)
+        rows.append(reusable.get(h))
+        if rows[-1] is None:
+            pending.append(len(out) - 1)
+            embedded += 1
+            if len(pending) >= window:
+                flush()
+    if pending:
+        flush()
+
+    vecs = np.vstack(rows).astype("float32", copy=False) if rows else None
+    return out, hashes, vecs, embedded
+
+
+def main(full: bool = False, index_type: Optional[str] = None):
+    t0 = time.perf_counter()
+    previous, stored = ({}, None) if full else load_manifest()
+
+    doc_hashes: Dict[str, str] = {}
+    stream: Iterable[Dict] = iter_kb_chunks(KB_DIR, doc_hashes)
+    if EMBED_BACKEND.lower() == "local":
+        # The projection is fit on the whole KB before anything is embedded, so this backend can't stream.
+        # An unchanged corpus yields the same embedder name, so stored vectors stay reusable.
+        stream = list(stream)
+        local = LocalEmbedder.fit(local_fit_corpus([c["chunk"] for c in stream]))
+        local.save()
+        set_embedder(local)
+    embedder_name = get_embedder().name
+    can_reuse = stored is not None and previous.get("embedder") == embedder_name
+    reusable = _reusable_vectors(previous, stored, embedder_name, _embedder_dim() if can_reuse else None)
+
+    all_chunks, hashes, vecs, embedded = _embed_stream(stream, reusable)
+    if not all_chunks:
+        raise ValueError(f"No KB chunks found in {KB_DIR}")
+    dim = vecs.shape[1]
+
+    index, chunks = build_faiss_index(all_chunks, vecs, index_type=index_type)
+    # BM25 is cheap to rebuild from scratch; it must be on disk before save_index bumps kb_meta.json
+    BM25Index.build([c["chunk"] for c in chunks]).save(INDEX_DIR)
     save_index(index, chunks)
-    print(f"Indexed {len(chunks)} chunks from {len(docs)} docs.")
+    spec = describe_index(index)
+
+    save_manifest(
+        {
+            "embedder": embedder_name,
+            "dim": dim,
+            "docs": doc_hashes,
+            "chunk_hashes": hashes,
+        },
+        vecs,
+    )
+
+    old_docs = previous.get("docs", {})
+    changed = sum(1 for doc_id, h in doc_hashes.items() if old_docs.get(doc_id) != h)
+    removed = sum(1 for doc_id in old_docs if doc_id not in doc_hashes)
+
+    print(f"Indexed {len(chunks)} chunks from {len(doc_hashes)} docs with {embedder_name} ({spec['type']} {spec['params']}).")
+    print(
+        f"Reused {len(chunks) - embedded} chunks, re-embedded {embedded}; "
+        f"{changed} docs new/changed, {removed} removed ({time.perf_counter() - t0:.2f}s)."
+    )
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build (or incrementally update) the KB FAISS index.")
+    parser.add_argument("--full", action="store_true", help="ignore stored vectors and re-embed every chunk")
+    parser.add_argument(
+        "--index-type",
+        choices=["auto", *INDEX_TYPES],
+        default=None,
+        help="FAISS index type (default: FAISS_INDEX_TYPE, which picks by chunk count when 'auto')",
+    )
+    args = parser.parse_args()
+    # Shows the embedder's progress and retry messages
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main(full=args.full, index_type=args.index_type)
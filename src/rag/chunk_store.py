@@ -0,0 +1,127 @@
+import json
+import mmap
+import os
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# Layout (all next to kb.faiss):
+#   kb_chunks.bin          chunk texts as one contiguous UTF-8 blob
+#   kb_chunk_offsets.npy   int64[n + 1] byte offsets into the blob
+#   kb_chunk_docs.npy      int32[n] row in the doc table for each chunk
+#   kb_chunk_starts.npy    int64[n] character offset of each chunk in its doc (-1 if unknown)
+#   kb_chunk_sections.npy  int32[n] row in the section table for each chunk (-1 if none)
+#   kb_docs.json           interned doc table: [{"doc_id", "title"}, ...]
+#   kb_sections.json       interned heading paths: ["Billing > Refund policy", ...]
+BLOB_NAME = "kb_chunks.bin"
+OFFSETS_NAME = "kb_chunk_offsets.npy"
+DOC_IDX_NAME = "kb_chunk_docs.npy"
+STARTS_NAME = "kb_chunk_starts.npy"
+DOCS_NAME = "kb_docs.json"
+SECTION_IDX_NAME = "kb_chunk_sections.npy"
+SECTIONS_NAME = "kb_sections.json"
+
+
+def write_chunk_store(index_dir: str, chunks: Iterable[Dict]) -> int:
+    os.makedirs(index_dir, exist_ok=True)
+    doc_rows: Dict[str, int] = {}
+    docs: List[Dict[str, str]] = []
+    offsets: List[int] = [0]
+    doc_idx: List[int] = []
+    starts: List[int] = []
+    section_rows: Dict[str, int] = {}
+    sections: List[str] = []
+    section_idx: List[int] = []
+
+    blob_path = os.path.join(index_dir, BLOB_NAME)
+    with open(blob_path + ".tmp", "wb") as f:
+        for c in chunks:
+            row = doc_rows.get(c["doc_id"])
+            if row is None:
+                row = doc_rows[c["doc_id"]] = len(docs)
+                docs.append({"doc_id": c["doc_id"], "title": c["title"]})
+            data = c["chunk"].encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+            doc_idx.append(row)
+            starts.append(c.get("start", -1))
+            section = c.get("section") or ""
+            if section and section not in section_rows:
+                section_rows[section] = len(sections)
+                sections.append(section)
+            section_idx.append(section_rows[section] if section else -1)
+
+    with open(os.path.join(index_dir, OFFSETS_NAME + ".tmp"), "wb") as f:
+        np.save(f, np.asarray(offsets, dtype="int64"))
+    with open(os.path.join(index_dir, DOC_IDX_NAME + ".tmp"), "wb") as f:
+        np.save(f, np.asarray(doc_idx, dtype="int32"))
+    with open(os.path.join(index_dir, STARTS_NAME + ".tmp"), "wb") as f:
+        np.save(f, np.asarray(starts, dtype="int64"))
+    with open(os.path.join(index_dir, SECTION_IDX_NAME + ".tmp"), "wb") as f:
+        np.save(f, np.asarray(section_idx, dtype="int32"))
+    with open(os.path.join(index_dir, DOCS_NAME + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(docs, f, ensure_ascii=False)
+    with open(os.path.join(index_dir, SECTIONS_NAME + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(sections, f, ensure_ascii=False)
+
+    for name in (BLOB_NAME, OFFSETS_NAME, DOC_IDX_NAME, STARTS_NAME, SECTION_IDX_NAME, DOCS_NAME, SECTIONS_NAME):
+        path = os.path.join(index_dir, name)
+        os.replace(path + ".tmp", path)
+    return len(doc_idx)
+
+
+class ChunkStore:
+    """Read-only, memory-mapped chunk table. Indexing materializes a single chunk dict."""
+
+    def __init__(self, index_dir: str):
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_NAME), mmap_mode="r")
+        self.doc_idx = np.load(os.path.join(index_dir, DOC_IDX_NAME), mmap_mode="r")
+        # Stores written before offsets were tracked have no starts table
+        starts_path = os.path.join(index_dir, STARTS_NAME)
+        self.starts = np.load(starts_path, mmap_mode="r") if os.path.exists(starts_path) else None
+        self.section_idx = None
+        self.sections: List[str] = []
+        if os.path.exists(os.path.join(index_dir, SECTIONS_NAME)):
+            self.section_idx = np.load(os.path.join(index_dir, SECTION_IDX_NAME), mmap_mode="r")
+            with open(os.path.join(index_dir, SECTIONS_NAME), "r", encoding="utf-8") as f:
+                self.sections = json.load(f)
+        with open(os.path.join(index_dir, DOCS_NAME), "r", encoding="utf-8") as f:
+            self.docs: List[Dict[str, str]] = json.load(f)
+
+        blob_path = os.path.join(index_dir, BLOB_NAME)
+        self._blob = None
+        if os.path.getsize(blob_path) > 0:
+            # Pages are shared between every worker process that maps the same file
+            with open(blob_path, "rb") as f:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.doc_idx)
+
+    def text(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        if self._blob is None or end <= start:
+            return ""
+        return self._blob[start:end].decode("utf-8")
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        doc = self.docs[int(self.doc_idx[i])]
+        out = {"doc_id": doc["doc_id"], "title": doc["title"], "chunk": self.text(i)}
+        if self.starts is not None and self.starts[i] >= 0:
+            out["start"] = int(self.starts[i])
+        if self.section_idx is not None and self.section_idx[i] >= 0:
+            out["section"] = self.sections[int(self.section_idx[i])]
+        return out
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self) -> None:
+        if self._blob is not None:
+            self._blob.close()
+            self._blob = None
@@ -1,27 +1,184 @@
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
 import os
+import re
+
+from src.config import CHUNK_MAX_TOKENS
+from src.rag.tokens import count_tokens
+
+KB_EXTENSIONS = (".md", ".txt")
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?]\s)")
+_WORDS = re.compile(r"\S+\s*|\s+")
+
+
+def iter_kb_paths(kb_dir: str) -> Iterator[str]:
+    # Whole tree, in a stable order so chunk rows (and index versions) are reproducible
+    for root, dirs, files in os.walk(kb_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for fn in sorted(files):
+            if fn.endswith(KB_EXTENSIONS):
+                yield os.path.join(root, fn)
+
+
+def _doc_meta(kb_dir: str, path: str) -> Dict[str, str]:
+    fn = os.path.basename(path)
+    # Top-level files keep their bare filename as doc_id
+    doc_id = os.path.relpath(path, kb_dir).replace(os.sep, "/")
+    return {"doc_id": doc_id, "title": fn.replace("_", " ").replace(".md", "")}
+
 
 def read_kb_files(kb_dir: str) -> List[Dict]:
     docs = []
-    for fn in os.listdir(kb_dir):
-        if fn.endswith(".md") or fn.endswith(".txt"):
-            path = os.path.join(kb_dir, fn)
-            with open(path, "r", encoding="utf-8") as f:
-                text = f.read()
-            docs.append({"doc_id": fn, "title": fn.replace("_", " ").replace(".md",""), "text": text})
+    for path in iter_kb_paths(kb_dir):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        docs.append({**_doc_meta(kb_dir, path), "text": text})
     return docs
 
-def chunk_text(doc: Dict, chunk_size: int = 800, overlap: int = 120) -> List[Dict]:
-    text = doc["text"]
-    chunks = []
+
+def _blocks(lines: Iterable[str]) -> Iterator[Tuple[str, str, Optional[Tuple[int, str]]]]:
+    """(kind, text, heading) where kind is heading | blank | block.
+
+    A block is a paragraph, list, table or fenced code block; concatenating every text gives back the input.
+    """
+    buf: List[str] = []
+    in_fence = False
+    for line in lines:
+        if in_fence:
+            buf.append(line)
+            if _FENCE.match(line):
+                in_fence = False
+            continue
+        if _FENCE.match(line):
+            in_fence = True
+            buf.append(line)
+            continue
+
+        m = _HEADING.match(line)
+        if m or not line.strip():
+            if buf:
+                yield "block", "".join(buf), None
+                buf = []
+            if m:
+                yield "heading", line, (len(m.group(1)), m.group(2))
+            else:
+                yield "blank", line, None
+            continue
+        buf.append(line)
+    if buf:
+        yield "block", "".join(buf), None
+
+
+def _split_oversized(text: str, max_tokens: int, first_limit: int) -> Iterator[str]:
+    # Lines, then sentences, then words: the coarsest pieces that fit
+    pieces: List[str] = []
+    for line in text.splitlines(keepends=True):
+        for sentence in (p for p in _SENTENCE_BREAK.split(line) if p):
+            if count_tokens(sentence) <= max_tokens:
+                pieces.append(sentence)
+            else:
+                pieces.extend(_WORDS.findall(sentence))
+
+    buf, tokens, limit = "", 0, first_limit
+    for p in pieces:
+        n = count_tokens(p)
+        if buf and tokens + n > limit:
+            yield buf
+            buf, tokens, limit = "", 0, max_tokens
+        buf += p
+        tokens += n
+    if buf:
+        yield buf
+
+
+def chunk_lines(
+    lines: Iterable[str], doc_id: str, title: str, max_tokens: Optional[int] = None
+) -> Iterator[Dict]:
+    """Split one document, read line by line, into section-aligned chunks of at most max_tokens.
+
+    Chunks are contiguous slices of the doc: `start` is the character offset and `section`
+    the heading path ("Billing > Refund policy") the chunk sits under.
+    """
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    path: List[Tuple[int, str]] = []
+    parts: List[str] = []
+    tokens = 0
+    has_body = False
     start = 0
-    while start < len(text):
-        end = min(len(text), start + chunk_size)
-        chunk = text[start:end]
-        chunks.append({
-            "doc_id": doc["doc_id"],
-            "title": doc["title"],
-            "chunk": chunk,
-        })
-        start += max(1, chunk_size - overlap)
-    return chunks
+
+    def emit() -> Iterator[Dict]:
+        nonlocal parts, tokens, has_body, start
+        text = "".join(parts)
+        if text.strip():
+            yield {
+                "doc_id": doc_id,
+                "title": title,
+                "chunk": text,
+                "start": start,
+                "section": " > ".join(t for _, t in path),
+            }
+        start += len(text)
+        parts, tokens, has_body = [], 0, False
+
+    for kind, text, heading in _blocks(lines):
+        if kind == "heading":
+            # New section; headings with no body yet stay with the section they introduce
+            if has_body:
+                yield from emit()
+            level, name = heading
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, name))
+            parts.append(text)
+            tokens += count_tokens(text)
+            continue
+        if kind == "blank":
+            parts.append(text)
+            continue
+
+        n = count_tokens(text)
+        if has_body and tokens + n > max_tokens:
+            yield from emit()
+        if tokens + n <= max_tokens:
+            parts.append(text)
+            tokens += n
+            has_body = True
+            continue
+
+        # A single block (huge table, wall of text) over the limit; its tail stays open for what follows
+        pieces = list(_split_oversized(text, max_tokens, max(1, max_tokens - tokens)))
+        for piece in pieces[:-1]:
+            parts.append(piece)
+            yield from emit()
+        parts.append(pieces[-1])
+        tokens += count_tokens(pieces[-1])
+        has_body = True
+
+    if parts:
+        yield from emit()
+
+
+def _hashed_lines(f, digest) -> Iterator[str]:
+    for line in f:
+        digest.update(line.encode("utf-8"))
+        yield line
+
+
+def iter_kb_chunks(
+    kb_dir: str, doc_hashes: Optional[Dict[str, str]] = None, max_tokens: Optional[int] = None
+) -> Iterator[Dict]:
+    # Streams every file; doc_hashes (if given) is filled with doc_id -> sha256 as each doc is finished
+    for path in iter_kb_paths(kb_dir):
+        meta = _doc_meta(kb_dir, path)
+        digest = hashlib.sha256()
+        with open(path, "r", encoding="utf-8") as f:
+            yield from chunk_lines(_hashed_lines(f, digest), meta["doc_id"], meta["title"], max_tokens)
+        if doc_hashes is not None:
+            doc_hashes[meta["doc_id"]] = digest.hexdigest()
+
+
+def chunk_text(doc: Dict, max_tokens: Optional[int] = None) -> List[Dict]:
+    return list(chunk_lines(doc["text"].splitlines(keepends=True), doc["doc_id"], doc["title"], max_tokens))
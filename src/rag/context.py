@@ -0,0 +1,227 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import CONTEXT_TOKEN_BUDGET
+from src.rag.tokens import count_tokens
+
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?]\s)")
+_SENTENCE_END = re.compile(r"[.!?:)\]\"']\s*$")
+_WS = re.compile(r"\s+")
+_BLANK_RUN = re.compile(r"\n{3,}")
+
+# Segments shorter than this are never treated as duplicates ("Steps:", "- Refund")
+MIN_DEDUPE_CHARS = 25
+# Suffix/prefix overlap needed to stitch two chunks that have no stored offsets
+MIN_TEXT_OVERLAP = 40
+# Lines longer than this are split into sentences
+MAX_LINE_CHARS = 200
+
+
+class _Span:
+    __slots__ = ("doc_id", "title", "section", "start", "end", "text", "score")
+
+    def __init__(self, hit: Dict[str, Any]):
+        self.doc_id = hit["doc_id"]
+        self.title = hit["title"]
+        self.section = hit.get("section") or ""
+        self.text = hit["chunk"]
+        self.start: Optional[int] = hit.get("start")
+        self.end: Optional[int] = None if self.start is None else self.start + len(self.text)
+        self.score = float(hit.get("score", 0.0))
+
+    def absorb(self, other: "_Span") -> None:
+        # other starts inside (or right at the end of) this span
+        self.score = max(self.score, other.score)
+        if other.end > self.end:
+            self.text += other.text[self.end - other.start:]
+            self.end = other.end
+
+
+def _text_overlap(a: str, b: str) -> int:
+    # Longest suffix of a that is a prefix of b
+    for n in range(min(len(a), len(b)), MIN_TEXT_OVERLAP - 1, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+def _merge_doc(spans: List[_Span]) -> List[_Span]:
+    located = sorted((s for s in spans if s.start is not None), key=lambda s: s.start)
+    merged: List[_Span] = []
+    for s in located:
+        # Adjacent (start == end) or overlapping windows of the same doc become one span
+        if merged and s.start <= merged[-1].end:
+            merged[-1].absorb(s)
+        else:
+            merged.append(s)
+
+    # Chunks from an older store have no offsets: fall back to matching text
+    for s in (s for s in spans if s.start is None):
+        for m in merged:
+            m_first, s_first = _text_overlap(m.text, s.text), _text_overlap(s.text, m.text)
+            if s.text in m.text or m.text in s.text or m_first or s_first:
+                if m.text in s.text:
+                    m.text = s.text
+                elif s_first > m_first:
+                    m.text = s.text + m.text[s_first:]
+                elif m_first:
+                    m.text += s.text[m_first:]
+                m.score = max(m.score, s.score)
+                break
+        else:
+            merged.append(s)
+    return merged
+
+
+def merge_hits(retrieved: List[Dict[str, Any]]) -> List[_Span]:
+    by_doc: Dict[str, List[_Span]] = {}
+    for hit in retrieved:
+        by_doc.setdefault(hit["doc_id"], []).append(_Span(hit))
+    spans = [m for doc_spans in by_doc.values() for m in _merge_doc(doc_spans)]
+    return sorted(spans, key=lambda s: s.score, reverse=True)
+
+
+def _segments(text: str) -> List[str]:
+    # Lines (headings, bullets, paragraphs) and, for long lines, sentences; joining them restores the text
+    out: List[str] = []
+    for line in text.splitlines(keepends=True):
+        if len(line) <= MAX_LINE_CHARS or _HEADING.match(line):
+            out.append(line)
+        else:
+            out.extend(p for p in _SENTENCE_BREAK.split(line) if p)
+    return out
+
+
+def _trim_fragments(segs: List[str]) -> List[str]:
+    # Legacy character windows start and end mid-sentence; drop the partial pieces at either edge
+    if segs and segs[0][:1].strip() and not segs[0][:1].isupper() and not _HEADING.match(segs[0]):
+        if len(segs) > 1:
+            segs = segs[1:]
+    if len(segs) > 1 and not segs[-1].endswith("\n") and not _SENTENCE_END.search(segs[-1]):
+        segs = segs[:-1]
+    return segs
+
+
+def _span_segments(span: _Span) -> List[str]:
+    # Chunks with offsets come from the block-aligned chunker and start on whole lines ("- step 3", "2. Verify"),
+    # so there is nothing partial to trim; only hits from an older store without offsets are windows
+    segs = _segments(span.text)
+    return segs if span.start is not None else _trim_fragments(segs)
+
+
+def _norm(seg: str) -> str:
+    return _WS.sub(" ", seg).strip().lower()
+
+
+def _header(span: _Span) -> str:
+    section = f" > {span.section}" if span.section else ""
+    return f"[{span.doc_id} | {span.title}{section}]\n"
+
+
+SEPARATOR = "\n---\n"
+
+
+def pack_context(
+    retrieved: List[Dict[str, Any]], budget: Optional[int] = None
+) -> Tuple[str, Dict[str, int]]:
+    """Merge, dedupe and budget the retrieved chunks into the prompt's KB context block.
+
+    Returns the context text and a token report comparing it with the unpacked hits.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    naive = SEPARATOR.join(_header(_Span(r)) + r["chunk"] + "\n" for r in retrieved)
+
+    seen = set()
+    blocks: List[str] = []
+    used = 0
+    spans = merge_hits(retrieved)
+    for span in spans:
+        segs = _span_segments(span)
+
+        header = _header(span)
+        cost = count_tokens(header) + (count_tokens(SEPARATOR) if blocks else 0)
+        if used + cost >= budget:
+            break
+
+        kept: List[str] = []
+        for seg in segs:
+            key = _norm(seg)
+            if not key:
+                if kept:
+                    kept.append(seg)
+                continue
+            if len(key) >= MIN_DEDUPE_CHARS and key in seen:
+                continue
+            n = count_tokens(seg)
+            if used + cost + n > budget:
+                break
+            kept.append(seg)
+            cost += n
+            if len(key) >= MIN_DEDUPE_CHARS:
+                seen.add(key)
+
+        # A heading with nothing under it is wasted tokens
+        while kept and (not kept[-1].strip() or _HEADING.match(kept[-1])):
+            cost -= count_tokens(kept.pop())
+        if not kept:
+            continue
+        blocks.append(header + _BLANK_RUN.sub("\n\n", "".join(kept).strip()) + "\n")
+        used += cost
+
+    context = SEPARATOR.join(blocks)
+    naive_tokens = count_tokens(naive)
+    context_tokens = count_tokens(context)
+    report = {
+        "hits": len(retrieved),
+        "spans": len(blocks),
+        "retrieved_tokens": naive_tokens,
+        "context_tokens": context_tokens,
+        "tokens_saved": max(0, naive_tokens - context_tokens),
+        "budget": budget,
+    }
+    return context, report
+
+
+def extract_section(
+    retrieved: List[Dict[str, Any]], gates: Dict[str, Tuple[float, float]], max_tokens: int
+) -> Optional[Tuple[_Span, str]]:
+    """The best span's own section text, when it clearly wins and is short enough to send as is.
+
+    Scores only compare within one signal (cosine for "dense" hits, normalized BM25 for "lexical"
+    ones), so `gates` maps each hit's signal to its (min_score, margin). Returns None unless exactly
+    one signal's top merged span reaches its min_score and beats that signal's next span by its
+    margin, and that span's section body (headings dropped) fits in `max_tokens`.
+    """
+    by_signal: Dict[str, List[Dict[str, Any]]] = {}
+    for hit in retrieved:
+        by_signal.setdefault(hit.get("signal", "dense"), []).append(hit)
+    winners: List[_Span] = []
+    for signal, hits in by_signal.items():
+        min_score, margin = gates[signal]
+        spans = merge_hits(hits)
+        if spans[0].score < min_score:
+            continue
+        if len(spans) > 1 and spans[0].score - spans[1].score < margin:
+            return None
+        winners.append(spans[0])
+    if len(winners) != 1:
+        # Nothing is confident, or dense and lexical each back a different section
+        return None
+
+    top = winners[0]
+    kept: List[str] = []
+    used = 0
+    for seg in _span_segments(top):
+        if _HEADING.match(seg):
+            # Leading headings name the section; a later one starts the next section
+            if kept and any(s.strip() for s in kept):
+                break
+            continue
+        used += count_tokens(seg)
+        if used > max_tokens:
+            # Too long to paste; summarizing it is the LLM's job
+            return None
+        kept.append(seg)
+    text = _BLANK_RUN.sub("\n\n", "".join(kept).strip())
+    return (top, text) if text else None
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import EMBED_CACHE_DB, EMBED_CACHE_SIZE, EMBED_CACHE_TTL, OPENAI_EMBED_MODEL
+
+_WS = re.compile(r"\s+")
+# Expired rows are deleted on connect and then once every this many disk writes
+_PRUNE_EVERY = 500
+
+
+def normalize_text(text: str) -> str:
+    return _WS.sub(" ", (text or "").strip()).casefold()
+
+
+class EmbeddingCache:
+    """Query-embedding cache: an in-process LRU in front of an optional SQLite store.
+
+    Keys combine the embedding model with the normalized text, so switching
+    OPENAI_EMBED_MODEL never serves vectors from the old model.
+    """
+
+    def __init__(
+        self,
+        model: str = OPENAI_EMBED_MODEL,
+        max_size: int = EMBED_CACHE_SIZE,
+        ttl: float = EMBED_CACHE_TTL,
+        db_path: str = EMBED_CACHE_DB,
+    ):
+        self.model = model
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self._lru: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One connection shared by executor threads; sqlite3 objects are not safe for concurrent use
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._puts_since_prune = 0
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    # ---- persistent tier ----
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=2.0, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, vec BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            # Vectors from another embedding model can never be served again
+            db.execute("DELETE FROM embeddings WHERE model != ?", (self.model,))
+            self._prune(db)
+            self._db = db
+        return self._db
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        db.execute("DELETE FROM embeddings WHERE created < ?", (time.time() - self.ttl,))
+        self._puts_since_prune = 0
+
+    def _disk_get(self, keys: List[str], now: float) -> Dict[str, Tuple[np.ndarray, float]]:
+        """Unexpired vectors for `keys`, with the time each was first stored."""
+        if not self.db_path or not keys:
+            return {}
+        try:
+            with self._db_lock:
+                db = self._conn()
+                marks = ",".join("?" * len(keys))
+                rows = db.execute(
+                    f"SELECT key, vec, created FROM embeddings WHERE key IN ({marks}) AND created >= ?",
+                    [*keys, now - self.ttl],
+                ).fetchall()
+        except sqlite3.Error:
+            return {}
+        return {k: (np.frombuffer(v, dtype="float32").copy(), created) for k, v, created in rows}
+
+    def _disk_put(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        if not self.db_path or not items:
+            return
+        now = time.time()
+        rows = [(k, self.model, np.asarray(v, dtype="float32").tobytes(), now) for k, v in items]
+        try:
+            with self._db_lock:
+                db = self._conn()
+                db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vec, created) VALUES (?, ?, ?, ?)", rows
+                )
+                self._puts_since_prune += len(rows)
+                if self._puts_since_prune >= _PRUNE_EVERY:
+                    self._prune(db)
+        except sqlite3.Error:
+            # The disk tier is best-effort (e.g. locked by another worker)
+            pass
+
+    # ---- memory tier ----
+    def _mem_get(self, key: str, now: float) -> Optional[np.ndarray]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        vec, expires = entry
+        if expires < now:
+            del self._lru[key]
+            self.stats["expired"] += 1
+            return None
+        self._lru.move_to_end(key)
+        return vec
+
+    def _mem_put(self, key: str, vec: np.ndarray, created: float) -> None:
+        self._lru[key] = (vec, created + self.ttl)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    # ---- public API ----
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [self.key(t) for t in texts]
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: List[int] = []
+        now = time.time()
+        with self._lock:
+            for i, k in enumerate(keys):
+                vec = self._mem_get(k, now) if self.max_size > 0 else None
+                if vec is None:
+                    missing.append(i)
+                else:
+                    out[i] = vec
+                    self.stats["memory_hits"] += 1
+
+        if missing:
+            found = self._disk_get([keys[i] for i in missing], now)
+            with self._lock:
+                for i in missing:
+                    entry = found.get(keys[i])
+                    if entry is None:
+                        self.stats["misses"] += 1
+                        continue
+                    vec, created = entry
+                    out[i] = vec
+                    self.stats["disk_hits"] += 1
+                    if self.max_size > 0:
+                        # Keep the original age so a round trip through the disk tier never extends the TTL
+                        self._mem_put(keys[i], vec, created)
+        return out
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self.get_many([text])[0]
+
+    def put_many(self, texts: List[str], vecs: np.ndarray) -> None:
+        items = [(self.key(t), np.asarray(v, dtype="float32")) for t, v in zip(texts, vecs)]
+        now = time.time()
+        if self.max_size > 0:
+            with self._lock:
+                for k, v in items:
+                    self._mem_put(k, v, now)
+        self._disk_put(items)
+
+    def put(self, text: str, vec: np.ndarray) -> None:
+        self.put_many([text], np.asarray(vec).reshape(1, -1))
+
+    def info(self) -> Dict:
+        return {
+            "model": self.model,
+            "size": len(self._lru),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "persistent": bool(self.db_path),
+            **self.stats,
+        }
+
+
+embed_cache = EmbeddingCache()
@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.clients import openai_async_client, openai_client
+from src.metrics import record_usage
+from src.config import (
+    EMBED_BACKEND,
+    EMBED_BATCH_MAX_ITEMS,
+    EMBED_BATCH_MAX_TOKENS,
+    EMBED_CONCURRENCY,
+    EMBED_MAX_RETRIES,
+    INDEX_DIR,
+    LOCAL_EMBED_CFPB_ROWS,
+    LOCAL_EMBED_DIM,
+    LOCAL_EMBED_MAX_FEATURES,
+    OPENAI_EMBED_MODEL,
+)
+from src.rag.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _retryable_errors() -> Tuple[type, ...]:
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+LOCAL_EMBEDDER_PATH = os.path.join(INDEX_DIR, "local_embedder.joblib")
+
+
+def _normalized(vecs: np.ndarray) -> np.ndarray:
+    import faiss
+
+    vecs = np.ascontiguousarray(vecs, dtype="float32")
+    # cosine similarity = inner product after normalization
+    faiss.normalize_L2(vecs)
+    return vecs
+
+
+def pack_batches(
+    token_counts: List[int],
+    max_items: int = EMBED_BATCH_MAX_ITEMS,
+    max_tokens: int = EMBED_BATCH_MAX_TOKENS,
+) -> List[Tuple[int, int]]:
+    # Greedy, order-preserving [start, end) slices under both limits
+    batches: List[Tuple[int, int]] = []
+    start, tokens = 0, 0
+    for i, n in enumerate(token_counts):
+        if i > start and (i - start >= max_items or tokens + n > max_tokens):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+class Embedder:
+    """Turns texts into L2-normalized float32 vectors.
+
+    `name` identifies the vector space; it is recorded in the index metadata and
+    must match at query time.
+    """
+
+    name = "base"
+    # Remote embedders benefit from the query embedding cache; local ones are cheaper than a lookup
+    cacheable = False
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        from src.concurrency import run_cpu
+
+        return await run_cpu(self.embed, texts)
+
+    def embed_documents(self, texts: List[str], report: bool = True) -> np.ndarray:
+        # Index-build path; backends override it when bulk embedding differs from queries
+        return self.embed(texts)
+
+
+class OpenAIEmbedder(Embedder):
+    cacheable = True
+
+    def __init__(self, model: str = OPENAI_EMBED_MODEL):
+        self.model = model
+        self.name = f"openai:{model}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        resp = openai_client().embeddings.create(model=self.model, input=list(texts))
+        record_usage(self.model, getattr(resp, "usage", None), "prompt_tokens", None)
+        return _normalized(np.array([d.embedding for d in resp.data], dtype="float32"))
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        resp = await openai_async_client().embeddings.create(model=self.model, input=list(texts))
+        record_usage(self.model, getattr(resp, "usage", None), "prompt_tokens", None)
+        return _normalized(np.array([d.embedding for d in resp.data], dtype="float32"))
+
+    def _embed_batch(self, texts: List[str], max_retries: int = EMBED_MAX_RETRIES) -> Tuple[np.ndarray, int]:
+        retryable = _retryable_errors()
+        for attempt in range(max_retries + 1):
+            try:
+                resp = openai_client().embeddings.create(model=self.model, input=texts)
+                break
+            except retryable as e:
+                if attempt == max_retries:
+                    raise
+                wait = min(60.0, 2 ** attempt) * (0.5 + random.random())
+                logger.warning(
+                    "Embedding retry %d/%d after %s; sleeping %.1fs", attempt + 1, max_retries, type(e).__name__, wait
+                )
+                time.sleep(wait)
+
+        vecs = np.array([d.embedding for d in resp.data], dtype="float32")
+        usage = getattr(resp, "usage", None)
+        return vecs, int(getattr(usage, "prompt_tokens", 0) or 0)
+
+    def embed_documents(
+        self, texts: List[str], report: bool = True, concurrency: int = EMBED_CONCURRENCY
+    ) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+
+        t0 = time.perf_counter()
+        token_counts = [count_tokens(t) for t in texts]
+        batches = pack_batches(token_counts)
+
+        # The first batch tells us the dimension; the rest stream into a preallocated array
+        first, used_tokens = self._embed_batch(texts[batches[0][0]:batches[0][1]])
+        out = np.empty((len(texts), first.shape[1]), dtype="float32")
+        out[batches[0][0]:batches[0][1]] = first
+
+        def _run(span: Tuple[int, int]) -> int:
+            vecs, used = self._embed_batch(texts[span[0]:span[1]])
+            out[span[0]:span[1]] = vecs
+            return used
+
+        if len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                used_tokens += sum(pool.map(_run, batches[1:]))
+
+        if report:
+            elapsed = max(time.perf_counter() - t0, 1e-9)
+            tokens = used_tokens or sum(token_counts)
+            logger.info(
+                "Embedded %d chunks in %d batches: %.1f chunks/s, %.0f tokens/s (%.2fs).",
+                len(texts), len(batches), len(texts) / elapsed, tokens / elapsed, elapsed,
+            )
+        return _normalized(out)
+
+
+class LocalEmbedder(Embedder):
+    """CPU-only TF-IDF + truncated SVD projection, fit on the KB (plus CFPB narratives if available)."""
+
+    def __init__(self, pipeline, name: str):
+        self.pipeline = pipeline
+        self.name = name
+
+    @classmethod
+    def fit(
+        cls,
+        texts: List[str],
+        dim: int = LOCAL_EMBED_DIM,
+        max_features: int = LOCAL_EMBED_MAX_FEATURES,
+    ) -> "LocalEmbedder":
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.pipeline import Pipeline
+
+        tfidf = TfidfVectorizer(ngram_range=(1, 2), max_features=max_features, sublinear_tf=True)
+        X = tfidf.fit_transform(texts)
+        # SVD rank is bounded by the corpus size on tiny KBs
+        n_components = max(1, min(dim, X.shape[0], X.shape[1] - 1))
+        svd = TruncatedSVD(n_components=n_components, random_state=42)
+        svd.fit(X)
+
+        # Same corpus + settings => same name, so incremental builds can reuse vectors
+        h = hashlib.sha256(f"{n_components}\0{max_features}".encode("utf-8"))
+        for t in texts:
+            h.update(b"\0" + t.encode("utf-8"))
+        name = f"local:tfidf-svd-{n_components}-{h.hexdigest()[:10]}"
+        return cls(Pipeline([("tfidf", tfidf), ("svd", svd)]), name)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return _normalized(self.pipeline.transform(list(texts)))
+
+    def save(self, path: str = LOCAL_EMBEDDER_PATH) -> None:
+        import joblib
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump({"name": self.name, "pipeline": self.pipeline}, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str = LOCAL_EMBEDDER_PATH) -> "LocalEmbedder":
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Local embedder not found: {path}. Run: python -m src.rag.build_index")
+        import joblib
+
+        data = joblib.load(path)
+        return cls(data["pipeline"], data["name"])
+
+
+def local_fit_corpus(kb_texts: List[str], cfpb_rows: int = LOCAL_EMBED_CFPB_ROWS) -> List[str]:
+    texts = list(kb_texts)
+    if cfpb_rows > 0:
+        from src.ingest.preprocess import load_clean
+
+        try:
+            df = load_clean(["text"], nrows=cfpb_rows)
+        except FileNotFoundError:
+            return texts
+        texts.extend(df["text"].dropna().astype(str).tolist())
+    return texts
+
+
+_EMBEDDER: Optional[Embedder] = None
+
+
+def get_embedder(backend: Optional[str] = None) -> Embedder:
+    global _EMBEDDER
+    if backend is not None and backend != EMBED_BACKEND:
+        return _make_embedder(backend)
+    if _EMBEDDER is None:
+        _EMBEDDER = _make_embedder(EMBED_BACKEND)
+    return _EMBEDDER
+
+
+def set_embedder(embedder: Optional[Embedder]) -> None:
+    # Used by build_index after (re)fitting the local embedder
+    global _EMBEDDER
+    _EMBEDDER = embedder
+
+
+def _make_embedder(backend: str) -> Embedder:
+    backend = backend.lower()
+    if backend == "openai":
+        return OpenAIEmbedder()
+    if backend == "local":
+        return LocalEmbedder.load()
+    raise ValueError(f"Unknown EMBED_BACKEND {backend!r}; expected 'openai' or 'local'")
@@ -0,0 +1,122 @@
+import math
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.config import (
+    FAISS_INDEX_TYPE,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+    IVF_NLIST,
+    IVF_NPROBE,
+    PQ_M,
+    PQ_NBITS,
+)
+
+if TYPE_CHECKING:
+    import faiss
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+# Upper chunk counts for auto selection: exact search is cheap on small KBs,
+# HNSW gives the best recall/latency in the middle, IVF variants keep memory in check at scale
+AUTO_THRESHOLDS = (
+    (20_000, "flat"),
+    (500_000, "hnsw"),
+    (5_000_000, "ivf_flat"),
+)
+
+
+def choose_index_type(n: int) -> str:
+    for limit, index_type in AUTO_THRESHOLDS:
+        if n <= limit:
+            return index_type
+    return "ivf_pq"
+
+
+def default_params(index_type: str, n: int, d: int) -> Dict[str, Any]:
+    if index_type == "hnsw":
+        return {"M": HNSW_M, "efConstruction": HNSW_EF_CONSTRUCTION, "efSearch": HNSW_EF_SEARCH}
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = IVF_NLIST or int(4 * math.sqrt(n))
+        # k-means wants ~39 training points per centroid
+        nlist = max(1, min(nlist, n // 39 or 1))
+        params: Dict[str, Any] = {"nlist": nlist, "nprobe": min(IVF_NPROBE, nlist)}
+        if index_type == "ivf_pq":
+            m = PQ_M or max(x for x in range(1, min(d, 64) + 1) if d % x == 0)
+            params.update({"m": m, "nbits": max(1, min(PQ_NBITS, int(math.log2(max(n, 2)))))})
+        return params
+    return {}
+
+
+def make_index(
+    vecs: np.ndarray, index_type: Optional[str] = None, params: Optional[Dict[str, Any]] = None
+) -> Tuple["faiss.Index", Dict[str, Any]]:
+    # vecs must already be L2-normalized: every type uses inner product (= cosine)
+    import faiss
+
+    n, d = vecs.shape
+    index_type = (index_type or FAISS_INDEX_TYPE).lower()
+    if index_type == "auto":
+        index_type = choose_index_type(n)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected auto or one of {INDEX_TYPES}")
+    p = {**default_params(index_type, n, d), **(params or {})}
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(d)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, p["M"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = p["efConstruction"]
+        index.hnsw.efSearch = p["efSearch"]
+    else:
+        quantizer = faiss.IndexFlatIP(d)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, p["nlist"], faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, d, p["nlist"], p["m"], p["nbits"], faiss.METRIC_INNER_PRODUCT)
+        rng = np.random.default_rng(0)
+        sample = vecs if n <= 256 * p["nlist"] else vecs[rng.choice(n, 256 * p["nlist"], replace=False)]
+        index.train(sample)
+        index.nprobe = p["nprobe"]
+
+    index.add(vecs)
+    return index, {"type": index_type, "params": p}
+
+
+def describe_index(index: "faiss.Index") -> Dict[str, Any]:
+    import faiss
+
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return {
+            "type": "hnsw",
+            "params": {
+                "M": index.hnsw.nb_neighbors(1),
+                "efConstruction": index.hnsw.efConstruction,
+                "efSearch": index.hnsw.efSearch,
+            },
+        }
+    if isinstance(index, faiss.IndexIVFPQ):
+        return {
+            "type": "ivf_pq",
+            "params": {"nlist": index.nlist, "nprobe": index.nprobe, "m": index.pq.M, "nbits": index.pq.nbits},
+        }
+    if isinstance(index, faiss.IndexIVFFlat):
+        return {"type": "ivf_flat", "params": {"nlist": index.nlist, "nprobe": index.nprobe}}
+    return {"type": "flat", "params": {}}
+
+
+def search_params(
+    index: "faiss.Index", nprobe: Optional[int] = None, ef_search: Optional[int] = None
+) -> Optional["faiss.SearchParameters"]:
+    # Per-call parameters, so concurrent requests never mutate the shared index
+    import faiss
+
+    kind = describe_index(index)["type"]
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=ef_search or HNSW_EF_SEARCH)
+    if kind in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(nprobe=nprobe or IVF_NPROBE)
+    return None
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import numpy as np
+
+from src.config import (
+    LLM_BREAKER_COOLDOWN_S,
+    LLM_BREAKER_FAILURES,
+    LLM_HEDGE,
+    LLM_HEDGE_MIN_DELAY_S,
+    LLM_HEDGE_PERCENTILE,
+)
+from src.metrics import BREAKER_STATE, BREAKER_TRANSITIONS, LLM_HEDGES
+
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpen(Exception):
+    """The LLM breaker is open; the caller should answer without the LLM."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker around LLM calls.
+
+    `failures` failures in a row open it; after `cooldown` seconds one probe call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN_S):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(0)
+
+    def _to(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            BREAKER_STATE.set(_STATE_VALUES[state])
+            BREAKER_TRANSITIONS.inc(state)
+
+    def allow(self) -> bool:
+        if self.failures <= 0:
+            return True
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self._to("half_open")
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._probing = False
+            self._to("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            self._probing = False
+            if self.state == "half_open" or (self.failures > 0 and self._consecutive >= self.failures):
+                self._opened_at = time.monotonic()
+                self._to("open")
+
+    def release(self) -> None:
+        # A call that ended without a verdict (cancelled) gives the half-open probe slot back
+        with self._lock:
+            self._probing = False
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {"state": self.state, "consecutive_failures": self._consecutive}
+            if self.state == "open":
+                out["retry_in_s"] = round(max(0.0, self.cooldown - (time.monotonic() - self._opened_at)), 1)
+            return out
+
+
+class LatencyWindow:
+    """Recent successful LLM call latencies; the hedge fires at a percentile of them."""
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, size: int = 500):
+        self._samples: deque = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.MIN_SAMPLES:
+            return None
+        return float(np.percentile(list(self._samples), q))
+
+
+breaker = CircuitBreaker()
+latencies = LatencyWindow()
+
+
+def hedge_delay() -> float:
+    # Until there is enough history, wait the floor; the percentile only ever raises it
+    p = latencies.percentile(LLM_HEDGE_PERCENTILE)
+    return max(LLM_HEDGE_MIN_DELAY_S, p or 0.0)
+
+
+async def _hedged(call: Callable[[], Awaitable[Any]], delay: float) -> Any:
+    # Fire the primary; if it hasn't answered after `delay`, fire a duplicate and take the first success
+    primary = asyncio.ensure_future(call())
+    tasks = {primary: "primary"}
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if not done:
+            LLM_HEDGES.inc("fired")
+            tasks[asyncio.ensure_future(call())] = "hedge"
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    if len(tasks) > 1:
+                        LLM_HEDGES.inc(f"{tasks[t]}_won")
+                    return t.result()
+                error = t.exception()
+        raise error
+    finally:
+        for t in tasks:
+            t.cancel()
+
+
+async def acall_llm(call: Callable[[], Awaitable[Any]], timeout: Optional[float]) -> Any:
+    """Run one async LLM call under the breaker, the deadline and (if enabled) hedging.
+
+    Raises CircuitOpen without calling when the breaker is open, asyncio.TimeoutError past
+    `timeout`, or the client's own error; every failure counts against the breaker.
+    """
+    if not breaker.allow():
+        raise CircuitOpen()
+    if timeout is not None and timeout <= 0:
+        # The budget went on retrieval; that says nothing about the upstream
+        breaker.release()
+        raise asyncio.TimeoutError()
+    t0 = time.perf_counter()
+    try:
+        work = _hedged(call, hedge_delay()) if LLM_HEDGE else call()
+        resp = await asyncio.wait_for(work, timeout)
+    except Exception:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.record_success()
+    latencies.add(time.perf_counter() - t0)
+    return resp
+
+
+def call_llm(call: Callable[[], Any]) -> Any:
+    # Sync path: breaker + latency history only; the deadline is passed to the client as its timeout
+    if not breaker.allow():
+        raise CircuitOpen()
+    t0 = time.perf_counter()
+    try:
+        resp = call()
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    latencies.add(time.perf_counter() - t0)
+    return resp
@@ -1,56 +1,376 @@
-from typing import List, Dict, Tuple, Optional
+from typing import TYPE_CHECKING, Any, List, Dict, NamedTuple, Tuple, Optional
+import os
+import threading
+import time
 import numpy as np
-import faiss
 
-from openai import OpenAI
-from src.config import OPENAI_API_KEY, OPENAI_EMBED_MODEL
-from src.rag.vector_store import load_index
+from src.concurrency import run_cpu
+from src.config import (
+    EMBED_BACKEND,
+    HYBRID_CANDIDATES,
+    HYBRID_RETRIEVAL,
+    INDEX_DIR,
+    INDEX_RELOAD_INTERVAL,
+    LEXICAL_FASTPATH,
+    LEXICAL_FASTPATH_MARGIN,
+    LEXICAL_FASTPATH_MIN_SCORE,
+    LEXICAL_MIN_SCORE,
+    RRF_K,
+)
+from src.metrics import CACHE_LOOKUPS, stage
+from src.rag.bm25 import BM25Index
+from src.rag.chunk_store import ChunkStore
+from src.rag.embed_cache import embed_cache
+from src.rag.embedders import get_embedder, set_embedder
+from src.rag.index_types import search_params
+from src.rag.vector_store import META_PATH, load_index, load_index_meta
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+if TYPE_CHECKING:
+    import faiss
 
-# Cache index + chunks to avoid reloading from disk on every request
-_INDEX_CACHE: Optional[Tuple[faiss.Index, List[Dict]]] = None
+class _Snapshot(NamedTuple):
+    # One consistent build: FAISS ids, chunk rows and BM25 ids all refer to the same chunk order
+    index: "faiss.Index"
+    chunks: ChunkStore
+    bm25: Optional[BM25Index]
+    meta: Dict[str, Any]
 
-def _get_index():
-    global _INDEX_CACHE
-    if _INDEX_CACHE is None:
-        _INDEX_CACHE = load_index()
-    return _INDEX_CACHE
+# Cache the loaded build to avoid reloading from disk on every request
+_SNAPSHOT: Optional[_Snapshot] = None
+_INDEX_STAMP: Optional[int] = None
+_INDEX_CHECKED = 0.0
+_INDEX_LOCK = threading.Lock()
+
+def _meta_stamp() -> Optional[int]:
+    try:
+        return os.stat(META_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _load():
+    global _SNAPSHOT, _INDEX_STAMP, _INDEX_CHECKED
+    with _INDEX_LOCK:
+        stamp = _meta_stamp()
+        _INDEX_CHECKED = time.monotonic()
+        if _SNAPSHOT is not None and stamp == _INDEX_STAMP:
+            return
+        (index, chunks), meta = load_index(), load_index_meta()
+        _check_embedder(meta)
+        bm25 = BM25Index.load(INDEX_DIR) if BM25Index.exists(INDEX_DIR) else None
+        # Swap index, chunks, BM25 and meta in one assignment once the new files are fully read
+        _SNAPSHOT, _INDEX_STAMP = _Snapshot(index, chunks, bm25, meta), stamp
+
+def _check_embedder(meta: Dict[str, Any]) -> None:
+    # Query vectors must come from the same embedder that built the index
+    built_with = meta.get("embedder")
+    if not built_with:
+        return
+    if EMBED_BACKEND.lower() == "local" and get_embedder().name != built_with:
+        # A rebuild refits the local embedder; pick up the new one alongside the new index
+        set_embedder(None)
+    if get_embedder().name != built_with:
+        raise RuntimeError(
+            f"KB index was built with embedder {built_with!r} but EMBED_BACKEND gives "
+            f"{get_embedder().name!r}. Rebuild it: python -m src.rag.build_index"
+        )
+
+def _index_check_due() -> bool:
+    return _SNAPSHOT is None or (
+        INDEX_RELOAD_INTERVAL > 0 and time.monotonic() - _INDEX_CHECKED >= INDEX_RELOAD_INTERVAL
+    )
+
+def _get_index() -> _Snapshot:
+    # Callers take one snapshot per request and pass it along; a reload only affects later requests
+    global _INDEX_CHECKED
+    if _SNAPSHOT is None:
+        _load()
+    elif _index_check_due():
+        # A rebuild via src.rag.build_index is picked up without a restart
+        if _meta_stamp() != _INDEX_STAMP:
+            _load()
+        else:
+            _INDEX_CHECKED = time.monotonic()
+    return _SNAPSHOT
+
+def index_version() -> str:
+    return _get_index().meta.get("version", "unversioned")
+
+def _cached_vectors(queries: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+    if not get_embedder().cacheable:
+        return [None] * len(queries), list(range(len(queries)))
+    vecs = embed_cache.get_many(queries)
+    missing = [i for i, v in enumerate(vecs) if v is None]
+    CACHE_LOOKUPS.inc("embedding", "hit", amount=len(queries) - len(missing))
+    CACHE_LOOKUPS.inc("embedding", "miss", amount=len(missing))
+    return vecs, missing
+
+def _fill_misses(queries: List[str], vecs: List[Optional[np.ndarray]], missing: List[int], fresh: np.ndarray) -> np.ndarray:
+    if get_embedder().cacheable:
+        embed_cache.put_many([queries[i] for i in missing], fresh)
+    for i, v in zip(missing, fresh):
+        vecs[i] = v
+    return np.vstack(vecs).astype("float32", copy=False)
 
 def embed_query(q: str) -> np.ndarray:
     q = (q or "").strip()
     if not q:
         # return a dummy vector (won't retrieve anything)
         return np.zeros((1, 1), dtype="float32")
+    return embed_queries([q])
+
+async def aembed_query(q: str) -> np.ndarray:
+    q = (q or "").strip()
+    if not q:
+        return np.zeros((1, 1), dtype="float32")
+    return await aembed_queries([q])
+
+def embed_queries(queries: List[str]) -> np.ndarray:
+    # Cache first; one embeddings request for whatever is left. Callers filter out empty queries.
+    # The index is (re)loaded first so the embedder always matches the one that built it.
+    _get_index()
+    vecs, missing = _cached_vectors(queries)
+    if not missing:
+        return np.vstack(vecs)
+    with stage("embed"):
+        fresh = get_embedder().embed([queries[i] for i in missing])
+    return _fill_misses(queries, vecs, missing, fresh)
+
+async def aembed_queries(queries: List[str]) -> np.ndarray:
+    if _index_check_due():
+        await run_cpu(_get_index)
+    # The cache's SQLite tier can block on a locked database; keep it off the event loop too
+    vecs, missing = await run_cpu(_cached_vectors, queries)
+    if not missing:
+        return np.vstack(vecs)
+    with stage("embed"):
+        fresh = await get_embedder().aembed([queries[i] for i in missing])
+    return await run_cpu(_fill_misses, queries, vecs, missing, fresh)
+
+def _hit(chunks: ChunkStore, i: int, score: float, **extra) -> Dict:
+    return {**chunks[int(i)], "score": float(score), **extra}
+
+def check_query_dim(query_dim: int, index_dim: int) -> None:
+    if query_dim != index_dim:
+        raise RuntimeError(
+            f"Query vectors are {query_dim}-dim but the KB index is {index_dim}-dim. "
+            "Rebuild it with the current embedder: python -m src.rag.build_index --full"
+        )
+
+def _dense_candidates(
+    snap: _Snapshot,
+    qv: np.ndarray,
+    n: int,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Tuple[int, float]]]:
+    index = snap.index
 
-    resp = client.embeddings.create(model=OPENAI_EMBED_MODEL, input=[q])
-    vec = np.array(resp.data[0].embedding, dtype="float32").reshape(1, -1)
-    faiss.normalize_L2(vec)
-    return vec
+    # The (1, 1) dummy vector of an empty query matches nothing; any other width is a stale or wrong index
+    if qv.shape[1] == 1 and index.d != 1:
+        return [[] for _ in range(qv.shape[0])]
+    check_query_dim(qv.shape[1], index.d)
 
-def retrieve(query: str, k: int = 4, min_score: float = 0.25) -> List[Dict]:
-    query = (query or "").strip()
-    if len(query) < 3:
-        return []
+    with stage("faiss"):
+        scores, idxs = index.search(qv, n, params=search_params(index, nprobe, ef_search))
+    return [
+        [(int(i), float(s)) for s, i in zip(scores[row], idxs[row]) if i != -1]
+        for row in range(qv.shape[0])
+    ]
 
-    index, chunks = _get_index()
+def _lexical_candidates(snap: _Snapshot, queries: List[str], n: int) -> List[List[Tuple[int, float, float]]]:
+    if snap.bm25 is None or not HYBRID_RETRIEVAL:
+        return [[] for _ in queries]
+    with stage("bm25"):
+        return [snap.bm25.search(q, n) for q in queries]
 
-    qv = embed_query(query)
+def _is_decisive(lexical: List[Tuple[int, float, float]]) -> bool:
+    if not (LEXICAL_FASTPATH and lexical):
+        return False
+    if lexical[0][2] < LEXICAL_FASTPATH_MIN_SCORE:
+        return False
+    runner_up = lexical[1][1] if len(lexical) > 1 else 0.0
+    return runner_up <= 0 or lexical[0][1] / runner_up >= LEXICAL_FASTPATH_MARGIN
 
-    # If embed_query returned dummy vector, return empty
-    if qv.shape[1] != index.d:
-        return []
+def _lexical_hits(chunks: ChunkStore, lexical: List[Tuple[int, float, float]], k: int) -> List[Dict]:
+    return [
+        _hit(chunks, i, norm, bm25=norm, signal="lexical") for i, _, norm in lexical[:k] if norm >= LEXICAL_MIN_SCORE
+    ]
 
-    scores, idxs = index.search(qv, k)
+def _fuse(
+    chunks: ChunkStore,
+    dense: List[Tuple[int, float]],
+    lexical: List[Tuple[int, float, float]],
+    k: int,
+    min_score: float,
+) -> List[Dict]:
+    if not lexical:
+        return [_hit(chunks, i, s, signal="dense") for i, s in dense[:k] if s >= min_score]
+
+    # Reciprocal rank fusion; a chunk is kept if either signal clears its own threshold
+    # (min_score for cosine, LEXICAL_MIN_SCORE for normalized BM25)
+    rrf: Dict[int, float] = {}
+    dense_score = {i: s for i, s in dense}
+    lex_score = {i: norm for i, _, norm in lexical}
+    for rank, (i, _) in enumerate(dense):
+        rrf[i] = rrf.get(i, 0.0) + 1.0 / (RRF_K + rank + 1)
+    for rank, (i, _, _) in enumerate(lexical):
+        rrf[i] = rrf.get(i, 0.0) + 1.0 / (RRF_K + rank + 1)
 
     results: List[Dict] = []
-    for score, i in zip(scores[0], idxs[0]):
-        if i == -1:
-            continue
-        if float(score) < float(min_score):
+    for i in sorted(rrf, key=rrf.get, reverse=True):
+        d, l = dense_score.get(i), lex_score.get(i)
+        if not ((d is not None and d >= min_score) or (l is not None and l >= LEXICAL_MIN_SCORE)):
             continue
+        # "score" stays on one scale per hit; "signal" says which, so later gates can pick the matching threshold
+        extra = {"rrf": rrf[i], "signal": "dense" if d is not None else "lexical"}
+        if l is not None:
+            extra["bm25"] = l
+        results.append(_hit(chunks, i, d if d is not None else l, **extra))
+        if len(results) >= k:
+            break
+    return results
 
-        item = chunks[int(i)]
-        results.append({**item, "score": float(score)})
+def _live_queries(queries: List[str]) -> Tuple[List[str], List[int]]:
+    queries = [(q or "").strip() for q in queries]
+    return queries, [i for i, q in enumerate(queries) if len(q) >= 3]
 
-    return results
+def _plan(snap: _Snapshot, queries: List[str], live: List[int], k: int):
+    # Lexical pass for every query; those with a decisive BM25 match skip the embedding call
+    n = max(k, HYBRID_CANDIDATES)
+    lexical = dict(zip(live, _lexical_candidates(snap, [queries[i] for i in live], n)))
+    dense_ids = [i for i in live if not _is_decisive(lexical[i])]
+    return lexical, dense_ids, n
+
+def _assemble(
+    snap: _Snapshot,
+    n_queries: int,
+    live: List[int],
+    lexical: Dict[int, List],
+    dense_ids: List[int],
+    dense: List[List[Tuple[int, float]]],
+    k: int,
+    min_score: float,
+) -> List[Tuple[List[Dict], str]]:
+    out: List[Tuple[List[Dict], str]] = [([], "none") for _ in range(n_queries)]
+    dense_by_id = dict(zip(dense_ids, dense))
+    for i in live:
+        if i not in dense_by_id:
+            out[i] = (_lexical_hits(snap.chunks, lexical[i], k), "lexical")
+        else:
+            out[i] = (_fuse(snap.chunks, dense_by_id[i], lexical[i], k, min_score), "hybrid" if lexical[i] else "dense")
+    return out
+
+def retrieve_batch_with_paths(
+    queries: List[str],
+    k: int = 4,
+    min_score: float = 0.25,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[Tuple[List[Dict], str]]:
+    # Path per query: "lexical" (BM25 fast path), "hybrid" (BM25 + dense fused), "dense" or "none".
+    # min_score applies to cosine scores; lexical-only hits are gated by LEXICAL_MIN_SCORE.
+    queries, live = _live_queries(queries)
+    if not live:
+        return [([], "none") for _ in queries]
+
+    snap = _get_index()
+    lexical, dense_ids, n = _plan(snap, queries, live, k)
+    dense: List[List[Tuple[int, float]]] = []
+    if dense_ids:
+        # One embeddings call and one search over the stacked query matrix
+        qv = embed_queries([queries[i] for i in dense_ids])
+        dense = _dense_candidates(snap, qv, n, nprobe, ef_search)
+    return _assemble(snap, len(queries), live, lexical, dense_ids, dense, k, min_score)
+
+async def aretrieve_batch_with_paths(
+    queries: List[str],
+    k: int = 4,
+    min_score: float = 0.25,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[Tuple[List[Dict], str]]:
+    queries, live = _live_queries(queries)
+    if not live:
+        return [([], "none") for _ in queries]
+
+    # BM25, FAISS search (and the first index load) run off the event loop; all three
+    # stages use the same snapshot even if a rebuild is picked up in between
+    snap = await run_cpu(_get_index)
+    lexical, dense_ids, n = await run_cpu(_plan, snap, queries, live, k)
+    dense: List[List[Tuple[int, float]]] = []
+    if dense_ids:
+        qv = await aembed_queries([queries[i] for i in dense_ids])
+        dense = await run_cpu(_dense_candidates, snap, qv, n, nprobe, ef_search)
+    return await run_cpu(_assemble, snap, len(queries), live, lexical, dense_ids, dense, k, min_score)
+
+def retrieve_batch(
+    queries: List[str],
+    k: int = 4,
+    min_score: float = 0.25,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Dict]]:
+    return [hits for hits, _ in retrieve_batch_with_paths(queries, k, min_score, nprobe, ef_search)]
+
+async def aretrieve_batch(
+    queries: List[str],
+    k: int = 4,
+    min_score: float = 0.25,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Dict]]:
+    return [hits for hits, _ in await aretrieve_batch_with_paths(queries, k, min_score, nprobe, ef_search)]
+
+def retrieve_with_path(
+    query: str,
+    k: int = 4,
+    min_score: float = 0.25,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Tuple[List[Dict], str]:
+    return retrieve_batch_with_paths([query], k, min_score, nprobe, ef_search)[0]
+
+async def aretrieve_with_path(
+    query: str,
+    k: int = 4,
+    min_score: float = 0.25,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Tuple[List[Dict], str]:
+    return (await aretrieve_batch_with_paths([query], k, min_score, nprobe, ef_search))[0]
+
+def retrieve(
+    query: str,
+    k: int = 4,
+    min_score: float = 0.25,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[Dict]:
+    return retrieve_with_path(query, k, min_score, nprobe, ef_search)[0]
+
+async def aretrieve(
+    query: str,
+    k: int = 4,
+    min_score: float = 0.25,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[Dict]:
+    return (await aretrieve_with_path(query, k, min_score, nprobe, ef_search))[0]
+
+def index_info() -> Dict[str, Any]:
+    snap = _get_index()
+    return {
+        "version": snap.meta.get("version", "unversioned"),
+        "chunks": len(snap.chunks),
+        "dim": snap.index.d,
+        "bm25": snap.bm25 is not None,
+    }
+
+async def awarm(query: str) -> Dict[str, int]:
+    # Startup warmup: one BM25 lookup, one query embedding (client + cache) and one FAISS search
+    n = HYBRID_CANDIDATES
+    snap = await run_cpu(_get_index)
+    lexical = await run_cpu(_lexical_candidates, snap, [query], n)
+    qv = await aembed_queries([query])
+    dense = await run_cpu(_dense_candidates, snap, qv, n)
+    return {"lexical_hits": len(lexical[0]), "dense_hits": len(dense[0])}
@@ -0,0 +1,23 @@
+from typing import Optional
+
+try:  # optional: exact counts when tiktoken is installed
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on the environment
+    tiktoken = None
+
+_ENCODING: Optional[object] = None
+
+
+def _encoding():
+    global _ENCODING
+    if _ENCODING is None and tiktoken is not None:
+        _ENCODING = tiktoken.get_encoding("cl100k_base")
+    return _ENCODING
+
+
+def count_tokens(text: str) -> int:
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text or "", disallowed_special=()))
+    # ~4 characters per token for English prose; rounds up so budgets stay conservative
+    return (len(text or "") + 3) // 4
@@ -1,41 +1,99 @@
+import hashlib
 import json
 import os
-from typing import List, Dict, Tuple
+import time
+from typing import TYPE_CHECKING, Any, List, Dict, Optional, Tuple
 import numpy as np
-import faiss
 
-from openai import OpenAI
-from src.config import OPENAI_API_KEY, OPENAI_EMBED_MODEL, INDEX_DIR
+from src.config import INDEX_DIR
+from src.rag.chunk_store import ChunkStore, write_chunk_store
+from src.rag.embedders import get_embedder
+from src.rag.index_types import describe_index, make_index
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+if TYPE_CHECKING:
+    import faiss
 
 def embed_texts(texts: List[str]) -> np.ndarray:
-    resp = client.embeddings.create(
-        model=OPENAI_EMBED_MODEL,
-        input=texts
-    )
-    vectors = [d.embedding for d in resp.data]
-    return np.array(vectors, dtype="float32")
-
-def build_faiss_index(chunks: List[Dict]) -> Tuple[faiss.IndexFlatIP, List[Dict]]:
-    texts = [c["chunk"] for c in chunks]
-    vecs = embed_texts(texts)
-
-    # cosine similarity = inner product after normalization
-    faiss.normalize_L2(vecs)
-
-    index = faiss.IndexFlatIP(vecs.shape[1])
-    index.add(vecs)
+    # Normalized vectors from the configured backend (EMBED_BACKEND)
+    return get_embedder().embed_documents(texts)
+
+def embed_chunks(chunks: List[Dict]) -> np.ndarray:
+    # cosine similarity = inner product after normalization (done by the embedder)
+    return embed_texts([c["chunk"] for c in chunks])
+
+def build_faiss_index(
+    chunks: List[Dict], vecs: Optional[np.ndarray] = None, index_type: Optional[str] = None
+) -> Tuple["faiss.Index", List[Dict]]:
+    # vecs: already-normalized vectors aligned with chunks (e.g. reused by an incremental build)
+    if vecs is None:
+        vecs = embed_chunks(chunks)
+
+    index, _ = make_index(vecs, index_type)
     return index, chunks
 
+META_PATH = os.path.join(INDEX_DIR, "kb_meta.json")
+MANIFEST_PATH = os.path.join(INDEX_DIR, "kb_manifest.json")
+VECTORS_PATH = os.path.join(INDEX_DIR, "kb_vectors.npy")
+
+def index_version(chunks: List[Dict], embedder_name: str) -> str:
+    # Content hash: identical KB + embedder => identical version
+    h = hashlib.sha256(embedder_name.encode("utf-8"))
+    for c in chunks:
+        h.update(f"\0{c['doc_id']}\0{c['chunk']}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
 def save_index(index, chunks: List[Dict]):
+    import faiss
+
     os.makedirs(INDEX_DIR, exist_ok=True)
-    faiss.write_index(index, os.path.join(INDEX_DIR, "kb.faiss"))
-    with open(os.path.join(INDEX_DIR, "kb_chunks.json"), "w", encoding="utf-8") as f:
-        json.dump(chunks, f, ensure_ascii=False, indent=2)
-
-def load_index():
-    index = faiss.read_index(os.path.join(INDEX_DIR, "kb.faiss"))
-    with open(os.path.join(INDEX_DIR, "kb_chunks.json"), "r", encoding="utf-8") as f:
-        chunks = json.load(f)
-    return index, chunks
+    faiss_path = os.path.join(INDEX_DIR, "kb.faiss")
+    faiss.write_index(index, faiss_path + ".tmp")
+    os.replace(faiss_path + ".tmp", faiss_path)
+    write_chunk_store(INDEX_DIR, chunks)
+
+    # kb_chunks.json from older builds is superseded by the binary chunk store
+    legacy = os.path.join(INDEX_DIR, "kb_chunks.json")
+    if os.path.exists(legacy):
+        os.remove(legacy)
+
+    # Metadata goes last: a changed kb_meta.json tells running servers the rebuild is complete
+    embedder_name = get_embedder().name
+    meta = {
+        "version": index_version(chunks, embedder_name),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "embedder": embedder_name,
+        "num_chunks": len(chunks),
+        "dim": int(index.d),
+        "index": describe_index(index),
+    }
+    tmp = META_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, META_PATH)
+
+def load_index_meta() -> Dict[str, Any]:
+    if not os.path.exists(META_PATH):
+        return {"version": "unversioned"}
+    with open(META_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_index() -> Tuple["faiss.Index", ChunkStore]:
+    # Both the vectors and the chunk texts are mmapped, so workers share pages and RSS stays flat
+    import faiss
+
+    index = faiss.read_index(os.path.join(INDEX_DIR, "kb.faiss"), faiss.IO_FLAG_MMAP)
+    return index, ChunkStore(INDEX_DIR)
+
+def save_manifest(manifest: Dict[str, Any], vecs: np.ndarray):
+    # Normalized vectors in chunk order, so the next build can reuse unchanged chunks
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    np.save(VECTORS_PATH, np.ascontiguousarray(vecs, dtype="float32"))
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+def load_manifest() -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+    if not (os.path.exists(MANIFEST_PATH) and os.path.exists(VECTORS_PATH)):
+        return {}, None
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return manifest, np.load(VECTORS_PATH)
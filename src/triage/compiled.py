@@ -0,0 +1,184 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.config import MODELS_DIR
+from src.triage.registry import ModelRegistry
+
+# Layout (models/triage_compiled/):
+#   terms.txt     vocabulary, one n-gram per line in feature-column order
+#   idf.npy       float64[n_features] IDF weights
+#   coef.npy      float64[n_features, n_scores] LR coefficients, one row per term
+#   intercept.npy float64[n_scores]
+#   meta.json     classes, analyzer settings and the stat of the joblib pipeline it was exported from;
+#                 written last, so it is what the registry watches
+COMPILED_DIR = os.path.join(MODELS_DIR, "triage_compiled")
+COMPILED_META_PATH = os.path.join(COMPILED_DIR, "meta.json")
+TERMS_NAME = "terms.txt"
+IDF_NAME = "idf.npy"
+COEF_NAME = "coef.npy"
+INTERCEPT_NAME = "intercept.npy"
+
+
+def _source_key(path: str) -> List[int]:
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def export_compiled(model, source_path: str, out_dir: str = COMPILED_DIR) -> Dict[str, Any]:
+    """Write a TF-IDF + LogisticRegression pipeline as plain arrays for CompiledTriageModel.
+
+    Raises ValueError for anything the lean path can't reproduce exactly (other estimators,
+    custom analyzers, stop words, accent stripping).
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    steps = getattr(model, "steps", None)
+    if not steps or len(steps) != 2:
+        raise ValueError("Expected a two-step (vectorizer, classifier) pipeline")
+    vec, clf = steps[0][1], steps[1][1]
+    if not isinstance(vec, TfidfVectorizer) or not isinstance(clf, LogisticRegression):
+        raise ValueError(f"Unsupported pipeline: {type(vec).__name__} + {type(clf).__name__}")
+    if (vec.analyzer != "word" or vec.tokenizer is not None or vec.preprocessor is not None
+            or vec.stop_words is not None or vec.strip_accents is not None or vec.norm not in ("l1", "l2", None)):
+        raise ValueError("Vectorizer uses options the compiled path does not implement")
+
+    n_classes = len(clf.classes_)
+    if n_classes == 2:
+        proba = "binary"
+    elif getattr(clf, "multi_class", "auto") == "ovr":
+        proba = "ovr"
+    else:
+        proba = "softmax"
+
+    terms = sorted(vec.vocabulary_, key=vec.vocabulary_.get)
+    if any("\n" in t for t in terms):
+        raise ValueError("Vocabulary terms contain newlines")
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, TERMS_NAME + ".tmp"), "w", encoding="utf-8") as f:
+        f.write("\n".join(terms))
+    with open(os.path.join(out_dir, IDF_NAME + ".tmp"), "wb") as f:
+        np.save(f, np.asarray(vec.idf_ if vec.use_idf else np.ones(len(terms)), dtype=np.float64))
+    with open(os.path.join(out_dir, COEF_NAME + ".tmp"), "wb") as f:
+        np.save(f, np.ascontiguousarray(clf.coef_.T, dtype=np.float64))
+    with open(os.path.join(out_dir, INTERCEPT_NAME + ".tmp"), "wb") as f:
+        np.save(f, np.asarray(clf.intercept_, dtype=np.float64))
+
+    meta = {
+        "classes": [str(c) for c in clf.classes_],
+        "n_features": len(terms),
+        "ngram_range": list(vec.ngram_range),
+        "token_pattern": vec.token_pattern,
+        "lowercase": bool(vec.lowercase),
+        "binary": bool(vec.binary),
+        "sublinear_tf": bool(vec.sublinear_tf),
+        "norm": vec.norm,
+        "proba": proba,
+        "source": {"path": os.path.abspath(source_path), "stat": _source_key(source_path)},
+    }
+    with open(os.path.join(out_dir, "meta.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    for name in (TERMS_NAME, IDF_NAME, COEF_NAME, INTERCEPT_NAME, "meta.json"):
+        path = os.path.join(out_dir, name)
+        os.replace(path + ".tmp", path)
+    return meta
+
+
+class CompiledTriageModel:
+    """TF-IDF + LR inference without sklearn: tokenize, look up n-grams, sparse dot, softmax.
+
+    Exposes `classes_`, `predict_proba` and `predict` so it drops in where the pipeline was used.
+    """
+
+    def __init__(self, meta_path: str = COMPILED_META_PATH):
+        model_dir = os.path.dirname(meta_path)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta: Dict[str, Any] = json.load(f)
+        self.classes_ = np.array(self.meta["classes"], dtype=object)
+        self._token = re.compile(self.meta["token_pattern"])
+        self._ngram_range = tuple(self.meta["ngram_range"])
+        self._lowercase = self.meta["lowercase"]
+        self._binary = self.meta["binary"]
+        self._sublinear_tf = self.meta["sublinear_tf"]
+        self._norm = self.meta["norm"]
+        self._proba = self.meta["proba"]
+
+        # The only per-load work: a term -> column dict over the vocabulary file
+        with open(os.path.join(model_dir, TERMS_NAME), "r", encoding="utf-8") as f:
+            text = f.read()
+        self._vocab = {t: i for i, t in enumerate(text.split("\n"))} if text else {}
+        self._idf = np.load(os.path.join(model_dir, IDF_NAME), mmap_mode="r")
+        self._coef = np.load(os.path.join(model_dir, COEF_NAME), mmap_mode="r")
+        self._intercept = np.load(os.path.join(model_dir, INTERCEPT_NAME))
+
+    def matches(self, source_path: str) -> bool:
+        # False once the joblib pipeline has been replaced by something this artifact wasn't exported from
+        try:
+            return _source_key(source_path) == self.meta["source"]["stat"]
+        except FileNotFoundError:
+            return False
+
+    def _terms(self, text: str) -> List[str]:
+        # Same analyzer as TfidfVectorizer(analyzer="word"): lowercase, token_pattern, word n-grams
+        if self._lowercase:
+            text = text.lower()
+        tokens = self._token.findall(text)
+        lo, hi = self._ngram_range
+        if hi == 1:
+            return tokens
+        grams = list(tokens) if lo == 1 else []
+        for n in range(max(lo, 2), min(hi, len(tokens)) + 1):
+            grams += [" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+        return grams
+
+    def decision_function(self, text: str) -> np.ndarray:
+        ids: List[int] = []
+        tf: List[int] = []
+        vocab = self._vocab
+        for term, count in Counter(self._terms(text)).items():
+            j = vocab.get(term)
+            if j is not None:
+                ids.append(j)
+                tf.append(count)
+        if not ids:
+            return self._intercept.copy()
+
+        v = np.asarray(tf, dtype=np.float64)
+        if self._binary:
+            v[:] = 1.0
+        elif self._sublinear_tf:
+            v = np.log(v) + 1.0
+        v *= self._idf[ids]
+        if self._norm == "l2":
+            v /= np.sqrt(v @ v)
+        elif self._norm == "l1":
+            v /= np.abs(v).sum()
+        return v @ self._coef[ids] + self._intercept
+
+    def _proba_row(self, scores: np.ndarray) -> np.ndarray:
+        if self._proba == "binary":
+            p = 1.0 / (1.0 + np.exp(-scores[0]))
+            return np.array([1.0 - p, p])
+        if self._proba == "ovr":
+            p = 1.0 / (1.0 + np.exp(-scores))
+            return p / p.sum()
+        e = np.exp(scores - scores.max())
+        return e / e.sum()
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        if not len(texts):
+            return np.empty((0, len(self.classes_)))
+        return np.vstack([self._proba_row(self.decision_function(t)) for t in texts])
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        return self.classes_[self.predict_proba(texts).argmax(axis=1)]
+
+
+compiled_registry = ModelRegistry(COMPILED_META_PATH, loader=CompiledTriageModel)
@@ -1,15 +1,39 @@
-import os
-import joblib
-from src.config import MODELS_DIR
+from typing import List, Optional, Tuple
+import numpy as np
+from src.config import TRIAGE_COMPILED
+from src.metrics import stage
+from src.triage.compiled import compiled_registry
+from src.triage.registry import MODEL_PATH, registry
 
-def load_model():
-    return joblib.load(os.path.join(MODELS_DIR, "triage_model.joblib"))
+def _model():
+    # The compiled export when it was made from the current pipeline file, else the pipeline itself
+    if TRIAGE_COMPILED:
+        try:
+            model = compiled_registry.get()
+        except FileNotFoundError:
+            model = None
+        if model is not None and model.matches(MODEL_PATH):
+            return model
+    return registry.get()
 
 def predict_category(text: str):
-    model = load_model()
-    pred = model.predict([text])[0]
-    proba = None
-    if hasattr(model, "predict_proba"):
+    with stage("triage"):
+        model = _model()
+        if not hasattr(model, "predict_proba"):
+            return model.predict([text])[0], None
+        # One predict_proba pass gives both the label and its confidence
         p = model.predict_proba([text])[0]
-        proba = float(max(p))
-    return pred, proba
+        i = int(np.argmax(p))
+        return model.classes_[i], float(p[i])
+
+def predict_categories(texts: List[str]) -> List[Tuple[str, Optional[float]]]:
+    if not texts:
+        return []
+    with stage("triage"):
+        model = _model()
+        if not hasattr(model, "predict_proba"):
+            return [(pred, None) for pred in model.predict(texts)]
+        # Single matrix pass over the whole batch
+        P = model.predict_proba(texts)
+        best = P.argmax(axis=1)
+        return [(model.classes_[i], float(P[row, i])) for row, i in enumerate(best)]
@@ -0,0 +1,97 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.config import MODELS_DIR, TRIAGE_RELOAD_INTERVAL
+
+MODEL_PATH = os.path.join(MODELS_DIR, "triage_model.joblib")
+
+logger = logging.getLogger(__name__)
+
+
+def _load_joblib(path: str) -> Any:
+    # joblib (and sklearn, when unpickling a pipeline) only loads with the first model
+    import joblib
+
+    return joblib.load(path)
+
+
+def _file_version(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """Keeps one triage model resident per process and swaps in newer files from disk."""
+
+    def __init__(
+        self,
+        path: str = MODEL_PATH,
+        reload_interval: float = TRIAGE_RELOAD_INTERVAL,
+        loader: Callable[[str], Any] = _load_joblib,
+    ):
+        self.path = path
+        self.loader = loader
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        # (model, info, stat_key) replaced as a single object so readers never see a mix
+        self._state: Optional[Tuple[Any, Dict[str, Any], Tuple[int, int]]] = None
+        self._last_check = 0.0
+
+    def _stat_key(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, stat_key: Tuple[int, int]) -> None:
+        t0 = time.perf_counter()
+        model = self.loader(self.path)
+        info = {
+            "path": self.path,
+            "version": _file_version(self.path),
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "load_seconds": round(time.perf_counter() - t0, 4),
+        }
+        self._state = (model, info, stat_key)
+
+    def _maybe_reload(self) -> None:
+        # Only one thread reloads; the others keep serving the current model
+        if not self._lock.acquire(blocking=self._state is None):
+            return
+        try:
+            self._last_check = time.monotonic()
+            stat_key = self._stat_key()
+            if self._state is None or self._state[2] != stat_key:
+                self._load(stat_key)
+        finally:
+            self._lock.release()
+
+    def get(self):
+        state = self._state
+        if state is None:
+            self._maybe_reload()
+        elif self.reload_interval > 0 and time.monotonic() - self._last_check >= self.reload_interval:
+            try:
+                self._maybe_reload()
+            except FileNotFoundError:
+                # Model file is being replaced; keep the resident one
+                pass
+            except Exception as e:
+                # Half-written or corrupt file: keep serving the resident model and retry next interval
+                logger.warning("Reloading %s failed, keeping version %s: %s: %s",
+                               self.path, state[1]["version"], type(e).__name__, e)
+        return self._state[0]
+
+    def info(self) -> Dict[str, Any]:
+        state = self._state
+        if state is None:
+            return {"path": self.path, "loaded": False}
+        return {**state[1], "loaded": True}
+
+
+registry = ModelRegistry()
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.config import PRIORITY_RULES_PATH, PRIORITY_RULES_RELOAD_INTERVAL
+
+# Used when the rules file is missing: the original hard-coded keyword lists
+DEFAULT_RULES: Dict[str, Any] = {
+    "tiers": ["High", "Medium", "Low"],
+    "default": "Low",
+    "negation": {"cues": [], "bridge": [], "window": 0},
+    "rules": [
+        {"name": "fraud", "tier": "High", "patterns": ["fraud*", "unauthorized", "identity theft", "stolen", "hacked"]},
+        {"name": "billing", "tier": "Medium",
+         "patterns": ["refund*", "charge*", "billing", "payment*", "charged twice", "double charged"]},
+    ],
+}
+
+# Words (with inner apostrophes) and clause punctuation; negation never reaches across a clause break
+_TOKEN = re.compile(r"[^\W_]+(?:'[^\W_]+)*|[.,;:!?]")
+_CLAUSE_BREAKS = frozenset([".", ",", ";", ":", "!", "?", "but", "however", "although"])
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower().replace("’", "'"))
+
+
+class _Node:
+    __slots__ = ("words", "prefixes", "rule")
+
+    def __init__(self):
+        self.words: Dict[str, "_Node"] = {}
+        self.prefixes: Dict[str, "_Node"] = {}  # "charge*" -> charge, charged, chargeback, ...
+        self.rule: Optional[int] = None
+
+    def children(self, token: str) -> Iterator["_Node"]:
+        child = self.words.get(token)
+        if child is not None:
+            yield child
+        if self.prefixes:
+            for n in range(len(token), 0, -1):
+                child = self.prefixes.get(token[:n])
+                if child is not None:
+                    yield child
+
+
+class PriorityRules:
+    """Keyword/phrase rules compiled into one word-level trie.
+
+    Patterns are whole words or phrases (so "charge" never matches "discharged"); a trailing `*`
+    makes a word a prefix. A match is negated only when a cue directly negates it: the cue comes at
+    most `window` words before it and every word in between is a `bridge` word ("not fraud", "wasn't
+    a scam", but not "no idea who hacked"). Rules with `"negatable": false` are never negated. All tiers
+    are resolved in one pass over the tokens; per-token work depends on phrase length, not on
+    how many rules there are.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.tiers: List[str] = list(config["tiers"])
+        self.default: str = config.get("default", self.tiers[-1])
+        negation = config.get("negation", {})
+        self.negation_cues = frozenset(w.lower().replace("’", "'") for w in negation.get("cues", []))
+        self.negation_window = int(negation.get("window", 0))
+        # Words that may sit between a cue and the term it negates (articles, auxiliaries)
+        self.negation_bridge = frozenset(w.lower().replace("’", "'") for w in negation.get("bridge", []))
+
+        self.root = _Node()
+        # rule index -> (name, tier rank, negatable)
+        self.rules: List[Tuple[str, int, bool]] = []
+        self.num_patterns = 0
+        for rule in config.get("rules", []):
+            if rule["tier"] not in self.tiers:
+                raise ValueError(f"Rule {rule.get('name')!r} has unknown tier {rule['tier']!r}")
+            idx = len(self.rules)
+            self.rules.append(
+                (rule.get("name", f"rule_{idx}"), self.tiers.index(rule["tier"]), bool(rule.get("negatable", True)))
+            )
+            for pattern in rule["patterns"]:
+                self._add(pattern, idx)
+
+    def _add(self, pattern: str, rule: int) -> None:
+        words = pattern.lower().replace("’", "'").split()
+        if not words:
+            raise ValueError(f"Empty pattern in rule {self.rules[rule][0]!r}")
+        node = self.root
+        for word in words:
+            table = node.prefixes if word.endswith("*") else node.words
+            key = word.rstrip("*")
+            if not key or tokenize(key) != [key]:
+                raise ValueError(f"Pattern {pattern!r} must be plain words (optionally ending in *)")
+            node = table.setdefault(key, _Node())
+        # When two rules share a pattern the higher tier wins
+        if node.rule is None or self.rules[rule][1] < self.rules[node.rule][1]:
+            node.rule = rule
+        self.num_patterns += 1
+
+    def _longest(self, node: _Node, tokens: List[str], i: int) -> Optional[Tuple[int, int]]:
+        # (end token, rule) of the longest pattern starting at tokens[i]
+        best = None
+        if i < len(tokens):
+            for child in node.children(tokens[i]):
+                if child.rule is not None and (best is None or i + 1 > best[0]):
+                    best = (i + 1, child.rule)
+                deeper = self._longest(child, tokens, i + 1)
+                if deeper is not None and (best is None or deeper[0] > best[0]):
+                    best = deeper
+        return best
+
+    def scan(self, text: str, stop_at_top: bool = False) -> Iterator[Tuple[int, int, int, bool]]:
+        """Yields (rule, start token, end token, negated) for every match, left to right."""
+        tokens = tokenize(text)
+        last_cue = -1
+        i = 0
+        while i < len(tokens):
+            m = self._longest(self.root, tokens, i)
+            if m is not None:
+                end, rule = m
+                _, rank, negatable = self.rules[rule]
+                negated = negatable and last_cue >= 0 and i - last_cue <= self.negation_window
+                yield rule, i, end, negated
+                if stop_at_top and rank == 0 and not negated:
+                    return
+                last_cue = -1
+                i = end
+                continue
+            tok = tokens[i]
+            if tok in self.negation_cues:
+                last_cue = i
+            elif tok in _CLAUSE_BREAKS or tok not in self.negation_bridge:
+                # Any other word means the cue negates something else ("no idea who ...")
+                last_cue = -1
+            i += 1
+
+    def classify(self, text: str) -> str:
+        best = len(self.tiers)
+        for rule, _, _, negated in self.scan(text, stop_at_top=True):
+            if not negated:
+                best = min(best, self.rules[rule][1])
+        return self.tiers[best] if best < len(self.tiers) else self.default
+
+    def explain(self, text: str) -> List[Dict[str, Any]]:
+        tokens = tokenize(text)
+        return [
+            {
+                "rule": self.rules[rule][0],
+                "tier": self.tiers[self.rules[rule][1]],
+                "match": " ".join(tokens[start:end]),
+                "negated": negated,
+            }
+            for rule, start, end, negated in self.scan(text)
+        ]
+
+
+class RuleLoader:
+    """Compiled priority rules for this process, recompiled when the rules file changes."""
+
+    def __init__(self, path: str = PRIORITY_RULES_PATH, reload_interval: float = PRIORITY_RULES_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        # (rules, info, stat_key) replaced as a single object so readers never see a mix
+        self._state: Optional[Tuple[PriorityRules, Dict[str, Any], Optional[Tuple[int, int]]]] = None
+        self._last_check = 0.0
+        self._error: Optional[str] = None
+
+    def _stat_key(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, stat_key: Optional[Tuple[int, int]]) -> None:
+        t0 = time.perf_counter()
+        if stat_key is None:
+            raw, source = json.dumps(DEFAULT_RULES).encode("utf-8"), "builtin"
+        else:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            source = self.path
+        rules = PriorityRules(json.loads(raw))
+        info = {
+            "path": source,
+            "version": hashlib.sha256(raw).hexdigest()[:12],
+            "rules": len(rules.rules),
+            "patterns": rules.num_patterns,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "compile_seconds": round(time.perf_counter() - t0, 4),
+        }
+        self._state = (rules, info, stat_key)
+
+    def _maybe_reload(self) -> None:
+        if not self._lock.acquire(blocking=self._state is None):
+            return
+        try:
+            self._last_check = time.monotonic()
+            stat_key = self._stat_key()
+            if self._state is None or self._state[2] != stat_key:
+                try:
+                    self._load(stat_key)
+                    self._error = None
+                except (ValueError, KeyError, TypeError) as e:
+                    # A bad edit keeps the last good rules serving; only a first load may fail
+                    if self._state is None:
+                        raise
+                    self._error = f"{type(e).__name__}: {e}"
+                    self._state = (self._state[0], self._state[1], stat_key)
+        finally:
+            self._lock.release()
+
+    def get(self) -> PriorityRules:
+        if self._state is None:
+            self._maybe_reload()
+        elif self.reload_interval > 0 and time.monotonic() - self._last_check >= self.reload_interval:
+            self._maybe_reload()
+        return self._state[0]
+
+    def info(self) -> Dict[str, Any]:
+        state = self._state
+        if state is None:
+            return {"path": self.path, "loaded": False}
+        return {**state[1], "loaded": True, "error": self._error}
+
+
+priority_rules = RuleLoader()
+
+
+def priority_for(text: str) -> str:
+    return priority_rules.get().classify(text)
@@ -0,0 +1,217 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from src.config import MODELS_DIR
+from src.ingest.preprocess import load_clean
+from src.triage.registry import MODEL_PATH
+from src.triage.train import save_model
+
+SEARCH_DIR = os.path.join(MODELS_DIR, "search")
+FEATURE_CACHE_DIR = os.path.join(SEARCH_DIR, "features")
+RESULTS_PATH = os.path.join(SEARCH_DIR, "results.csv")
+
+
+def _fingerprint(texts: pd.Series, labels: pd.Series) -> str:
+    h = hashlib.sha256()
+    for t, y in zip(texts, labels):
+        h.update(f"{y}\0{t}\0".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _vec_key(data_key: str, ngram: Tuple[int, int], max_features: int) -> str:
+    return f"{data_key}-ng{ngram[0]}{ngram[1]}-mf{max_features}"
+
+
+def build_features(
+    x_train: pd.Series, x_test: pd.Series, ngram: Tuple[int, int], max_features: int, cache_dir: str
+) -> Tuple[str, bool]:
+    """Fit one vectorizer config and store its train/test matrices; reused as-is on the next run."""
+    if os.path.exists(os.path.join(cache_dir, "done")):
+        return cache_dir, True
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(cache_dir)
+
+    vec = TfidfVectorizer(ngram_range=ngram, max_features=max_features, min_df=2)
+    X_train = vec.fit_transform(x_train)
+    X_test = vec.transform(x_test)
+    # Only needed for introspection; it holds every pruned term and can dwarf the vocabulary
+    vec.stop_words_ = None
+
+    sp.save_npz(os.path.join(cache_dir, "X_train.npz"), X_train.tocsr(), compressed=False)
+    sp.save_npz(os.path.join(cache_dir, "X_test.npz"), X_test.tocsr(), compressed=False)
+    joblib.dump(vec, os.path.join(cache_dir, "vectorizer.joblib"))
+    open(os.path.join(cache_dir, "done"), "w").close()
+    return cache_dir, False
+
+
+def _fit_candidate(task: Dict) -> Dict:
+    # Runs in a worker: everything heavy comes from the feature cache, nothing big is pickled across
+    cache_dir = task["cache_dir"]
+    X_train = sp.load_npz(os.path.join(cache_dir, "X_train.npz"))
+    X_test = sp.load_npz(os.path.join(cache_dir, "X_test.npz"))
+    y_train = np.load(os.path.join(task["labels_dir"], "y_train.npy"), allow_pickle=True)
+    y_test = np.load(os.path.join(task["labels_dir"], "y_test.npy"), allow_pickle=True)
+
+    t0 = time.perf_counter()
+    clf = LogisticRegression(max_iter=2000, C=task["C"], class_weight=task["class_weight"])
+    clf.fit(X_train, y_train)
+    fit_s = time.perf_counter() - t0
+
+    pred = clf.predict(X_test)
+    model = Pipeline([("tfidf", joblib.load(os.path.join(cache_dir, "vectorizer.joblib"))), ("lr", clf)])
+    joblib.dump(model, task["model_path"])
+    return {
+        **task["params"],
+        "accuracy": round(float(accuracy_score(y_test, pred)), 4),
+        "macro_f1": round(float(f1_score(y_test, pred, average="macro", zero_division=0)), 4),
+        "fit_s": round(fit_s, 2),
+        "model_mb": round(os.path.getsize(task["model_path"]) / 1e6, 2),
+        "model_path": task["model_path"],
+    }
+
+
+def _latency_ms(model_path: str, texts: List[str]) -> Tuple[float, float]:
+    # One ticket per call, as /analyze does; measured serially so workers don't skew each other
+    model = joblib.load(model_path)
+    model.predict_proba(texts[:1])
+    lat = []
+    for t in texts:
+        t0 = time.perf_counter()
+        model.predict_proba([t])
+        lat.append((time.perf_counter() - t0) * 1000)
+    return float(np.percentile(lat, 50)), float(np.percentile(lat, 95))
+
+
+def search(
+    C: List[float],
+    class_weight: List[Optional[str]],
+    ngrams: List[Tuple[int, int]],
+    max_features: List[int],
+    workers: int = 0,
+    latency_budget_ms: float = 5.0,
+    metric: str = "macro_f1",
+    latency_samples: int = 200,
+    promote: bool = True,
+) -> pd.DataFrame:
+    df = load_clean(["text", "label"]).dropna(subset=["text", "label"])
+    df = pd.DataFrame({"text": df["text"].astype(str), "label": df["label"].astype(str)})
+    if df["label"].nunique() < 2:
+        raise ValueError("Need at least 2 classes to train a classifier.")
+
+    # Same split as train(), so scores are comparable with the default pipeline
+    x_train, x_test, y_train, y_test = train_test_split(
+        df["text"], df["label"], test_size=0.2, random_state=42, stratify=df["label"]
+    )
+    data_key = _fingerprint(x_train, y_train)
+    labels_dir = os.path.join(FEATURE_CACHE_DIR, data_key)
+    os.makedirs(labels_dir, exist_ok=True)
+    np.save(os.path.join(labels_dir, "y_train.npy"), y_train.to_numpy(dtype=object))
+    np.save(os.path.join(labels_dir, "y_test.npy"), y_test.to_numpy(dtype=object))
+
+    candidates_dir = os.path.join(SEARCH_DIR, "candidates")
+    shutil.rmtree(candidates_dir, ignore_errors=True)
+    os.makedirs(candidates_dir)
+
+    tasks = []
+    for ngram, mf in itertools.product(ngrams, max_features):
+        t0 = time.perf_counter()
+        cache_dir, hit = build_features(
+            x_train, x_test, ngram, mf, os.path.join(FEATURE_CACHE_DIR, _vec_key(data_key, ngram, mf))
+        )
+        print(f"features ngram={ngram} max_features={mf}: "
+              f"{'cached' if hit else f'built in {time.perf_counter() - t0:.1f}s'}")
+        for c, cw in itertools.product(C, class_weight):
+            i = len(tasks)
+            tasks.append({
+                "cache_dir": cache_dir,
+                "labels_dir": labels_dir,
+                "C": c,
+                "class_weight": cw,
+                "model_path": os.path.join(candidates_dir, f"candidate_{i:03d}.joblib"),
+                "params": {"ngram": f"{ngram[0]}-{ngram[1]}", "max_features": mf, "C": c, "class_weight": cw or "none"},
+            })
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    t0 = time.perf_counter()
+    if workers == 1:
+        rows = list(map(_fit_candidate, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_fit_candidate, tasks))
+    print(f"Fit {len(tasks)} candidates with {workers} workers in {time.perf_counter() - t0:.1f}s")
+
+    sample = x_test.head(latency_samples).tolist()
+    for r in rows:
+        r["p50_ms"], r["p95_ms"] = (round(v, 3) for v in _latency_ms(r["model_path"], sample))
+        r["within_budget"] = r["p95_ms"] <= latency_budget_ms
+
+    results = pd.DataFrame(rows).sort_values([metric, "p95_ms"], ascending=[False, True]).reset_index(drop=True)
+    results.drop(columns=["model_path"]).to_csv(RESULTS_PATH, index=False)
+
+    eligible = results[results["within_budget"]]
+    if eligible.empty:
+        print(f"No candidate meets the p95 budget of {latency_budget_ms} ms; {MODEL_PATH} left unchanged.")
+    elif promote:
+        best = eligible.iloc[0]
+        save_model(joblib.load(best["model_path"]), sorted(df["label"].unique()))
+        with open(os.path.join(SEARCH_DIR, "promoted.json"), "w", encoding="utf-8") as f:
+            json.dump(best.drop(labels=["model_path"]).to_dict(), f, indent=2, default=str)
+        print(f"Promoted: {best.drop(labels=['model_path']).to_dict()}")
+    shutil.rmtree(candidates_dir, ignore_errors=True)
+    return results.drop(columns=["model_path"])
+
+
+def _floats(s: str) -> List[float]:
+    return [float(x) for x in s.split(",")]
+
+
+def _ngrams(s: str) -> List[Tuple[int, int]]:
+    return [tuple(int(n) for n in x.split("-")) for x in s.split(",")]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Triage hyperparameter search (python -m src.triage.train --search).")
+    parser.add_argument("--C", default="0.5,1,2,4", help="comma-separated inverse regularization strengths")
+    parser.add_argument("--class-weight", default="none,balanced", help="comma-separated: none, balanced")
+    parser.add_argument("--ngram", default="1-1,1-2", help="comma-separated n-gram ranges, e.g. 1-1,1-2")
+    parser.add_argument("--max-features", default="20000,50000,100000")
+    parser.add_argument("--workers", type=int, default=0, help="processes for classifier fits (0 = all cores)")
+    parser.add_argument("--latency-budget-ms", type=float, default=5.0, help="p95 per-ticket predict_proba budget")
+    parser.add_argument("--metric", choices=["macro_f1", "accuracy"], default="macro_f1")
+    parser.add_argument("--no-promote", action="store_true", help="only write the results table")
+    args = parser.parse_args(argv)
+
+    results = search(
+        C=_floats(args.C),
+        class_weight=[None if w == "none" else w for w in args.class_weight.split(",")],
+        ngrams=_ngrams(args.ngram),
+        max_features=[int(x) for x in args.max_features.split(",")],
+        workers=args.workers,
+        latency_budget_ms=args.latency_budget_ms,
+        metric=args.metric,
+        promote=not args.no_promote,
+    )
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(results.to_string(index=False))
+    print("Saved:", RESULTS_PATH)
+
+
+if __name__ == "__main__":
+    main()
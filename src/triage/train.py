@@ -1,6 +1,6 @@
+import argparse
 import os
 import joblib
-import pandas as pd
 
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
@@ -8,15 +8,52 @@ from sklearn.metrics import classification_report
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 
-from src.config import PROCESSED_DIR, MODELS_DIR
+from src.config import MODELS_DIR
+from src.ingest.preprocess import load_clean
+from src.triage.compiled import COMPILED_DIR, export_compiled
+from src.triage.registry import MODEL_PATH
 
 
-def train():
-    data_path = os.path.join(PROCESSED_DIR, "cfpb_clean.csv")
-    if not os.path.exists(data_path):
-        raise FileNotFoundError(f"Processed dataset not found: {data_path}. Run preprocess first.")
+def make_pipeline() -> Pipeline:
+    return Pipeline([
+        ("tfidf", TfidfVectorizer(
+            ngram_range=(1, 2),
+            max_features=50000,
+            min_df=2
+        )),
+        ("lr", LogisticRegression(
+            max_iter=2000,
+            class_weight="balanced"
+        ))
+    ])
+
+
+def save_model(clf, labels, out_path: str = MODEL_PATH) -> None:
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    # Write then rename so a running API never picks up a half-written file
+    tmp_path = out_path + ".tmp"
+    joblib.dump(clf, tmp_path)
+    os.replace(tmp_path, out_path)
+    print("Saved model:", out_path)
+
+    # Compact arrays for the lean predict path; other pipelines are served from the joblib file
+    try:
+        export_compiled(clf, out_path)
+        print("Saved compiled model:", COMPILED_DIR)
+    except ValueError as e:
+        print("Skipped compiled export:", e)
+
+    # Save label list (nice for UI/README)
+    labels_path = os.path.join(MODELS_DIR, "labels.txt")
+    with open(labels_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(sorted(labels)))
+    print("Saved labels:", labels_path)
+
 
-    df = pd.read_csv(data_path)
+def train():
+    # Parquet parts from the streaming preprocess (text + label columns only), else cfpb_clean.csv
+    df = load_clean(["text", "label"])
 
     # Basic cleanup
     df = df.dropna(subset=["text", "label"])
@@ -34,17 +71,7 @@ def train():
         stratify=df["label"],
     )
 
-    clf = Pipeline([
-        ("tfidf", TfidfVectorizer(
-            ngram_range=(1, 2),
-            max_features=50000,
-            min_df=2
-        )),
-        ("lr", LogisticRegression(
-            max_iter=2000,
-            class_weight="balanced"
-        ))
-    ])
+    clf = make_pipeline()
 
     clf.fit(X_train, y_train)
     preds = clf.predict(X_test)
@@ -52,19 +79,17 @@ def train():
     print("\n=== Classification Report ===")
     print(classification_report(y_test, preds, zero_division=0))
 
-    os.makedirs(MODELS_DIR, exist_ok=True)
-
-    out_path = os.path.join(MODELS_DIR, "triage_model.joblib")
-    joblib.dump(clf, out_path)
-    print("Saved model:", out_path)
-
-    # Save label list (nice for UI/README)
-    labels_path = os.path.join(MODELS_DIR, "labels.txt")
-    labels = sorted(df["label"].unique().tolist())
-    with open(labels_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(labels))
-    print("Saved labels:", labels_path)
+    save_model(clf, df["label"].unique().tolist())
 
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the triage classifier.")
+    parser.add_argument("--search", action="store_true",
+                        help="sweep hyperparameters instead (options: python -m src.triage.search --help)")
+    args, rest = parser.parse_known_args()
+    if args.search:
+        from src.triage.search import main as search_main
+        search_main(rest)
+    else:
+        parser.parse_args()
+        train()
@@ -0,0 +1,236 @@
+import argparse
+import os
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.pipeline import Pipeline
+
+from src.config import MODELS_DIR
+from src.ingest.preprocess import SUPPORT_LABELS, iter_clean
+from src.triage.registry import MODEL_PATH
+from src.triage.train import make_pipeline, save_model
+
+CHECKPOINT_PATH = os.path.join(MODELS_DIR, "triage_stream.ckpt.joblib")
+
+
+def make_vectorizer(n_features: int = 2 ** 20) -> HashingVectorizer:
+    # Stateless: no vocabulary to fit or hold, so any number of rows streams through in constant memory
+    return HashingVectorizer(
+        ngram_range=(1, 2), n_features=n_features, alternate_sign=False, norm="l2", dtype=np.float32
+    )
+
+
+def _holdout_mask(texts: pd.Series, pct: int) -> np.ndarray:
+    # Split on a hash of the text: stable across epochs and restarts, nothing to remember
+    return np.fromiter((zlib.crc32(t.encode("utf-8")) % 100 < pct for t in texts), dtype=bool, count=len(texts))
+
+
+def _clean_batch(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.dropna(subset=["text", "label"])
+    df = pd.DataFrame({"text": df["text"].astype(str), "label": df["label"].astype(str)})
+    return df[df["label"].isin(SUPPORT_LABELS)]
+
+
+def _balanced_weights(y: np.ndarray, counts: np.ndarray, classes: np.ndarray) -> np.ndarray:
+    # class_weight="balanced" can't be used with partial_fit; use the class counts seen so far instead
+    seen = np.maximum(counts, 1)
+    per_class = seen.sum() / (len(classes) * seen)
+    return per_class[np.searchsorted(classes, y)].astype(np.float32)
+
+
+def _evaluate(model, texts: List[str], labels: List[str]) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    pred = model.predict(texts)
+    elapsed = time.perf_counter() - t0
+    return {
+        "accuracy": round(float(accuracy_score(labels, pred)), 4),
+        "macro_f1": round(float(f1_score(labels, pred, average="macro", zero_division=0)), 4),
+        "predict_rows_per_s": round(len(texts) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def _save_checkpoint(state: Dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    joblib.dump(state, tmp)
+    os.replace(tmp, path)
+
+
+def train_stream(
+    epochs: int = 1,
+    batch_rows: int = 20000,
+    n_features: int = 2 ** 20,
+    alpha: float = 1e-6,
+    val_pct: int = 5,
+    val_max: int = 20000,
+    checkpoint_every: int = 20,
+    checkpoint_path: str = CHECKPOINT_PATH,
+    resume: bool = False,
+    baseline_rows: int = 0,
+    out_path: str = MODEL_PATH,
+) -> Dict:
+    """Train a HashingVectorizer + SGD (log loss) pipeline batch by batch over the processed dataset.
+
+    About val_pct% of rows (by text hash) are held out, up to val_max of them kept for evaluation.
+    The result is a regular sklearn Pipeline with predict_proba, saved where predict_category loads it.
+    """
+    vec = make_vectorizer(n_features)
+    classes = np.array(SUPPORT_LABELS)
+    clf = SGDClassifier(loss="log_loss", alpha=alpha, average=True, random_state=42)
+    counts = np.zeros(len(classes), dtype=np.int64)
+    val_texts: List[str] = []
+    val_labels: List[str] = []
+    base_texts: List[str] = []
+    base_labels: List[str] = []
+    done: Tuple[int, int] = (0, -1)  # (epoch, batch) already trained
+    rows = 0
+    train_seconds = 0.0
+
+    if resume and os.path.exists(checkpoint_path):
+        state = joblib.load(checkpoint_path)
+        clf, counts, done, rows = state["clf"], state["counts"], state["position"], state["rows"]
+        train_seconds = state["train_seconds"]
+        val_texts, val_labels = state["val_texts"], state["val_labels"]
+        print(f"Resuming after epoch {done[0] + 1}, batch {done[1] + 1} ({rows} rows trained)")
+
+    rng = np.random.default_rng(42)
+    t_start = time.perf_counter()
+    batches = 0
+    history = []
+    for epoch in range(done[0], epochs):
+        for b, df in enumerate(iter_clean(["text", "label"], batch_rows=batch_rows)):
+            if (epoch, b) <= done:
+                continue
+            df = _clean_batch(df)
+            if df.empty:
+                continue
+
+            hold = _holdout_mask(df["text"], val_pct)
+            if epoch == 0 and len(val_texts) < val_max:
+                take = df[hold].head(val_max - len(val_texts))
+                val_texts.extend(take["text"].tolist())
+                val_labels.extend(take["label"].tolist())
+            train_df = df[~hold]
+            if train_df.empty:
+                continue
+            if epoch == 0 and len(base_texts) < baseline_rows:
+                take = train_df.head(baseline_rows - len(base_texts))
+                base_texts.extend(take["text"].tolist())
+                base_labels.extend(take["label"].tolist())
+
+            # Shuffle within the batch; SGD is sensitive to long runs of one class
+            order = rng.permutation(len(train_df))
+            y = train_df["label"].to_numpy()[order]
+            t0 = time.perf_counter()
+            X = vec.transform(train_df["text"].to_numpy()[order])
+            counts += np.bincount(np.searchsorted(classes, y), minlength=len(classes))
+            clf.partial_fit(X, y, classes=classes, sample_weight=_balanced_weights(y, counts, classes))
+            train_seconds += time.perf_counter() - t0
+            rows += len(y)
+            batches += 1
+            done = (epoch, b)
+
+            if checkpoint_every and batches % checkpoint_every == 0:
+                _save_checkpoint(
+                    {"clf": clf, "counts": counts, "position": done, "rows": rows, "train_seconds": train_seconds,
+                     "val_texts": val_texts, "val_labels": val_labels},
+                    checkpoint_path,
+                )
+                msg = f"epoch {epoch + 1} batch {b + 1}: {rows} rows, {rows / max(train_seconds, 1e-9):.0f} rows/s"
+                if val_texts:
+                    scores = _evaluate(Pipeline([("hash", vec), ("sgd", clf)]), val_texts, val_labels)
+                    history.append({"rows": rows, **scores})
+                    msg += f", val acc {scores['accuracy']:.4f}, macro F1 {scores['macro_f1']:.4f}"
+                print(msg + " (checkpoint saved)")
+
+    if rows == 0:
+        raise ValueError("No training rows streamed. Run preprocess first.")
+
+    model = Pipeline([("hash", vec), ("sgd", clf)])
+    report: Dict = {
+        "rows": rows,
+        "epochs": epochs,
+        "train_rows_per_s": round(rows / train_seconds, 1) if train_seconds > 0 else None,
+        "wall_seconds": round(time.perf_counter() - t_start, 2),
+        "history": history,
+    }
+    if val_texts:
+        report["stream"] = _evaluate(model, val_texts, val_labels)
+
+        # The pipeline currently deployed (it may have seen some of these rows during its own training)
+        if os.path.exists(out_path):
+            try:
+                report["current"] = _evaluate(joblib.load(out_path), val_texts, val_labels)
+            except Exception as e:
+                report["current"] = {"error": str(e)}
+
+        # The in-memory TF-IDF + LogisticRegression pipeline fit on a bounded slice of the same training rows
+        if base_texts and len(set(base_labels)) > 1:
+            t0 = time.perf_counter()
+            base = make_pipeline().fit(base_texts, base_labels)
+            report["in_memory"] = {
+                **_evaluate(base, val_texts, val_labels),
+                "rows": len(base_texts),
+                "train_rows_per_s": round(len(base_texts) / (time.perf_counter() - t0), 1),
+            }
+
+    save_model(model, [c for c, n in zip(classes, counts) if n > 0], out_path)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return report
+
+
+def _print_report(report: Dict) -> None:
+    print(f"\nTrained on {report['rows']} rows in {report['epochs']} epoch(s): "
+          f"{report['train_rows_per_s']} rows/s ({report['wall_seconds']}s wall)")
+    print(f"{'model':<12}{'accuracy':>10}{'macro F1':>10}{'predict rows/s':>16}{'train rows/s':>14}")
+    for name in ("stream", "current", "in_memory"):
+        r = report.get(name)
+        if not r:
+            continue
+        if "error" in r:
+            print(f"{name:<12}  could not evaluate: {r['error']}")
+            continue
+        train_rps = report["train_rows_per_s"] if name == "stream" else r.get("train_rows_per_s", "-")
+        print(f"{name:<12}{r['accuracy']:>10.4f}{r['macro_f1']:>10.4f}{r['predict_rows_per_s']:>16}{train_rps:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Out-of-core triage training (HashingVectorizer + SGD).")
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--batch-rows", type=int, default=20000)
+    parser.add_argument("--n-features", type=int, default=2 ** 20, help="hashing space size")
+    parser.add_argument("--alpha", type=float, default=1e-6, help="SGD L2 regularization")
+    parser.add_argument("--val-pct", type=int, default=5, help="percent of rows held out (by text hash)")
+    parser.add_argument("--val-max", type=int, default=20000, help="max held-out rows kept for evaluation")
+    parser.add_argument("--checkpoint-every", type=int, default=20, help="batches between checkpoints (0 = off)")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    parser.add_argument("--baseline-rows", type=int, default=0,
+                        help="also fit the in-memory TF-IDF + LR pipeline on this many rows for comparison")
+    parser.add_argument("--out", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    report = train_stream(
+        epochs=args.epochs,
+        batch_rows=args.batch_rows,
+        n_features=args.n_features,
+        alpha=args.alpha,
+        val_pct=args.val_pct,
+        val_max=args.val_max,
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        baseline_rows=args.baseline_rows,
+        out_path=args.out,
+    )
+    _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
+import json
 import os
 import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Tuple
 
 import gradio as gr
 import requests
 
 
 API_URL = os.getenv("API_URL", "http://127.0.0.1:8000/analyze")
+API_STREAM_URL = os.getenv("API_STREAM_URL", API_URL.rstrip("/") + "/stream")
 
 
 # ----------------------------
@@ -284,6 +286,71 @@ def call_api(ticket_text: str) -> Tuple[str, str, str, Dict[str, Any]]:
     )
 
 
+def _sse_events(r: requests.Response) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    event, data = "message", []
+    for line in r.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
+def call_api_stream(ticket_text: str) -> Iterator[Tuple[str, str, str, Dict[str, Any]]]:
+    text = (ticket_text or "").strip()
+    if len(text) < 10:
+        yield call_api(text)
+        return
+
+    state: Dict[str, Any] = {}
+    reply = ""
+    cites = '<div class="pill">Retrieving...</div>'
+    try:
+        with requests.post(API_STREAM_URL, json={"text": text}, stream=True, timeout=90) as r:
+            r.raise_for_status()
+            for event, data in _sse_events(r):
+                if event == "triage":
+                    state.update(data)
+                elif event == "citations":
+                    cites = _citations_html(data.get("citations", []) or [])
+                elif event == "reply_delta":
+                    reply += data.get("text", "")
+                elif event == "done":
+                    state = data
+                    reply = data.get("reply", reply)
+                    cites = _citations_html(data.get("citations", []) or [])
+                elif event == "error":
+                    raise RuntimeError(data.get("detail") or data.get("error"))
+
+                yield (
+                    _kpi_html(
+                        state.get("category", ""),
+                        state.get("category_confidence", ""),
+                        state.get("priority", ""),
+                        state.get("found_in_kb", "..."),
+                    ),
+                    reply,
+                    cites,
+                    state,
+                )
+    except Exception as e:
+        if state:
+            yield (
+                _kpi_html("Error", "-", "-", "-"),
+                f"API error: {e}",
+                cites,
+                {"error": str(e), **state},
+            )
+            return
+        # Older API without /analyze/stream (or a proxy that breaks SSE): one blocking call instead
+        yield call_api(text)
+
+
 # ----------------------------
 # UI
 # ----------------------------
@@ -368,7 +435,7 @@ with gr.Blocks(theme=theme, css=CSS, title="Trusted Support Copilot") as demo:
                         raw = gr.JSON(value={})
 
     analyze_btn.click(
-        fn=call_api,
+        fn=call_api_stream,
         inputs=[ticket],
         outputs=[kpis, reply, cites, raw],
     )
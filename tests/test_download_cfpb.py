@@ -0,0 +1,46 @@
+import csv
+import io
+import zipfile
+
+import pytest
+
+from src.ingest.download_cfpb import sample_zip
+
+PRODUCTS = ["Credit card", "Mortgage", "Debt collection"]
+
+
+def _narrative(i: int) -> str:
+    # CFPB narratives are quoted fields with embedded newlines (and the odd quote)
+    return (
+        f"Complaint {i}: I was charged twice for the same purchase.\n"
+        "I called the bank and they said \"wait 10 days\".\n\n"
+        f"Nothing happened after {i} days, please help."
+    )
+
+
+@pytest.fixture
+def multiline_zip(tmp_path):
+    buf = io.StringIO()
+    writer = csv.writer(buf, quoting=csv.QUOTE_MINIMAL)
+    writer.writerow(["Date received", "Product", "Issue", "Consumer complaint narrative"])
+    for i in range(300):
+        narrative = _narrative(i) if i % 5 else ""
+        writer.writerow(["2024-01-01", PRODUCTS[i % len(PRODUCTS)], "Billing dispute", narrative])
+    path = tmp_path / "complaints.csv.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("complaints.csv", buf.getvalue())
+    return str(path)
+
+
+@pytest.mark.parametrize("block_size", [256, 1000, 4096])
+def test_sample_zip_multiline_narratives(multiline_zip, block_size):
+    df, stats = sample_zip(multiline_zip, sample_rows=1000, block_size=block_size)
+    assert stats["rows_scanned"] == 300
+    assert len(df) == 240
+    assert all(n.count("\n") == 3 for n in df["Consumer complaint narrative"])
+
+
+def test_sample_zip_stratified_multiline(multiline_zip):
+    df, stats = sample_zip(multiline_zip, sample_rows=30, strategy="stratified", block_size=256)
+    assert len(df) == 30
+    assert set(stats["by_product"].values()) == {10}